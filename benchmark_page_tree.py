@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Confluence 页面树构建性能基准
+在合成的 1k/10k/100k 页面空间上比较旧的逐节点扫描算法和新的索引算法
+"""
+
+import random
+import sys
+import time
+
+from src.requirement_tracker.confluence_pages import build_page_tree
+
+# 旧算法是O(n²)，页面数超过该值时跳过以免等待过久
+LEGACY_MAX_PAGES = 10000
+
+
+def generate_pages(count, max_children=8, seed=42):
+    """生成合成页面列表，每个页面随机挂在已生成的页面下"""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        page_id = str(100000 + i)
+        parent_id = None
+        if i and rng.random() > 0.01:
+            parent_id = pages[rng.randrange(max(0, i - max_children * 50), i)]['id']
+        pages.append({'id': page_id, 'title': f'Page {rng.randrange(count)}', 'parent_id': parent_id})
+    rng.shuffle(pages)
+    return pages
+
+
+def build_page_tree_legacy(pages):
+    """旧算法：递归构建，每个节点扫描全部页面查找子页面"""
+    page_dict = {page['id']: page for page in pages}
+
+    def build_tree_node(page_info):
+        children = [build_tree_node(p) for p in page_dict.values() if p['parent_id'] == page_info['id']]
+        node = {'label': page_info['title'], 'value': page_info['id']}
+        if children:
+            node['children'] = children
+        return node
+
+    return [
+        build_tree_node(p) for p in page_dict.values()
+        if not p['parent_id'] or p['parent_id'] not in page_dict
+    ]
+
+
+def measure(func, pages):
+    """返回单次构建耗时（秒）"""
+    start = time.perf_counter()
+    func(pages)
+    return time.perf_counter() - start
+
+
+def run_benchmark(sizes=(1000, 10000, 100000)):
+    """运行基准测试并打印结果"""
+    print("📊 Confluence 页面树构建基准")
+    print(f"{'页面数':>10} {'索引算法(s)':>14} {'旧算法(s)':>14}")
+    for size in sizes:
+        pages = generate_pages(size)
+        new_time = measure(build_page_tree, pages)
+        if size <= LEGACY_MAX_PAGES:
+            legacy = f"{measure(build_page_tree_legacy, pages):14.3f}"
+        else:
+            legacy = f"{'跳过':>14}"
+        print(f"{size:>10} {new_time:14.3f} {legacy}")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (1000, 10000, 100000)
+    run_benchmark(sizes)
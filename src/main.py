@@ -4,7 +4,10 @@ import argparse
 import json
 from dotenv import load_dotenv, dotenv_values
 from pathlib import Path
-from src.requirement_tracker.crew import run_crew  # ← 请根据你的包名修改，例如 src.requirement_crew.crew
+from src.requirement_tracker.crew import discard_run, resume_run, run_crew  # ← 请根据你的包名修改，例如 src.requirement_crew.crew
+from src.requirement_tracker.batch import BATCH_WORKERS, load_requirements, run_batch
+from src.requirement_tracker.run_store import STATUS_FAILED, get_run_store
+from src.requirement_tracker.streaming import EVENT_TASK, EVENT_TOKEN, EVENT_TOOL_CALL, stream_crew_events
 
 # 如果你把 crew 定义为一个函数返回 Crew，也可以用下面方式
 # from src.your_crew.crew import create_requirement_crew
@@ -102,7 +105,33 @@ def main():
     parser = argparse.ArgumentParser(description='需求文档自动化系统')
     parser.add_argument('--model', default='qwen', 
                        help='选择使用的AI模型: qwen(通义千问)、azure(Azure OpenAI)、grok(xAI) 或自定义模型标识符')
+    parser.add_argument('--batch', metavar='FILE',
+                       help='批处理模式：从JSONL文件读取需求记录（request_id/id + input_text 或 title/body）')
+    parser.add_argument('--output', metavar='FILE',
+                       help='批处理结果JSONL文件，默认为 <输入文件名>.results.jsonl；已成功的记录重新运行时跳过')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                       help='批处理并发数量')
+    parser.add_argument('--no-stream', action='store_true',
+                       help='不实时显示LLM输出和Agent步骤，只在完成后输出结果')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                       help='从失败的阶段继续直接发布的运行（复用已保存的分析结果、工作项和页面）')
+    parser.add_argument('--discard', metavar='RUN_ID',
+                       help='放弃失败的直接发布运行，删除它已创建的工作项和页面')
+    parser.add_argument('--runs', action='store_true',
+                       help='列出失败的直接发布运行')
     args = parser.parse_args()
+
+    if args.runs:
+        list_failed_runs()
+        return
+
+    if args.resume:
+        resume_mode(args)
+        return
+
+    if args.discard:
+        discard_mode(args)
+        return
     
     model_type = args.model
     custom_llms = load_custom_llms()
@@ -135,6 +164,10 @@ def main():
         print("\n程序退出。")
         return
 
+    if args.batch:
+        run_batch_mode(args, model_type, model_name)
+        return
+
     print(f"🚀 需求文档自动化 Crew 已就绪！(使用 {model_name})")
     print("输入你想要整理的需求描述（随意文字），我将自动生成结构化文档、创建工作项并发布到 Confluence。")
     print("输入 'exit' 或 'quit' 退出程序。\n")
@@ -154,7 +187,11 @@ def main():
 
         try:
             # 启动 Crew，传入输入文字和模型类型
-            result = run_crew(user_input, model_type)
+            if args.no_stream:
+                result = run_crew(user_input, model_type)
+            else:
+                with stream_crew_events(print_stream_event):
+                    result = run_crew(user_input, model_type)
 
             print("\n=== 🎉 完成！===\n")
             print(result)
@@ -164,6 +201,72 @@ def main():
             print(f"\n❌ 执行过程中出错：{str(e)}")
             print("请检查工具配置（API Key、权限、网络）或查看详细日志。\n")
 
+def print_stream_event(event):
+    """在命令行中实时显示Crew事件"""
+    if event["type"] == EVENT_TOKEN:
+        print(event["content"], end="", flush=True)
+    elif event["type"] == EVENT_TASK:
+        print(f"\n\n🧑‍💼 {event.get('agent_role') or 'Agent'} 开始第 {event.get('task_index', 0) + 1} 个任务\n", flush=True)
+    elif event["type"] == EVENT_TOOL_CALL:
+        print(f"\n🔧 调用工具：{event['tool_name']}", flush=True)
+    else:
+        print(f"\n⚙️ {event.get('content', '')}", flush=True)
+
+def list_failed_runs():
+    """列出失败的运行及其待继续的阶段"""
+    store = get_run_store()
+    runs = store.list_runs(status=STATUS_FAILED) if store else []
+    if not runs:
+        print("没有失败的运行。")
+        return
+    for run in runs:
+        summary = (run["analysis"] or {}).get("summary") or run["input_text"][:40]
+        print(f"{run['run_id']}  [{run['pending_stage']}]  {summary}  —  {run['error']}")
+    print("\n使用 --resume <运行ID> 继续运行，或 --discard <运行ID> 放弃运行并删除已创建的工作项和页面。")
+
+def resume_mode(args):
+    """继续失败的运行"""
+    print(f"🔁 继续运行 {args.resume}...\n")
+    if args.no_stream:
+        result = resume_run(args.resume)
+    else:
+        with stream_crew_events(print_stream_event):
+            result = resume_run(args.resume)
+    if str(result).startswith("Error:"):
+        print(f"\n❌ 继续运行失败：{result}")
+    else:
+        print("\n=== 🎉 完成！===\n")
+        print(result)
+
+def discard_mode(args):
+    """放弃失败的运行并删除已创建的工作项和页面"""
+    result = discard_run(args.discard)
+    if str(result).startswith("Error:"):
+        print(f"❌ 放弃运行失败：{result}")
+    else:
+        print(f"🗑️ {result}")
+
+def run_batch_mode(args, model_type, model_name):
+    """批处理模式：处理文件中的全部需求并写入结果JSONL"""
+    try:
+        records = load_requirements(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取批处理文件失败：{str(e)}")
+        return
+
+    output_path = args.output or f"{os.path.splitext(args.batch)[0]}.results.jsonl"
+    print(f"🚀 批处理 {len(records)} 条需求 (使用 {model_name}，并发 {args.workers})，结果写入 {output_path}\n")
+
+    def report(result):
+        if result["status"] == "ok":
+            print(f"✅ {result['id']}: 工作项 {result['work_item_ids'] or '-'}，页面 {result['page_links'] or '-'}")
+        else:
+            print(f"❌ {result['id']}: {result['error']}")
+
+    summary = run_batch(records, output_path, model_type, workers=args.workers, on_result=report)
+    print(f"\n=== 批处理完成：成功 {summary['succeeded']}，失败 {summary['failed']}，"
+          f"跳过 {summary['skipped']}（已完成），共 {summary['total']} ===")
+
 if __name__ == "__main__":
     # 可选：在这里可以做一些启动前检查
     main()
\ No newline at end of file
@@ -3,11 +3,38 @@ Azure DevOps (ADO) 浏览器模块
 用于在Web界面中显示ADO项目和工作项信息
 """
 import os
+import re
+from html.parser import HTMLParser
+
 import streamlit as st
-from azure.devops.v7_1.work_item_tracking.models import Wiql
 from openai import project
 
+from .ado_fetch import fetch_work_items, fetch_work_item_description, get_list_fields, work_item_to_dict
+from .ado_metadata import DEFAULT_WORK_ITEM_TYPES, ado_metadata
+from .ado_query import build_id_query, fetch_partitioned_work_items
+from .ado_sync import sync_work_items
 from .tools import get_ado_connection  # 导入通用的ADO连接函数
+from .work_item_store import get_work_item_store, record_work_items
+
+# 工作项表格配置
+PAGE_SIZE_OPTIONS = [25, 50, 100, 200]
+DEFAULT_PAGE_SIZE = 50
+TABLE_COLUMNS = ['id', 'title', 'type', 'state', 'area_path', 'assigned_to']
+TABLE_COLUMN_LABELS = {
+    'id': 'ID',
+    'title': '标题',
+    'type': '类型',
+    'state': '状态',
+    'area_path': 'Area',
+    'assigned_to': '负责人'
+}
+TABLE_SORT_OPTIONS = {
+    'ID': 'id',
+    '标题': 'title',
+    '状态': 'state',
+    '负责人': 'assigned_to',
+    'Area': 'area_path'
+}
 
 
 def get_projects():
@@ -21,8 +48,8 @@ def get_projects():
     
     try:
         core_client = connection.clients.get_core_client()
-        projects = core_client.get_projects()
-        project_names = [project.name for project in projects]
+        # 使用共享的元数据缓存，每次重跑不再请求ADO
+        project_names = list(ado_metadata.get_project_names(core_client))
         add_log(f"成功获取 {len(project_names)} 个ADO项目", "INFO")
         return project_names
     except Exception as e:
@@ -31,8 +58,18 @@ def get_projects():
         return []
 
 
-def get_areas(project_name):
-    """获取指定项目的所有Area，直接使用Azure DevOps SDK"""
+def get_work_item_types(project_name):
+    """获取项目的工作项类型，失败时使用常用类型"""
+    try:
+        wit_client = get_ado_connection().clients.get_work_item_tracking_client()
+        return ado_metadata.get_work_item_types(wit_client, project_name) or DEFAULT_WORK_ITEM_TYPES
+    except Exception as e:
+        add_log(f"获取工作项类型失败，使用默认类型: {str(e)}", "WARNING")
+        return DEFAULT_WORK_ITEM_TYPES
+
+
+def get_areas(project_name, prefix=None):
+    """获取指定项目的所有Area，直接使用Azure DevOps SDK；prefix不为空时只返回以prefix开头的Area（忽略大小写）"""
     try:
         connection = get_ado_connection()
     except Exception as e:
@@ -43,51 +80,13 @@ def get_areas(project_name):
     try:
         wit_client = connection.clients.get_work_item_tracking_client()
         
-        # 获取 Area Path 分类节点
+        # 获取 Area Path 分类节点（按项目缓存，一次展开为有序索引）
         try:
-            # 获取根节点及其所有子节点
-            area_root = wit_client.get_classification_node(
-                project=project_name,
-                structure_group='areas',
-                depth=100  # 获取所有层级
-            )
-            
-            # 递归提取所有Area路径
-            def extract_areas(node, parent_path=""):
-                areas = []
-                current_path = f"{parent_path}\\{node.name}" if parent_path else node.name
-                
-                # 添加当前节点
-                areas.append({
-                    'name': node.name,
-                    'path': current_path,
-                    'id': node.id
-                })
-                
-                # 递归处理子节点
-                if hasattr(node, 'children') and node.children:
-                    for child in node.children:
-                        areas.extend(extract_areas(child, current_path))
-                
-                return areas
-            
-            # 提取所有Area路径
-            all_areas = []
-            if hasattr(area_root, 'children') and area_root.children:
-                for child in area_root.children:
-                    all_areas.extend(extract_areas(child))
-            elif area_root.name:  # 如果没有子节点，返回根节点本身
-                all_areas.append({
-                    'name': area_root.name,
-                    'path': area_root.name,
-                    'id': area_root.id
-                })
-            
-            # 提取Area路径列表
-            areas = [area['path'] for area in all_areas]
+            index = ado_metadata.get_area_index(wit_client, project_name)
+            areas = sorted(index.search_prefix(prefix, limit=None)) if prefix else index.sorted_paths
             
             add_log(f"成功获取项目 {project_name} 的 {len(areas)} 个Area", "INFO")
-            return sorted(areas)
+            return areas
         except Exception as e:
             print(f"获取 Area Path 失败: {str(e)}")
             return []
@@ -97,8 +96,31 @@ def get_areas(project_name):
         return []
 
 
-def get_work_items(project_name, work_item_type="Feature", area_path=None):
-    """获取指定项目的工作项，支持Area过滤，直接使用Azure DevOps SDK"""
+def get_synced_work_items(wit_client, project_name, work_item_type="Feature", area_path=None):
+    """增量同步工作项到本地快照，并从快照返回范围内的工作项"""
+    full_area_path = f"{project_name}\\{area_path}" if area_path else None
+
+    def log_batch(batch_number, batch_ids, error):
+        if error:
+            add_log(f"同步批次 {batch_number} 失败（{len(batch_ids)} 个工作项）: {error}", "ERROR")
+
+    store = get_work_item_store()
+    summary = sync_work_items(wit_client, store, project_name, work_item_type, full_area_path, on_batch=log_batch)
+    mode = "增量" if summary['mode'] == 'incremental' else "全量"
+    add_log(f"{mode}同步完成: {summary['changed']} 个变化, {summary['deleted']} 个删除", "SUCCESS")
+    if summary['failed_batches']:
+        st.warning(f"{len(summary['failed_batches'])} 个批次同步失败，下次刷新时会重试")
+
+    return store.get_scope_items(project_name, work_item_type, full_area_path)
+
+
+def get_work_items(project_name, work_item_type="Feature", area_path=None, include_description=False,
+                   incremental=False):
+    """获取指定项目的工作项，支持Area过滤，直接使用Azure DevOps SDK
+
+    默认不下载描述（description为None），需要时通过get_work_item_description按需获取；
+    incremental为True时只同步变化的工作项到本地快照，并从快照读取
+    """
     try:
         connection = get_ado_connection()
     except Exception as e:
@@ -108,57 +130,51 @@ def get_work_items(project_name, work_item_type="Feature", area_path=None):
     
     try:
         wit_client = connection.clients.get_work_item_tracking_client()
+
+        if incremental:
+            return get_synced_work_items(wit_client, project_name, work_item_type, area_path)
         
         # 构建查询条件
-        where_clause = f"[System.TeamProject] = '{project_name.replace("'", "''")}' AND [System.WorkItemType] = '{work_item_type.replace("'", "''")}'"
+        escaped_project_name = project_name.replace("'", "''")
+        escaped_work_item_type = work_item_type.replace("'", "''")
+        where_clause = f"[System.TeamProject] = '{escaped_project_name}' AND [System.WorkItemType] = '{escaped_work_item_type}'"
         
         # 如果指定了Area，则添加Area过滤条件
         if area_path:
-            where_clause += f" AND [System.AreaPath] = '{project_name}\\{area_path.replace("'", "''")}'"
-        
-        # 查询工作项的WIQL查询
-        wiql_query = Wiql(
-            query=f"""
-            SELECT [System.Id], [System.Title], [System.State], [System.WorkItemType], [System.AssignedTo], [System.AreaPath], [System.Description]
-            FROM WorkItems
-            WHERE {where_clause}
-            ORDER BY [System.Id] DESC
-            """
-        )
+            escaped_area_path = area_path.replace("'", "''")
+            where_clause += f" AND [System.AreaPath] = '{escaped_project_name}\\{escaped_area_path}'"
         
         # 添加调试日志
         area_info = f", Area='{area_path}'" if area_path else ""
         add_log(f"执行WIQL查询: 项目='{project_name}'{area_info}, 类型='{work_item_type}'", "INFO")
-        add_log(f"完整查询语句: {wiql_query.query}", "DEBUG")
+        add_log(f"完整查询语句: {build_id_query(where_clause)}", "DEBUG")
         
-        # 执行查询
-        query_result = wit_client.query_by_wiql(wiql=wiql_query)
+        # 并发分批获取工作项详情（ADO API对批量请求有限制），单批失败不影响其他批次
+        def log_batch(batch_number, batch_ids, error):
+            if error:
+                add_log(f"获取批次 {batch_number} 失败（{len(batch_ids)} 个工作项）: {error}", "ERROR")
+            else:
+                add_log(f"获取批次 {batch_number}: {len(batch_ids)} 个工作项", "INFO")
+
+        # 只请求列表需要的字段，减少响应体积和解析时间
+        fields = get_list_fields(include_description=include_description, include_store_fields=True)
+        # 超过WIQL单次查询上限（20000）时按ID区间分区查询，每个分区查询完成后立即获取详情
+        work_item_ids, batch_items, failed_batches = fetch_partitioned_work_items(
+            wit_client, where_clause, fields=fields, on_batch=log_batch
+        )
         work_items = []
         
-        if query_result.work_items:
-            add_log(f"查询返回 {len(query_result.work_items)} 个工作项", "INFO")
-            # 获取详细的工作项信息
-            work_item_ids = [item.id for item in query_result.work_items]
-            if work_item_ids:
-                add_log(f"工作项ID列表: {work_item_ids[:10]}{'...' if len(work_item_ids) > 10 else ''}", "DEBUG")  # 只显示前10个ID
-                
-                # 分批获取工作项详情，避免404错误（ADO API对批量请求有限制）
-                batch_size = 200  # ADO API推荐的批量大小
-                for i in range(0, len(work_item_ids), batch_size):
-                    batch_ids = work_item_ids[i:i + batch_size]
-                    add_log(f"获取批次 {i//batch_size + 1}: {len(batch_ids)} 个工作项", "INFO")
-                    
-                    batch_items = wit_client.get_work_items(ids=batch_ids)
-                    for item in batch_items:
-                        work_items.append({
-                            'id': item.id,
-                            'title': item.fields.get('System.Title', 'No Title'),
-                            'type': item.fields.get('System.WorkItemType', 'N/A'),
-                            'state': item.fields.get('System.State', 'N/A'),
-                            'area_path': item.fields.get('System.AreaPath', 'N/A'),
-                            'assigned_to': item.fields.get('System.AssignedTo', {}).get('displayName', 'Unassigned') if item.fields.get('System.AssignedTo') else 'Unassigned',
-                            'description': item.fields.get('System.Description', 'N/A')
-                        })
+        if work_item_ids:
+            add_log(f"查询返回 {len(work_item_ids)} 个工作项", "INFO")
+            add_log(f"工作项ID列表: {work_item_ids[:10]}{'...' if len(work_item_ids) > 10 else ''}", "DEBUG")  # 只显示前10个ID
+            # 同时写入本地存储，供本地查询使用
+            record_work_items(batch_items, project_name)
+            for item in batch_items:
+                work_items.append(work_item_to_dict(item, include_description=include_description))
+
+            if failed_batches:
+                missing_count = sum(len(failure['ids']) for failure in failed_batches)
+                st.warning(f"{len(failed_batches)} 个批次获取失败，{missing_count} 个工作项未显示")
         else:
             add_log("查询返回0个工作项", "WARNING")
         
@@ -172,6 +188,196 @@ def get_work_items(project_name, work_item_type="Feature", area_path=None):
         return []
 
 
+def get_work_item_description(work_item_id):
+    """按需获取单个工作项的描述"""
+    try:
+        connection = get_ado_connection()
+        wit_client = connection.clients.get_work_item_tracking_client()
+        return fetch_work_item_description(wit_client, work_item_id)
+    except Exception as e:
+        add_log(f"获取工作项 {work_item_id} 描述失败: {str(e)}", "ERROR")
+        return None
+
+
+def paginate_work_items(work_items, search="", state=None, sort_by="id", descending=True, page=1,
+                        page_size=DEFAULT_PAGE_SIZE):
+    """
+    在服务端（Python中）过滤、排序并分页，只生成当前页的表格行
+
+    Args:
+        work_items (list): 工作项字典列表
+        search (str): 在ID、标题、负责人中搜索的文本（忽略大小写）
+        state (str): 状态过滤，None表示不过滤
+        sort_by (str): 排序字段
+        descending (bool): 是否倒序
+        page (int): 页码（从1开始），超出范围时自动修正
+        page_size (int): 每页行数
+
+    Returns:
+        dict: {'rows': 当前页工作项, 'total': 过滤后的总数, 'page': 实际页码, 'page_count': 总页数}
+    """
+    keyword = (search or "").strip().casefold()
+    filtered = [
+        item for item in work_items
+        if (not state or item.get('state') == state)
+        and (not keyword or keyword in str(item.get('id')).casefold()
+             or keyword in str(item.get('title') or '').casefold()
+             or keyword in str(item.get('assigned_to') or '').casefold())
+    ]
+
+    def sort_key(item):
+        value = item.get(sort_by)
+        if sort_by == 'id':
+            return value or 0
+        return str(value or '').casefold()
+
+    filtered.sort(key=sort_key, reverse=descending)
+
+    page_count = max(1, -(-len(filtered) // page_size))
+    page = min(max(1, int(page)), page_count)
+    start = (page - 1) * page_size
+    return {
+        'rows': filtered[start:start + page_size],
+        'total': len(filtered),
+        'page': page,
+        'page_count': page_count
+    }
+
+
+def render_work_item_table(work_items, title):
+    """以分页表格显示工作项，选中行时加载并显示描述"""
+    st.subheader(f"{title} ({len(work_items)} 个)")
+
+    col1, col2, col3, col4, col5 = st.columns([3, 2, 2, 1, 1])
+    with col1:
+        search = st.text_input("搜索ID/标题/负责人", key="ado_work_item_search")
+    with col2:
+        states = sorted({item['state'] for item in work_items if item.get('state')})
+        state = st.selectbox("状态", ["全部"] + states, key="ado_work_item_state")
+    with col3:
+        sort_label = st.selectbox("排序", list(TABLE_SORT_OPTIONS), key="ado_work_item_sort")
+    with col4:
+        descending = st.checkbox("倒序", value=True, key="ado_work_item_descending")
+    with col5:
+        page_size = st.selectbox("每页", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+                                 key="ado_work_item_page_size")
+
+    result = paginate_work_items(
+        work_items,
+        search=search,
+        state=None if state == "全部" else state,
+        sort_by=TABLE_SORT_OPTIONS[sort_label],
+        descending=descending,
+        page=st.session_state.get('ado_work_item_page', 1),
+        page_size=page_size
+    )
+
+    page = st.number_input(
+        f"页码（共 {result['page_count']} 页，{result['total']} 个工作项）",
+        min_value=1, max_value=result['page_count'], value=result['page'], step=1
+    )
+    if page != result['page']:
+        st.session_state.ado_work_item_page = page
+        st.rerun()
+    st.session_state.ado_work_item_page = result['page']
+
+    # 表格只包含当前页，且不包含描述HTML
+    rows = result['rows']
+    event = st.dataframe(
+        [{column: item.get(column) for column in TABLE_COLUMNS} for item in rows],
+        hide_index=True,
+        column_config=TABLE_COLUMN_LABELS,
+        on_select="rerun",
+        selection_mode="single-row",
+        key="ado_work_item_table"
+    )
+
+    selected_rows = event.selection.rows if event and event.selection else []
+    if selected_rows and selected_rows[0] < len(rows):
+        render_work_item_detail(rows[selected_rows[0]])
+
+
+# 转换为Markdown时需要转义的字符，描述中的文本按原样显示
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]()#+\-.!|<>~])")
+
+
+class _DescriptionParser(HTMLParser):
+    """把工作项描述的HTML转换为Markdown：只保留文本、段落、换行和列表，标签和属性全部丢弃"""
+
+    BLOCK_TAGS = {'p', 'div', 'ul', 'ol', 'table', 'tr', 'blockquote', 'pre',
+                  'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'br':
+            self.parts.append('\\\n')
+        elif tag == 'li':
+            self.parts.append('\n- ')
+        elif tag in ('td', 'th'):
+            self.parts.append(' ')
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'br':
+            self.parts.append('\\\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n\n')
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = re.sub(r'\s+', ' ', data)
+        if text.strip():
+            self.parts.append(_MARKDOWN_SPECIAL.sub(r'\\\1', text))
+
+
+def description_to_markdown(description):
+    """
+    把ADO的HTML描述转换为可以安全显示的Markdown
+
+    描述可以被任何有编辑权限的用户修改，不能作为HTML渲染；
+    转换后只包含转义过的文本和段落、换行、列表结构
+    """
+    parser = _DescriptionParser()
+    parser.feed(description)
+    parser.close()
+    lines = [line.strip() for line in ''.join(parser.parts).split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def render_work_item_detail(item):
+    """显示选中工作项的详情，描述未加载时按需获取并缓存"""
+    descriptions = st.session_state.setdefault('ado_work_item_descriptions', {})
+    description = item.get('description')
+    if description is None:
+        if item['id'] not in descriptions:
+            with st.spinner("正在加载描述..."):
+                descriptions[item['id']] = get_work_item_description(item['id'])
+        description = descriptions[item['id']]
+
+    with st.container(border=True):
+        st.markdown(f"**#{item['id']} - {item['title']}**")
+        st.write(f"**类型:** {item['type']}　**状态:** {item['state']}　**负责人:** {item['assigned_to']}")
+        if item.get('area_path'):
+            st.write(f"**Area:** {item['area_path']}")
+        if description and description != 'N/A':
+            st.markdown(description_to_markdown(description))
+        else:
+            st.caption("没有描述")
+
+
 def add_log(message, level="INFO"):
     """记录日志到全局日志系统"""
     # 添加时间戳
@@ -204,6 +410,11 @@ def show_ado_browser():
         st.info("请安装依赖: pip install azure-devops")
         return
     
+    # 元数据（项目、Area、工作项类型）使用共享缓存，过期后在后台刷新
+    if st.button("🔄 刷新元数据"):
+        ado_metadata.invalidate()
+        add_log("已清除ADO元数据缓存", "INFO")
+    
     # 获取项目列表
     with st.spinner("正在获取项目列表..."):
         projects = get_projects()
@@ -217,49 +428,54 @@ def show_ado_browser():
     selected_project = st.selectbox("选择项目", projects)
     
     if selected_project:
+        # 按路径前缀筛选Area下拉列表，Area较多时便于查找
+        area_prefix = st.text_input("筛选Area", placeholder="输入Area路径开头，如 Team\\Backend").strip()
+
         # 获取Area列表
         with st.spinner("正在获取Area列表..."):
-            areas = get_areas(selected_project)
+            areas = get_areas(selected_project, area_prefix or None)
         
         # 选择Area（如果存在Area）
         if areas:
             area_options = ["全部"] + areas
             selected_area = st.selectbox("选择Area", area_options)
+        elif area_prefix:
+            selected_area = "全部"
+            st.info(f"没有以 {area_prefix} 开头的Area")
         else:
             selected_area = "全部"
             st.info("该项目没有找到Area信息")
         
         # 选择工作项类型
-        work_item_types = ["Feature", "User Story", "Task", "Bug"]
+        work_item_types = get_work_item_types(selected_project)
         selected_type = st.selectbox("选择工作项类型", work_item_types)
         
+        # 描述是体积较大的HTML，默认不下载
+        include_description = st.checkbox("包含描述", value=False)
+        # 增量同步：只获取上次同步以来变化的工作项，刷新开销与变化量成正比
+        incremental = st.checkbox("增量同步（本地快照，不含描述）", value=False)
+        
         # 显示工作项
         if st.button("获取工作项"):
             # 如果选择的Area是"全部"，则不使用Area过滤
             area_filter = selected_area if selected_area != "全部" else None
             
             with st.spinner(f"正在获取 {selected_project} 项目中的{selected_type}工作项..."):
-                work_items = get_work_items(selected_project, selected_type, area_filter)
+                work_items = get_work_items(selected_project, selected_type, area_filter, include_description, incremental)
             
-            if work_items:
-                # 构建标题，包括Area信息
-                area_info = f" (Area: {selected_area})" if selected_area != "全部" else ""
-                st.subheader(f"项目 {selected_project} 中的{selected_type}工作项{area_info} ({len(work_items)} 个)")
-                
-                # 显示工作项表格
-                for item in work_items:
-                    with st.expander(f"#{item['id']} - {item['title']}"):
-                        st.write(f"**ID:** {item['id']}")
-                        st.write(f"**标题:** {item['title']}")
-                        st.write(f"**类型:** {item['type']}")
-                        st.write(f"**状态:** {item['state']}")
-                        st.write(f"**Area:** {item['area_path']}")
-                        st.write(f"**负责人:** {item['assigned_to']}")
-                        
-                        if item['description'] and item['description'] != 'N/A':
-                            st.write(f"**描述:** {item['description']}")
+            # 保存到session_state，翻页、排序等交互重跑时不需要重新获取
+            area_info = f" (Area: {selected_area})" if selected_area != "全部" else ""
+            st.session_state.ado_work_items = work_items
+            st.session_state.ado_work_items_title = f"项目 {selected_project} 中的{selected_type}工作项{area_info}"
+            st.session_state.ado_work_item_page = 1
+            st.session_state.ado_work_item_descriptions = {}
+            if not work_items:
+                add_log(f"项目 {selected_project} 中没有找到 {selected_type} 类型的工作项", "INFO")
+        
+        if 'ado_work_items' in st.session_state:
+            if st.session_state.ado_work_items:
+                render_work_item_table(st.session_state.ado_work_items, st.session_state.ado_work_items_title)
             else:
                 st.info("该项目中没有找到相应类型的工作项")
-                add_log(f"项目 {selected_project} 中没有找到 {selected_type} 类型的工作项", "INFO")
         else:
             st.info(f"选择项目 {selected_project} 和Area {selected_area}，然后点击'获取工作项'按钮来查看{selected_type}工作项")
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+ADO 工作项批量创建模块
+把多个工作项的JSON Patch文档合并为 $batch 请求（每次最多 ADO_BATCH_MAX_REQUESTS 个），
+按输入顺序返回每个工作项的ID或错误；同一次调用中的父子链接通过临时ID在批次内建立
+"""
+import json
+import os
+from urllib.parse import quote
+
+# 单个 $batch 请求中包含的工作项数量上限（服务端限制为200）
+ADO_BATCH_MAX_REQUESTS = int(os.getenv("ADO_BATCH_MAX_REQUESTS", "200"))
+# $batch 接口只在这个API版本下公开
+ADO_BATCH_API_VERSION = "4.1"
+# 创建Feature时使用的默认Area路径
+ADO_DEFAULT_AREA_PATH = os.getenv(
+    "ADO_AREA_PATH", "Move and Sell\\01. Move and Sell Portfolio\\Iron Ore Product Group\\Portside IMS"
+)
+
+# 子工作项指向父工作项的链接类型
+PARENT_LINK_TYPE = "System.LinkTypes.Hierarchy-Reverse"
+
+
+def feature_fields(summary, description="", problem_statement="", acceptance_criteria="",
+                   work_item_type="Feature", area_path=ADO_DEFAULT_AREA_PATH):
+    """
+    创建Feature时写入的字段，只包含ADO中实际存在的字段，空值不写入
+
+    Returns:
+        dict: 字段引用名 -> 值（按写入顺序）
+    """
+    fields = {"System.Title": summary}
+    if problem_statement:
+        fields["Custom.Problem"] = problem_statement
+    if description:
+        fields["System.Description"] = description
+    if acceptance_criteria:
+        fields["Custom.Acceptance"] = acceptance_criteria
+    fields["System.WorkItemType"] = work_item_type
+    if area_path:
+        fields["System.AreaPath"] = area_path
+    return fields
+
+
+def get_work_item_url(org_url, work_item_id):
+    """工作项的API地址，用于链接关系；未创建的工作项使用负数临时ID"""
+    return f"{org_url.rstrip('/')}/_apis/wit/workItems/{work_item_id}"
+
+
+def build_create_request(project, work_item_type, fields, temp_id=None, parent_url=None):
+    """
+    构建 $batch 中的一个创建请求
+
+    Args:
+        project (str): 项目名称
+        work_item_type (str): 工作项类型
+        fields (dict): 字段引用名 -> 值
+        temp_id (int): 负数临时ID，供同一批次中的子工作项引用
+        parent_url (str): 父工作项的API地址
+    """
+    document = []
+    if temp_id is not None:
+        document.append({"op": "add", "path": "/id", "value": temp_id})
+    for name, value in fields.items():
+        document.append({"op": "add", "path": f"/fields/{name}", "value": value})
+    if parent_url:
+        document.append({"op": "add", "path": "/relations/-",
+                         "value": {"rel": PARENT_LINK_TYPE, "url": parent_url}})
+    return {
+        "method": "PATCH",
+        # 项目名称和类型可能包含空格等字符（如 "User Story"），需要编码后放入子请求的URI
+        "uri": f"/{quote(project, safe='')}/_apis/wit/workitems/${quote(work_item_type, safe='')}"
+               f"?api-version={ADO_BATCH_API_VERSION}",
+        "headers": {"Content-Type": "application/json-patch+json"},
+        "body": document,
+    }
+
+
+def post_batch(wit_client, requests):
+    """
+    通过Work Item Tracking客户端的连接发送一个 $batch 请求
+
+    Returns:
+        list: 与requests顺序一致的响应 {'code', 'body'}
+    """
+    url = f"{wit_client.config.base_url.rstrip('/')}/_apis/wit/$batch"
+    request = wit_client._client.post(url, params={"api-version": ADO_BATCH_API_VERSION})
+    response = wit_client._send_request(
+        request, headers={"Content-Type": "application/json", "Accept": "application/json"}, content=requests
+    )
+    return response.json().get("value", [])
+
+
+def _parse_response(response):
+    """解析单个响应，返回 (工作项ID, 错误信息)"""
+    body = response.get("body")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+    code = response.get("code")
+    if code is not None and 200 <= int(code) < 300 and isinstance(body, dict) and body.get("id") is not None:
+        return int(body["id"]), None
+    message = body.get("message") if isinstance(body, dict) else body
+    return None, f"HTTP {code}: {message}"
+
+
+def _submission_order(items):
+    """
+    按父子层级排序（父工作项在前，同层按输入顺序），并检查parent引用
+
+    Returns:
+        tuple: (提交顺序的输入序号列表, {输入序号: 错误信息})
+    """
+    errors = {}
+    depths = {}
+    for index, item in enumerate(items):
+        chain = []
+        current = index
+        while current is not None and current not in depths:
+            if current in chain:
+                for member in chain[chain.index(current):]:
+                    errors[member] = "父子关系存在循环"
+                break
+            chain.append(current)
+            parent = items[current].get("parent")
+            if parent is not None and (not isinstance(parent, int) or not 0 <= parent < len(items)):
+                errors[current] = f"无效的parent序号: {parent}"
+                parent = None
+            current = parent
+        depth = depths[current] + 1 if current is not None and current in depths else 0
+        for member in reversed(chain):
+            depths[member] = depth
+            depth += 1
+    order = sorted((index for index in range(len(items)) if index not in errors),
+                   key=lambda index: (depths[index], index))
+    return order, errors
+
+
+def bulk_create_work_items(wit_client, items, project, org_url, default_type="Feature",
+                           max_requests=ADO_BATCH_MAX_REQUESTS, send=post_batch, existing=None):
+    """
+    批量创建工作项
+
+    每个工作项是一个字典：
+      - summary / description / problem_statement / acceptance_criteria: 与create_ado_feature相同的字段
+      - work_item_type: 工作项类型，默认default_type
+      - area_path: Area路径，默认ADO_DEFAULT_AREA_PATH
+      - fields: 额外字段（字段引用名 -> 值），覆盖上面的字段
+      - parent: 同一次调用中父工作项的序号；parent_id: 已存在的父工作项ID
+
+    父工作项总是先于子工作项提交；父子在同一批次时用临时ID链接，
+    父工作项创建失败时子工作项不再提交
+
+    Args:
+        wit_client: Work Item Tracking客户端
+        items (list): 工作项字典列表
+        project (str): 项目名称
+        org_url (str): 组织地址，用于构建链接
+        default_type (str): 默认工作项类型
+        max_requests (int): 每个 $batch 请求的工作项数量上限
+        send (callable): send(wit_client, requests) 发送一个 $batch 请求并返回响应列表
+        existing (dict): {输入序号: 已创建的工作项ID}，这些工作项不再提交，子工作项直接链接到已有ID
+
+    Returns:
+        list: 与输入顺序一致的结果 {'index', 'id', 'error'}
+    """
+    existing = existing or {}
+    results = [{"index": index, "id": existing.get(index), "error": None} for index in range(len(items))]
+    order, errors = _submission_order(items)
+    for index, error in errors.items():
+        results[index]["error"] = error
+    order = [index for index in order if index not in existing]
+
+    for start in range(0, len(order), max_requests):
+        chunk = order[start:start + max_requests]
+        chunk_set = set(chunk)
+        submitted, requests = [], []
+        for index in chunk:
+            item = items[index]
+            parent_url = None
+            if item.get("parent") is not None:
+                parent = item["parent"]
+                if results[parent]["id"] is not None:
+                    parent_url = get_work_item_url(org_url, results[parent]["id"])
+                elif parent in chunk_set and results[parent]["error"] is None:
+                    parent_url = get_work_item_url(org_url, -(parent + 1))
+                else:
+                    results[index]["error"] = f"父工作项（序号 {parent}）创建失败"
+                    continue
+            elif item.get("parent_id") is not None:
+                parent_url = get_work_item_url(org_url, item["parent_id"])
+
+            work_item_type = item.get("work_item_type") or default_type
+            fields = feature_fields(
+                item.get("summary", ""), item.get("description", ""), item.get("problem_statement", ""),
+                item.get("acceptance_criteria", ""), work_item_type, item.get("area_path", ADO_DEFAULT_AREA_PATH)
+            )
+            fields.update(item.get("fields") or {})
+            submitted.append(index)
+            requests.append(build_create_request(project, work_item_type, fields, -(index + 1), parent_url))
+
+        if not requests:
+            continue
+        try:
+            responses = send(wit_client, requests)
+        except Exception as e:
+            for index in submitted:
+                results[index]["error"] = str(e)
+            continue
+
+        for position, index in enumerate(submitted):
+            if position >= len(responses):
+                results[index]["error"] = "$batch 响应中缺少该工作项"
+                continue
+            results[index]["id"], results[index]["error"] = _parse_response(responses[position])
+
+    return results
@@ -0,0 +1,109 @@
+"""
+ADO 工作项读取模块
+并发分批获取工作项详情，供工具和浏览器共用
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ADO API单次批量读取最多200个工作项
+ADO_BATCH_SIZE = 200
+# 同时进行中的批次请求数量上限
+ADO_FETCH_CONCURRENCY = int(os.getenv("ADO_FETCH_CONCURRENCY", "4"))
+
+# 列表视图所需字段；描述是体积较大的HTML，按需单独加载
+LIST_FIELDS = ['System.Id', 'System.Title', 'System.WorkItemType', 'System.State', 'System.AssignedTo']
+AREA_PATH_FIELD = 'System.AreaPath'
+DESCRIPTION_FIELD = 'System.Description'
+# 写入本地工作项存储时额外需要的字段
+STORE_FIELDS = ['System.TeamProject', 'System.ChangedDate']
+
+
+def get_list_fields(include_area_path=True, include_description=True, include_store_fields=False):
+    """返回批量读取时需要请求的字段列表，include_store_fields为True时包含写入本地存储所需的字段"""
+    fields = list(LIST_FIELDS)
+    if include_area_path or include_store_fields:
+        fields.append(AREA_PATH_FIELD)
+    if include_description:
+        fields.append(DESCRIPTION_FIELD)
+    if include_store_fields:
+        fields.extend(STORE_FIELDS)
+    return fields
+
+
+def work_item_to_dict(item, include_area_path=True, include_description=True):
+    """
+    将工作项转换为列表视图使用的字典
+
+    未加载描述时description为None，可通过fetch_work_item_description按需获取
+    """
+    fields = item.fields
+    result = {
+        'id': item.id,
+        'title': fields.get('System.Title', 'No Title'),
+        'type': fields.get('System.WorkItemType', 'N/A'),
+        'state': fields.get('System.State', 'N/A'),
+    }
+    if include_area_path:
+        result['area_path'] = fields.get(AREA_PATH_FIELD, 'N/A')
+    result['assigned_to'] = fields.get('System.AssignedTo', {}).get('displayName', 'Unassigned') if fields.get('System.AssignedTo') else 'Unassigned'
+    result['description'] = fields.get(DESCRIPTION_FIELD, 'N/A') if include_description else None
+    return result
+
+
+def fetch_work_item_description(wit_client, work_item_id):
+    """按需获取单个工作项的描述"""
+    item = wit_client.get_work_item(id=int(work_item_id), fields=[DESCRIPTION_FIELD])
+    return item.fields.get(DESCRIPTION_FIELD, 'N/A')
+
+
+def fetch_work_items(wit_client, work_item_ids, fields=None, batch_size=ADO_BATCH_SIZE,
+                     max_in_flight=ADO_FETCH_CONCURRENCY, on_batch=None):
+    """
+    并发分批获取工作项详情
+
+    结果按输入ID的顺序（即WIQL的排序）返回；单个批次失败只记录错误，不影响其他批次，
+    只有全部批次都失败时才抛出异常
+
+    Args:
+        wit_client: Work Item Tracking客户端
+        work_item_ids (list): 工作项ID列表
+        fields (list): 只请求这些字段，None表示返回全部字段
+        batch_size (int): 每批ID数量
+        max_in_flight (int): 同时进行中的批次数量上限
+        on_batch (callable): 每批完成后在调用线程中回调 on_batch(批次序号, 批次ID列表, 异常或None)
+
+    Returns:
+        tuple: (工作项列表, 失败批次列表)，失败批次为 {'batch': 序号, 'ids': ID列表, 'error': 错误信息}
+    """
+    batches = [work_item_ids[i:i + batch_size] for i in range(0, len(work_item_ids), batch_size)]
+    if not batches:
+        return [], []
+
+    def fetch(batch_ids):
+        # error_policy='omit'：批次中已删除的工作项返回None，而不是让整批失败
+        return wit_client.get_work_items(ids=batch_ids, fields=fields, error_policy='omit')
+
+    results = [None] * len(batches)
+    failures = []
+    workers = max(1, min(max_in_flight, len(batches)))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, batch_ids): index for index, batch_ids in enumerate(batches)}
+        for future in as_completed(futures):
+            index = futures[future]
+            error = None
+            try:
+                results[index] = [item for item in (future.result() or []) if item is not None]
+            except Exception as e:
+                error = e
+                failures.append({'batch': index + 1, 'ids': batches[index], 'error': str(e)})
+
+            if on_batch:
+                on_batch(index + 1, batches[index], error)
+
+    failures.sort(key=lambda failure: failure['batch'])
+    if len(failures) == len(batches):
+        raise Exception(failures[0]['error'])
+
+    items = [item for batch_items in results if batch_items for item in batch_items]
+    return items, failures
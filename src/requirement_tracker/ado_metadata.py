@@ -0,0 +1,281 @@
+"""
+ADO 元数据模块
+缓存项目列表、Area路径树和工作项类型，供工具和浏览器共用。
+缓存过期后先返回旧值并在后台刷新（stale-while-revalidate），界面交互不会阻塞在元数据请求上
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# 元数据缓存时间（秒），超过后返回旧值并在后台刷新
+ADO_METADATA_TTL = int(os.getenv("ADO_METADATA_TTL", "600"))
+
+# 常用工作项类型，无法获取项目的类型定义时使用，并排在列表前面
+DEFAULT_WORK_ITEM_TYPES = ["Feature", "User Story", "Task", "Bug"]
+
+AREA_SEPARATOR = '\\'
+# 在排序中紧跟分隔符之后的字符，用于确定 "X\" 前缀区间的上界
+_AFTER_SEPARATOR = chr(ord(AREA_SEPARATOR) + 1)
+
+
+def flatten_area_tree(area_root):
+    """
+    非递归地把分类节点树展开为列表（先序，与ADO中的层级顺序一致）
+
+    路径不包含根节点（项目名）；根节点没有子节点时返回根节点本身
+    """
+    children = getattr(area_root, 'children', None)
+    if not children:
+        return [{'name': area_root.name, 'path': area_root.name, 'id': area_root.id}] if area_root.name else []
+
+    areas = []
+    # 逆序入栈，出栈顺序即先序遍历顺序
+    stack = [(child, "") for child in reversed(children)]
+    while stack:
+        node, parent_path = stack.pop()
+        path = f"{parent_path}{AREA_SEPARATOR}{node.name}" if parent_path else node.name
+        areas.append({'name': node.name, 'path': path, 'id': node.id})
+        node_children = getattr(node, 'children', None)
+        if node_children:
+            stack.extend((child, path) for child in reversed(node_children))
+    return areas
+
+
+class AreaPathIndex:
+    """
+    Area路径索引
+
+    路径按忽略大小写的键排序，子树查询和前缀查询都通过二分查找定位区间，复杂度 O(log n + k)。
+    索引在多个会话之间共享，对外只返回副本，调用方修改返回值不会破坏索引
+    """
+
+    def __init__(self, areas):
+        self._areas = tuple(dict(area) for area in areas)
+        self._by_path = {area['path']: area for area in self._areas}
+        entries = sorted((area['path'].casefold(), area['path']) for area in self._areas)
+        self._keys = tuple(key for key, _ in entries)
+        self._paths = tuple(path for _, path in entries)
+        # 按字母顺序（区分大小写）排列的全部路径，供下拉列表使用
+        self._sorted_paths = tuple(sorted(self._paths))
+
+    def __len__(self):
+        return len(self._areas)
+
+    @property
+    def areas(self):
+        """全部Area（先序，与ADO中的层级顺序一致）的副本"""
+        return [dict(area) for area in self._areas]
+
+    @property
+    def sorted_paths(self):
+        """按字母顺序排列的全部路径的副本"""
+        return list(self._sorted_paths)
+
+    def get_areas(self, paths):
+        """按给定顺序返回路径对应的Area副本，不存在的路径被忽略"""
+        return [dict(self._by_path[path]) for path in paths if path in self._by_path]
+
+    def _range(self, low_key, high_key):
+        return list(self._paths[bisect_left(self._keys, low_key):bisect_left(self._keys, high_key)])
+
+    def contains(self, path):
+        """路径是否存在（忽略大小写）"""
+        key = path.casefold()
+        position = bisect_left(self._keys, key)
+        return position < len(self._keys) and self._keys[position] == key
+
+    def descendants(self, path, include_self=True):
+        """返回path下的全部Area（按路径排序）"""
+        key = path.casefold().rstrip(AREA_SEPARATOR)
+        result = self._range(key + AREA_SEPARATOR, key + _AFTER_SEPARATOR)
+        if include_self and self.contains(key):
+            result = [self._paths[bisect_left(self._keys, key)]] + result
+        return result
+
+    def search_prefix(self, prefix, limit=20):
+        """输入联想：返回以prefix开头（忽略大小写）的路径"""
+        key = prefix.casefold()
+        start = bisect_left(self._keys, key)
+        result = []
+        for position in range(start, len(self._keys)):
+            if not self._keys[position].startswith(key) or (limit is not None and len(result) >= limit):
+                break
+            result.append(self._paths[position])
+        return result
+
+
+def _start_background(func):
+    """在后台守护线程中执行"""
+    threading.Thread(target=func, daemon=True).start()
+
+
+class MetadataCache:
+    """
+    带TTL的元数据缓存
+
+    - 未缓存：同步加载
+    - 未过期：直接返回
+    - 已过期：返回旧值，同时在后台刷新（同一个键同时只有一个刷新任务），刷新失败时保留旧值
+    """
+
+    def __init__(self, ttl=ADO_METADATA_TTL, clock=time.monotonic, run_in_background=_start_background):
+        self.ttl = ttl
+        self._clock = clock
+        self._run_in_background = run_in_background
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = set()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def get(self, key, loader, refresh=False):
+        """
+        获取缓存值
+
+        Args:
+            key: 缓存键
+            loader (callable): 无参函数，加载最新值
+            refresh (bool): 忽略缓存同步重新加载
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or refresh:
+                self._stats['misses'] += 1
+            else:
+                value, loaded_at = entry
+                if self._clock() - loaded_at < self.ttl:
+                    self._stats['hits'] += 1
+                    return value
+
+                self._stats['stale_hits'] += 1
+                if key in self._refreshing:
+                    return value
+                self._refreshing.add(key)
+
+        if entry is not None and not refresh:
+            self._run_in_background(lambda: self._refresh(key, loader))
+            return value
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, self._clock())
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats['refresh_errors'] += 1
+            print(f"后台刷新元数据 {key} 失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, predicate=None):
+        """删除缓存，predicate(key)为True的键会被删除，None表示全部"""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if predicate(key)]:
+                    del self._entries[key]
+
+    def get_stats(self):
+        """返回缓存命中情况"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+def get_org_url(client):
+    """
+    客户端所属组织的地址（规范化），作为缓存键的一部分，不同组织的元数据互不混用
+
+    优先使用客户端配置中的base_url，取不到时使用ADO_ORG_URL环境变量
+    """
+    base_url = getattr(getattr(client, 'config', None), 'base_url', None)
+    if not isinstance(base_url, str) or not base_url:
+        base_url = os.getenv("ADO_ORG_URL", "")
+    return base_url.rstrip('/').lower()
+
+
+class AdoMetadataService:
+    """ADO元数据服务：项目列表、Area路径索引和工作项类型，按 (组织, 项目) 缓存"""
+
+    def __init__(self, ttl=ADO_METADATA_TTL, clock=time.monotonic, run_in_background=_start_background):
+        self.cache = MetadataCache(ttl, clock, run_in_background)
+
+    def get_project_names(self, core_client, refresh=False):
+        """获取全部项目名称"""
+        return self.cache.get(
+            ('projects', get_org_url(core_client)),
+            lambda: [project.name for project in core_client.get_projects()],
+            refresh
+        )
+
+    def get_area_index(self, wit_client, project_name, refresh=False):
+        """
+        获取项目的Area路径索引
+
+        Args:
+            wit_client: Work Item Tracking客户端
+            project_name (str): 项目名称
+            refresh (bool): 忽略缓存重新获取
+
+        Returns:
+            AreaPathIndex: Area路径索引
+        """
+        def load():
+            area_root = wit_client.get_classification_node(
+                project=project_name,
+                structure_group='areas',
+                depth=100  # 获取所有层级
+            )
+            return AreaPathIndex(flatten_area_tree(area_root))
+
+        return self.cache.get(('areas', get_org_url(wit_client), project_name), load, refresh)
+
+    def get_work_item_types(self, wit_client, project_name, refresh=False):
+        """获取项目中可用的工作项类型名称，常用类型排在前面"""
+        def load():
+            names = [
+                work_item_type.name for work_item_type in (wit_client.get_work_item_types(project=project_name) or [])
+                if not getattr(work_item_type, 'is_disabled', False)
+            ]
+            common = [name for name in DEFAULT_WORK_ITEM_TYPES if name in names]
+            return common + sorted(name for name in names if name not in common)
+
+        return self.cache.get(('types', get_org_url(wit_client), project_name), load, refresh)
+
+    def invalidate(self, project_name=None, org_url=None):
+        """
+        清除缓存
+
+        Args:
+            project_name (str): 只清除该项目的Area和类型，None表示全部项目（包括项目列表）
+            org_url (str): 只清除该组织的缓存，None表示全部组织
+        """
+        org = org_url.rstrip('/').lower() if org_url else None
+
+        def matches(key):
+            if org is not None and key[1] != org:
+                return False
+            return project_name is None or len(key) > 2 and key[2] == project_name
+
+        if project_name is None and org is None:
+            self.cache.invalidate()
+        else:
+            self.cache.invalidate(matches)
+
+    def get_stats(self):
+        """返回缓存命中情况"""
+        return self.cache.get_stats()
+
+
+# 进程级共享的ADO元数据服务
+ado_metadata = AdoMetadataService()
@@ -0,0 +1,184 @@
+"""
+ADO WIQL 分区查询模块
+WIQL单次最多返回20000个工作项，超过时按 System.Id 区间拆分查询并发执行，
+按ID倒序合并去重，并把每个分区的ID依次交给批量详情读取
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .ado_fetch import ADO_BATCH_SIZE, fetch_work_items
+
+# WIQL单次查询返回数量上限
+WIQL_MAX_RESULTS = int(os.getenv("WIQL_MAX_RESULTS", "20000"))
+# 同时进行中的分区查询数量上限
+WIQL_PARTITION_CONCURRENCY = int(os.getenv("WIQL_PARTITION_CONCURRENCY", "4"))
+# 分区按预计填满上限的比例划分，留出余量减少分区超限后的补充查询
+WIQL_PARTITION_FILL = 0.5
+
+
+def build_id_query(where_clause, low=None, high=None):
+    """
+    构建只返回ID的WIQL
+
+    Args:
+        where_clause (str): 过滤条件（已转义）
+        low (int): ID下限（包含），None表示不限制
+        high (int): ID上限（不包含），None表示不限制
+    """
+    conditions = [f"({where_clause})"]
+    if low is not None:
+        conditions.append(f"[System.Id] >= {int(low)}")
+    if high is not None:
+        conditions.append(f"[System.Id] < {int(high)}")
+    return f"""
+            SELECT [System.Id]
+            FROM WorkItems
+            WHERE {' AND '.join(conditions)}
+            ORDER BY [System.Id] DESC
+            """
+
+
+def _run_query(wit_client, where_clause, low, high, top, time_precision):
+    try:
+        from azure.devops.v7_1.work_item_tracking.models import Wiql
+    except ImportError as e:
+        raise ImportError(
+            "Missing Azure DevOps dependencies for WIQL queries. Install with: pip install req_agent[azure]"
+        ) from e
+
+    wiql = Wiql(query=build_id_query(where_clause, low, high))
+    if time_precision is None:
+        query_result = wit_client.query_by_wiql(wiql=wiql, top=top)
+    else:
+        query_result = wit_client.query_by_wiql(wiql=wiql, time_precision=time_precision, top=top)
+    return [reference.id for reference in (query_result.work_items or [])]
+
+
+def query_id_range(wit_client, where_clause, low, high, max_results=WIQL_MAX_RESULTS, time_precision=None):
+    """
+    返回 low <= Id < high 范围内全部符合条件的ID（倒序）
+
+    结果达到上限时，返回的是区间内ID最大的max_results个，
+    以其中最小的ID为新的上限继续查询剩余部分
+    """
+    ids = []
+    while high is None or low is None or low < high:
+        page = _run_query(wit_client, where_clause, low, high, max_results, time_precision)
+        ids.extend(page)
+        if len(page) < max_results:
+            break
+        high = page[-1]
+    return ids
+
+
+def _plan_ranges(boundary, span):
+    """把 [1, boundary) 按span划分为从高到低的ID区间"""
+    ranges = []
+    high = boundary
+    while high > 1:
+        low = max(1, high - span)
+        ranges.append((low, high))
+        high = low
+    return ranges
+
+
+def iter_work_item_id_partitions(wit_client, where_clause, max_results=WIQL_MAX_RESULTS,
+                                 max_in_flight=WIQL_PARTITION_CONCURRENCY, time_precision=None):
+    """
+    分区查询符合条件的工作项ID，按ID倒序逐个分区返回
+
+    先执行一次普通查询，未达到上限时直接返回（与单次查询相同）。
+    达到上限时，这次结果正好是ID最大的一段；根据这段的ID密度把剩余的ID空间划分为多个区间并发查询，
+    单个区间仍超过上限时在该区间内继续向下查询。分区按顺序返回，调用方可以边查询边读取详情
+
+    Yields:
+        list: 一个分区的ID（倒序，已去重）
+    """
+    first = _run_query(wit_client, where_clause, None, None, max_results, time_precision)
+    seen = set(first)
+    yield first
+    if len(first) < max_results:
+        return
+
+    boundary, max_id = first[-1], first[0]
+    # 第一段在 max_results 个ID内跨越的ID空间，按填充比例估算每个分区的跨度
+    span = max(1, int((max_id - boundary + 1) * WIQL_PARTITION_FILL))
+    ranges = _plan_ranges(boundary, span)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(ranges) or 1)),
+                            thread_name_prefix="req-agent-wiql") as executor:
+        futures = [
+            executor.submit(query_id_range, wit_client, where_clause, low, high, max_results, time_precision)
+            for low, high in ranges
+        ]
+        for future in futures:
+            partition = [work_item_id for work_item_id in future.result() if work_item_id not in seen]
+            seen.update(partition)
+            if partition:
+                yield partition
+
+
+def query_work_item_ids(wit_client, where_clause, max_results=WIQL_MAX_RESULTS,
+                        max_in_flight=WIQL_PARTITION_CONCURRENCY, time_precision=None):
+    """返回全部符合条件的工作项ID（倒序），超过WIQL上限时自动分区"""
+    return [
+        work_item_id
+        for partition in iter_work_item_id_partitions(wit_client, where_clause, max_results,
+                                                      max_in_flight, time_precision)
+        for work_item_id in partition
+    ]
+
+
+def fetch_partitioned_work_items(wit_client, where_clause, fields=None, on_batch=None,
+                                 max_results=WIQL_MAX_RESULTS, time_precision=None):
+    """
+    分区查询ID并读取工作项详情
+
+    每个分区的ID查询完成后立即交给fetch_work_items读取详情，其余分区的查询同时在后台进行
+
+    Args:
+        wit_client: Work Item Tracking客户端
+        where_clause (str): WIQL过滤条件（已转义）
+        fields (list): 只请求这些字段，None表示返回全部字段
+        on_batch (callable): 透传给fetch_work_items的批次回调，批次序号在全部分区中连续编号
+        max_results (int): WIQL单次查询返回数量上限
+        time_precision (bool): 透传给query_by_wiql
+
+    Returns:
+        tuple: (全部ID列表, 工作项列表, 失败批次列表)，全部批次都失败时抛出异常
+    """
+    all_ids, items, failures = [], [], []
+    batch_offset = 0
+
+    for partition in iter_work_item_id_partitions(wit_client, where_clause, max_results,
+                                                  time_precision=time_precision):
+        all_ids.extend(partition)
+        if not partition:
+            continue
+
+        offset = batch_offset
+        partition_callback = None
+        if on_batch:
+            def partition_callback(batch_number, batch_ids, error, offset=offset):
+                on_batch(offset + batch_number, batch_ids, error)
+
+        try:
+            partition_items, partition_failures = fetch_work_items(
+                wit_client, partition, fields=fields, on_batch=partition_callback
+            )
+        except Exception as e:
+            # 该分区的批次全部失败
+            partition_items = []
+            partition_failures = [
+                {'batch': index + 1, 'ids': partition[start:start + ADO_BATCH_SIZE], 'error': str(e)}
+                for index, start in enumerate(range(0, len(partition), ADO_BATCH_SIZE))
+            ]
+
+        items.extend(partition_items)
+        for failure in partition_failures:
+            failures.append(dict(failure, batch=offset + failure['batch']))
+        batch_offset += (len(partition) + ADO_BATCH_SIZE - 1) // ADO_BATCH_SIZE
+
+    if failures and not items:
+        raise Exception(failures[0]['error'])
+    return all_ids, items, failures
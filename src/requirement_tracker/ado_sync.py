@@ -0,0 +1,136 @@
+"""
+ADO 工作项增量同步模块
+按 System.ChangedDate 水位线只同步变化的工作项，并通过回收站接口处理删除
+"""
+import re
+from datetime import datetime, timezone
+
+from .ado_fetch import get_list_fields
+from .ado_query import build_id_query, fetch_partitioned_work_items
+from .work_item_store import make_scope, work_item_to_row
+
+
+def get_sync_fields():
+    """同步时请求的字段：列表字段 + 项目和修改时间（不含描述）"""
+    return get_list_fields(include_description=False, include_store_fields=True)
+
+
+def _escape(value):
+    """转义WIQL字符串中的单引号"""
+    return str(value).replace("'", "''")
+
+
+_FRACTION = re.compile(r"\.(\d+)")
+
+
+def parse_changed_date(value):
+    """
+    把ADO返回的ChangedDate解析为带时区的datetime
+
+    ADO时间戳的小数秒位数不固定（如 05.1Z 和 05.12Z），字符串顺序不等于时间顺序；
+    小数秒补齐或截断为6位，Z按UTC处理，没有时区的时间按UTC处理
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        if text.endswith(("Z", "z")):
+            text = text[:-1] + "+00:00"
+        text = _FRACTION.sub(lambda match: "." + match.group(1)[:6].ljust(6, "0"), text, count=1)
+        parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def latest_changed_date(values):
+    """按时间（而不是字符串顺序）返回最晚的ChangedDate原值，空列表返回None"""
+    return max(values, key=parse_changed_date, default=None)
+
+
+def build_sync_where_clause(project_name, work_item_type, area_path=None, since=None):
+    """
+    构建同步使用的WIQL过滤条件
+
+    全量同步按 (项目, 类型, Area) 过滤；增量同步只按项目和ChangedDate过滤，
+    这样类型或Area被修改而移出范围的工作项也会被同步到
+    """
+    where_clause = f"[System.TeamProject] = '{_escape(project_name)}'"
+    if since:
+        where_clause += f" AND [System.ChangedDate] >= '{_escape(since)}'"
+    else:
+        where_clause += f" AND [System.WorkItemType] = '{_escape(work_item_type)}'"
+        if area_path:
+            where_clause += f" AND [System.AreaPath] = '{_escape(area_path)}'"
+    return where_clause
+
+
+def build_sync_wiql(project_name, work_item_type, area_path=None, since=None):
+    """构建同步使用的WIQL"""
+    return build_id_query(build_sync_where_clause(project_name, work_item_type, area_path, since))
+
+
+def get_deleted_work_item_ids(wit_client, project_name):
+    """从回收站获取项目中已删除的工作项ID"""
+    references = wit_client.get_deleted_work_item_shallow_references(project=project_name) or []
+    return [reference.id for reference in references if getattr(reference, 'id', None) is not None]
+
+
+def sync_work_items(wit_client, store, project_name, work_item_type="Feature", area_path=None,
+                    full=False, on_batch=None):
+    """
+    同步工作项到本地存储
+
+    首次同步（或full=True）时全量获取范围内的工作项，并删除本地多余的工作项；
+    之后只获取ChangedDate不早于水位线的工作项，并删除回收站中的工作项。
+    有批次失败时不推进水位线，下次同步会重新获取这些变化
+
+    Args:
+        wit_client: Work Item Tracking客户端
+        store (WorkItemStore): 本地存储
+        project_name (str): 项目名称
+        work_item_type (str): 工作项类型
+        area_path (str): 完整Area路径，None表示不过滤
+        full (bool): 是否强制全量同步
+        on_batch (callable): 透传给fetch_work_items的批次回调（批次序号在全部分区中连续编号）
+
+    Returns:
+        dict: 同步摘要 {'mode', 'changed', 'deleted', 'watermark', 'failed_batches'}
+    """
+    watermark = None if full else store.get_watermark(make_scope(project_name, work_item_type, area_path))
+    mode = 'incremental' if watermark else 'full'
+
+    where_clause = build_sync_where_clause(project_name, work_item_type, area_path, since=watermark)
+    # 超过WIQL单次查询上限时按ID区间分区查询，全量同步需要完整的ID集合来判断本地多余的工作项
+    # time_precision=True：ChangedDate按时间而不是按日期比较
+    work_item_ids, items, failed_batches = fetch_partitioned_work_items(
+        wit_client, where_clause, fields=get_sync_fields(), on_batch=on_batch, time_precision=True
+    )
+
+    rows = [work_item_to_row(item, project_name) for item in items]
+    store.upsert(rows)
+
+    deleted = 0
+    if mode == 'full':
+        if not failed_batches:
+            # 本地有但服务端范围内已不存在的工作项（已删除或已移出范围）
+            stale_ids = store.get_scope_ids(project_name, work_item_type, area_path) - set(work_item_ids)
+            deleted = store.delete(stale_ids)
+    else:
+        deleted = store.delete(get_deleted_work_item_ids(wit_client, project_name))
+
+    new_watermark = watermark
+    if not failed_batches:
+        changed_dates = [row['changed_date'] for row in rows if row['changed_date']]
+        if changed_dates:
+            new_watermark = latest_changed_date(changed_dates + ([watermark] if watermark else []))
+        # ChangedDate使用>=比较，水位线上的工作项下次会被重复获取，写入是幂等的
+        store.set_watermark(project_name, work_item_type, area_path, new_watermark)
+
+    return {
+        'mode': mode,
+        'changed': len(rows),
+        'deleted': deleted,
+        'watermark': new_watermark,
+        'failed_batches': failed_batches
+    }
@@ -4,6 +4,7 @@ from .tools import (
     create_ado_feature,
     create_confluence_page,
     update_confluence_title,
+    query_local_work_items,
     # 如果你还有其他工具，如 create_jira_feature，可一并导入
 )
 
@@ -59,7 +60,7 @@ def create_publisher(llm):
         You provide real identifiers and links from the created items, ensuring proper integration with enterprise systems.
         You are capable of parsing JSON data to extract the necessary fields for creating work items.
         """,
-        tools=[create_ado_feature, create_confluence_page, update_confluence_title],  # 使用实际工具来创建工作项和文档
+        tools=[create_ado_feature, create_confluence_page, update_confluence_title, query_local_work_items],  # 使用实际工具来创建工作项和文档
         llm=llm,
         allow_delegation=False,  # Publishing tasks don't need delegation either
         verbose=True
@@ -0,0 +1,301 @@
+"""
+需求分析结果缓存模块
+按 (规范化的需求文本, 模型, 提示词版本) 缓存分析师输出的结构化JSON，重复提交的需求不再调用LLM；
+可选的近似匹配用本地向量索引查找相似需求，直接复用或作为参考提供给分析师
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(".cache", "analysis.db"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+# 近似匹配方式：off 不使用；seed 把相似需求的结果作为参考交给分析师；return 直接复用相似需求的结果
+ANALYSIS_CACHE_NEAR_MODE = os.getenv("ANALYSIS_CACHE_NEAR_MODE", "seed")
+# 近似匹配的余弦相似度阈值
+ANALYSIS_CACHE_SIMILARITY = float(os.getenv("ANALYSIS_CACHE_SIMILARITY", "0.9"))
+# 手动指定提示词版本，未指定时由分析任务的提示词计算
+ANALYSIS_PROMPT_VERSION = os.getenv("ANALYSIS_PROMPT_VERSION", "")
+
+EMBEDDING_DIMENSIONS = 256
+
+SEED_TEMPLATE = """{input_text}
+
+参考：下面是一条相似需求的分析结果，请根据本次输入在其基础上修改，输出格式不变：
+{analysis_json}"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    normalized_text TEXT NOT NULL,
+    result TEXT NOT NULL,
+    embedding TEXT,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_scope ON analysis (model, prompt_version);
+CREATE INDEX IF NOT EXISTS idx_analysis_last_access ON analysis (last_access);
+"""
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """规范化需求文本：全角转半角、忽略大小写、合并空白"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def make_cache_key(text, model_type, prompt_version):
+    """缓存键：规范化文本、模型和提示词版本的SHA-256"""
+    raw = "\0".join((normalize_text(text), model_type or "", prompt_version or ""))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_prompt_version():
+    """分析任务提示词的版本，提示词修改后旧缓存自动失效"""
+    if ANALYSIS_PROMPT_VERSION:
+        return ANALYSIS_PROMPT_VERSION
+    from .tasks import task1_description, task1_expected_output
+    digest = hashlib.sha256(f"{task1_description}\0{task1_expected_output}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def embed_text(text, dimensions=EMBEDDING_DIMENSIONS):
+    """
+    本地文本向量：字符三元组哈希到固定维度后归一化
+
+    不依赖外部模型，对中英文都适用，足以识别措辞略有改动的重复提交
+    """
+    normalized = normalize_text(text)
+    vector = [0.0] * dimensions
+    if not normalized:
+        return vector
+    padded = f"  {normalized} "
+    for position in range(len(padded) - 2):
+        bucket = zlib.crc32(padded[position:position + 3].encode("utf-8")) % dimensions
+        vector[bucket] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+
+def cosine_similarity(left, right):
+    """两个向量的余弦相似度"""
+    dot = sum(a * b for a, b in zip(left, right))
+    norm = math.sqrt(sum(a * a for a in left)) * math.sqrt(sum(b * b for b in right))
+    return dot / norm if norm else 0.0
+
+
+class AnalysisCache:
+    """
+    分析结果的磁盘缓存
+
+    条目数超过上限时按最近访问时间（LRU）淘汰；近似匹配在同一模型和提示词版本的条目中查找
+    """
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+                 similarity_threshold=ANALYSIS_CACHE_SIMILARITY, embedder=embed_text, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._embedder = embedder
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, text, model_type, prompt_version):
+        """精确匹配：返回缓存的分析结果，不存在时返回None"""
+        key = make_cache_key(text, model_type, prompt_version)
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT result FROM analysis WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            conn.execute("UPDATE analysis SET last_access = ? WHERE cache_key = ?", (self._clock(), key))
+            self._stats['hits'] += 1
+            return json.loads(row[0])
+
+    def find_similar(self, text, model_type, prompt_version):
+        """
+        近似匹配：返回相似度不低于阈值的最相似条目
+
+        Returns:
+            tuple: (相似度, 分析结果)，没有足够相似的条目时返回None
+        """
+        query = self._embedder(text)
+        best_score, best_key, best_result = 0.0, None, None
+        with self._lock, self._connect() as conn:
+            for key, embedding, result in conn.execute(
+                "SELECT cache_key, embedding, result FROM analysis "
+                "WHERE model = ? AND prompt_version = ? AND embedding IS NOT NULL",
+                (model_type, prompt_version)
+            ):
+                score = cosine_similarity(query, json.loads(embedding))
+                if score > best_score:
+                    best_score, best_key, best_result = score, key, result
+
+            if best_key is None or best_score < self.similarity_threshold:
+                return None
+            conn.execute("UPDATE analysis SET last_access = ? WHERE cache_key = ?", (self._clock(), best_key))
+            self._stats['near_hits'] += 1
+        return best_score, json.loads(best_result)
+
+    def put(self, text, model_type, prompt_version, result):
+        """写入分析结果，并在超出条目上限时淘汰最久未访问的条目"""
+        key = make_cache_key(text, model_type, prompt_version)
+        embedding = json.dumps([round(value, 6) for value in self._embedder(text)]) if self._embedder else None
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis "
+                "(cache_key, model, prompt_version, normalized_text, result, embedding, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_type, prompt_version, normalize_text(text),
+                 json.dumps(result, ensure_ascii=False), embedding, self._clock())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        excess = conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM analysis WHERE cache_key IN "
+            "(SELECT cache_key FROM analysis ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+        self._stats['evictions'] += excess
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM analysis")
+
+    def get_stats(self):
+        """返回命中情况：hit_rate 为精确命中和近似命中占全部查询的比例"""
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['entries'] = entries
+        stats['max_entries'] = self.max_entries
+        stats['hit_rate'] = (stats['hits'] + stats['near_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+def lookup_analysis(cache, input_text, model_type, prompt_version=None, near_mode=ANALYSIS_CACHE_NEAR_MODE):
+    """
+    查找缓存的分析结果，不调用LLM
+
+    精确命中时返回结果；未命中时按near_mode查找相似需求，return模式直接复用，
+    seed模式把相似需求的结果附在输入后作为分析输入。缓存读取失败时按未命中处理
+
+    Returns:
+        tuple: (分析结果，未命中时为None, 交给分析师的输入文本)
+    """
+    if cache is None:
+        return None, input_text
+
+    prompt_version = prompt_version or get_prompt_version()
+    try:
+        cached = cache.get(input_text, model_type, prompt_version)
+        if cached is not None:
+            return cached, input_text
+        if near_mode in ("seed", "return"):
+            similar = cache.find_similar(input_text, model_type, prompt_version)
+            if similar is not None:
+                score, similar_result = similar
+                print(f"找到相似需求的分析结果（相似度 {score:.2f}）")
+                if near_mode == "return":
+                    return similar_result, input_text
+                return None, SEED_TEMPLATE.format(
+                    input_text=input_text,
+                    analysis_json=json.dumps(similar_result, ensure_ascii=False, indent=2)
+                )
+    except sqlite3.Error as e:
+        print(f"读取分析缓存失败: {str(e)}")
+    return None, input_text
+
+
+def store_analysis(cache, input_text, model_type, analysis, prompt_version=None):
+    """把分析结果写入缓存，写入失败只记录日志"""
+    if cache is None:
+        return
+    try:
+        cache.put(input_text, model_type, prompt_version or get_prompt_version(), analysis)
+    except sqlite3.Error as e:
+        print(f"写入分析缓存失败: {str(e)}")
+
+
+def get_cached_analysis(cache, input_text, model_type, analyze, prompt_version=None,
+                        near_mode=ANALYSIS_CACHE_NEAR_MODE):
+    """
+    带缓存的需求分析
+
+    精确命中时直接返回；未命中时按near_mode查找相似需求，return模式直接复用，
+    seed模式把相似需求的结果附在输入后交给分析师；分析结果写入缓存。
+    缓存读写失败时直接分析，不影响发布
+
+    Args:
+        cache (AnalysisCache): 分析结果缓存，None表示不使用缓存
+        input_text (str): 需求文本
+        model_type (str): 模型类型
+        analyze (callable): analyze(text) 调用LLM分析并返回结构化结果字典
+        prompt_version (str): 提示词版本，None时使用get_prompt_version()
+        near_mode (str): off、seed 或 return
+
+    Returns:
+        dict: 分析结果
+    """
+    if cache is None:
+        return analyze(input_text)
+
+    analysis, analysis_input = lookup_analysis(cache, input_text, model_type, prompt_version, near_mode)
+    if analysis is not None:
+        return analysis
+    analysis = analyze(analysis_input)
+    store_analysis(cache, input_text, model_type, analysis, prompt_version)
+    return analysis
+
+
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    """获取进程级共享的分析结果缓存，未启用或缓存文件无法创建时返回None"""
+    global _analysis_cache
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            try:
+                _analysis_cache = AnalysisCache(ANALYSIS_CACHE_PATH)
+            except (OSError, sqlite3.Error) as e:
+                print(f"无法创建分析缓存 {ANALYSIS_CACHE_PATH}: {str(e)}")
+                return None
+        return _analysis_cache
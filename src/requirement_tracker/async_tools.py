@@ -0,0 +1,170 @@
+"""
+异步工具模块
+为ADO和Confluence工具提供asyncio接口，便于在异步宿主中使用并并发执行多个外部调用
+
+底层SDK（azure-devops、atlassian-python-api）是同步的，这里在有界线程池中执行工具函数，
+共享的连接池和会话池保证并发调用复用连接。工具函数在调用方上下文的副本中执行，
+能读取到run_crew设置的幂等键和流式事件处理函数
+
+直接发布（publisher.publish_requirement）通过 run_tool_calls 并发创建工作项和页面
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .tools import (
+    bulk_create_ado_work_items,
+    create_ado_feature,
+    create_confluence_page,
+    delete_ado_workitem,
+    delete_confluence_page,
+    get_ado_projects,
+    get_ado_work_item_description,
+    get_ado_work_items,
+    get_ado_work_items_with_area,
+    get_area_paths,
+    get_confluence_page_content,
+    get_confluence_pages,
+    get_confluence_spaces,
+    update_confluence_title,
+)
+
+# 同时进行中的外部调用数量上限
+ASYNC_TOOL_CONCURRENCY = int(os.getenv("ASYNC_TOOL_CONCURRENCY", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_TOOL_CONCURRENCY, thread_name_prefix="req-agent-io")
+
+
+async def call_tool(tool, **kwargs):
+    """
+    在线程池中执行工具函数，不阻塞事件循环
+
+    Args:
+        tool: @tool 装饰的工具对象（或普通函数）
+        **kwargs: 工具参数
+
+    Returns:
+        工具函数的返回值
+    """
+    func = getattr(tool, 'func', tool)
+    loop = asyncio.get_running_loop()
+    # run_in_executor 不传递contextvars，在当前上下文的副本中执行
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, **kwargs))
+
+
+async def gather_tool_calls(calls, return_exceptions=True):
+    """
+    并发执行多个工具调用
+
+    Args:
+        calls (list): (工具, 参数字典) 列表
+        return_exceptions (bool): 为True时单个调用失败返回异常对象，不影响其他调用
+
+    Returns:
+        list: 与calls顺序一致的结果列表
+    """
+    return await asyncio.gather(
+        *(call_tool(tool, **kwargs) for tool, kwargs in calls),
+        return_exceptions=return_exceptions
+    )
+
+
+def run_tool_calls(calls, return_exceptions=True):
+    """
+    在同步代码中并发执行多个工具调用
+
+    当前线程没有运行中的事件循环时直接用 asyncio.run；
+    已有运行中的事件循环（Jupyter、异步宿主中的同步回调）时不能再调用 asyncio.run，
+    改为在单独的线程中运行新的事件循环并等待结果
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather_tool_calls(calls, return_exceptions))
+
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="req-agent-loop") as runner:
+        return runner.submit(context.run, asyncio.run, gather_tool_calls(calls, return_exceptions)).result()
+
+
+# ADO
+async def create_ado_feature_async(summary: str, description: str, problem_statement: str = "",
+                                   acceptance_criteria: str = "") -> str:
+    """异步创建ADO Feature"""
+    return await call_tool(create_ado_feature, summary=summary, description=description,
+                           problem_statement=problem_statement, acceptance_criteria=acceptance_criteria)
+
+
+async def bulk_create_ado_work_items_async(items: list, project_name: str = None) -> list:
+    """异步批量创建ADO工作项"""
+    return await call_tool(bulk_create_ado_work_items, items=items, project_name=project_name)
+
+
+async def get_ado_projects_async() -> list:
+    """异步获取ADO项目列表"""
+    return await call_tool(get_ado_projects)
+
+
+async def get_ado_work_items_async(project_name: str, work_item_type: str = "Feature",
+                                   lazy_description: bool = False, incremental: bool = False) -> list:
+    """异步获取ADO工作项"""
+    return await call_tool(get_ado_work_items, project_name=project_name, work_item_type=work_item_type,
+                           lazy_description=lazy_description, incremental=incremental)
+
+
+async def get_ado_work_items_with_area_async(project_name: str, work_item_type: str = "Feature",
+                                             area_path: str = None, lazy_description: bool = False,
+                                             incremental: bool = False) -> list:
+    """异步获取ADO工作项（支持Area过滤）"""
+    return await call_tool(get_ado_work_items_with_area, project_name=project_name,
+                           work_item_type=work_item_type, area_path=area_path,
+                           lazy_description=lazy_description, incremental=incremental)
+
+
+async def get_area_paths_async(project_name: str) -> list:
+    """异步获取ADO Area路径"""
+    return await call_tool(get_area_paths, project_name=project_name)
+
+
+async def get_ado_work_item_description_async(work_item_id: int) -> str:
+    """异步获取ADO工作项描述"""
+    return await call_tool(get_ado_work_item_description, work_item_id=work_item_id)
+
+
+async def delete_ado_workitem_async(workitem_id: str) -> str:
+    """异步删除ADO工作项"""
+    return await call_tool(delete_ado_workitem, workitem_id=workitem_id)
+
+
+# Confluence
+async def create_confluence_page_async(title: str, body_html: str) -> str:
+    """异步创建Confluence页面"""
+    return await call_tool(create_confluence_page, title=title, body_html=body_html)
+
+
+async def update_confluence_title_async(page_id: str, new_title: str) -> str:
+    """异步更新Confluence页面标题"""
+    return await call_tool(update_confluence_title, page_id=page_id, new_title=new_title)
+
+
+async def get_confluence_spaces_async(max_results: int = 100) -> list:
+    """异步获取Confluence空间列表"""
+    return await call_tool(get_confluence_spaces, max_results=max_results)
+
+
+async def get_confluence_pages_async(space_key: str, max_results: int = 100) -> list:
+    """异步获取Confluence页面列表"""
+    return await call_tool(get_confluence_pages, space_key=space_key, max_results=max_results)
+
+
+async def get_confluence_page_content_async(page_id: str) -> dict:
+    """异步获取Confluence页面内容"""
+    return await call_tool(get_confluence_page_content, page_id=page_id)
+
+
+async def delete_confluence_page_async(page_id: str) -> str:
+    """异步删除Confluence页面"""
+    return await call_tool(delete_confluence_page, page_id=page_id)
@@ -0,0 +1,227 @@
+"""
+需求批处理模块
+从JSONL文件读取需求记录，用线程池并发执行分析/发布流程，按模型限制请求速率，
+每完成一条立即追加到结果JSONL；结果文件同时作为检查点，重新运行时跳过已成功的记录
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .crew import run_crew
+from .idempotency import (
+    KIND_ADO_FEATURE,
+    KIND_ADO_WORK_ITEM,
+    KIND_CONFLUENCE_PAGE,
+    get_idempotency_ledger,
+    get_scope_artifacts,
+    idempotency_scope,
+    make_idempotency_key
+)
+from .publisher import get_page_link
+
+# 同时处理的需求数量
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+# 每个模型每分钟最多启动的需求数量，0表示不限制
+BATCH_RATE_LIMIT_RPM = float(os.getenv("BATCH_RATE_LIMIT_RPM", "30"))
+# 按模型覆盖速率限制，JSON格式，例如 {"qwen": 60, "grok": 10}
+BATCH_RATE_LIMITS = os.getenv("BATCH_RATE_LIMITS", "")
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+def load_requirements(path):
+    """
+    读取需求JSONL文件
+
+    每行一个JSON对象，ID取 request_id 或 id（缺省时使用行号），
+    需求文本取 input_text、text，或由 title 和 body 拼接
+
+    Returns:
+        list: [{'id': 记录ID, 'input_text': 需求文本}]
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"第 {line_number} 行不是有效的JSON: {str(e)}") from e
+
+            record_id = str(data.get("request_id") or data.get("id") or line_number)
+            input_text = data.get("input_text") or data.get("text")
+            if not input_text:
+                input_text = "\n\n".join(part for part in (data.get("title"), data.get("body")) if part)
+            if not input_text:
+                raise ValueError(f"第 {line_number} 行缺少需求文本（input_text、text 或 title/body）")
+            records.append({"id": record_id, "input_text": input_text})
+    return records
+
+
+def load_completed_ids(output_path):
+    """从结果文件读取已成功处理的记录ID（同一ID以最后一次结果为准）"""
+    statuses = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时可能留下不完整的最后一行
+                continue
+            statuses[result.get("id")] = result.get("status")
+    return {record_id for record_id, status in statuses.items() if status == STATUS_OK}
+
+
+def collect_artifacts(scope):
+    """
+    从幂等台账读取一次运行（幂等范围）创建的ADO工作项和Confluence页面
+
+    Returns:
+        dict: {'work_item_ids': [...], 'page_ids': [...], 'page_links': [...]}
+    """
+    artifacts = get_scope_artifacts(scope)
+    work_item_ids = []
+    for kind in (KIND_ADO_FEATURE, KIND_ADO_WORK_ITEM):
+        for work_item_id in artifacts.get(kind, []):
+            if int(work_item_id) not in work_item_ids:
+                work_item_ids.append(int(work_item_id))
+    page_ids = list(dict.fromkeys(artifacts.get(KIND_CONFLUENCE_PAGE, [])))
+    return {"work_item_ids": work_item_ids, "page_ids": page_ids,
+            "page_links": [get_page_link(page_id) for page_id in page_ids]}
+
+
+class RateLimiter:
+    """
+    按键（模型）限制请求启动速率
+
+    同一个键相邻两次请求至少间隔 60 / rpm 秒，不同键互不影响
+    """
+
+    def __init__(self, default_rpm=BATCH_RATE_LIMIT_RPM, limits=None, clock=time.monotonic, sleep=time.sleep):
+        self.default_rpm = default_rpm
+        self.limits = dict(limits or {})
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def _interval(self, key):
+        rpm = self.limits.get(key, self.default_rpm)
+        return 60.0 / rpm if rpm and rpm > 0 else 0.0
+
+    def acquire(self, key):
+        """等待直到该键可以发起下一次请求，返回等待的秒数"""
+        interval = self._interval(key)
+        if not interval:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot.get(key, now))
+            self._next_slot[key] = slot + interval
+        wait = slot - now
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def parse_rate_limits(value=BATCH_RATE_LIMITS):
+    """解析 BATCH_RATE_LIMITS 配置，格式错误时忽略"""
+    if not value:
+        return {}
+    try:
+        return {str(key): float(rpm) for key, rpm in json.loads(value).items()}
+    except (ValueError, TypeError, AttributeError):
+        print(f"忽略无效的 BATCH_RATE_LIMITS 配置: {value}")
+        return {}
+
+
+def process_requirement(record, model_type="qwen", rate_limiter=None, runner=run_crew):
+    """
+    处理单条需求
+
+    每条需求在自己的幂等范围内运行，创建的工作项和页面从幂等台账读取，不从输出文本中解析；
+    重新运行失败的记录时沿用同一幂等键，已创建的产物不会重复创建。
+    运行没有报错但没有创建任何工作项或页面时记录为失败
+
+    Returns:
+        dict: 结果记录 {'id', 'status', 'model', 'work_item_ids', 'page_ids', 'page_links',
+                        'output', 'error', 'duration'}
+    """
+    if rate_limiter is not None:
+        rate_limiter.acquire(model_type)
+
+    started = time.monotonic()
+    scope = make_idempotency_key(record["input_text"])
+    try:
+        with idempotency_scope(scope):
+            output = str(runner(record["input_text"], model_type))
+        error = output[len("Error:"):].strip() if output.startswith("Error:") else None
+    except Exception as e:
+        output, error = "", str(e)
+
+    artifacts = collect_artifacts(scope)
+    if not error and not artifacts["work_item_ids"] and not artifacts["page_ids"]:
+        if get_idempotency_ledger() is None:
+            error = "幂等台账未启用，无法确认创建的工作项和页面"
+        else:
+            error = "运行完成，但没有创建工作项或页面"
+
+    result = {"id": record["id"], "status": STATUS_ERROR if error else STATUS_OK, "model": model_type}
+    result.update(artifacts)
+    result.update({"output": output, "error": error, "duration": round(time.monotonic() - started, 3)})
+    return result
+
+def run_batch(records, output_path, model_type="qwen", workers=BATCH_WORKERS, rate_limiter=None,
+              runner=run_crew, on_result=None):
+    """
+    批量处理需求
+
+    结果文件以追加方式写入，每条结果完成后立即落盘；已在结果文件中成功的记录会被跳过，
+    失败的记录在重新运行时重试
+
+    Args:
+        records (list): load_requirements 返回的记录
+        output_path (str): 结果JSONL文件路径
+        model_type (str): 模型类型
+        workers (int): 并发处理的数量
+        rate_limiter (RateLimiter): 速率限制器，None时按环境变量配置创建
+        runner (callable): 执行单条需求的函数，签名同 run_crew
+        on_result (callable): 每条结果完成后的回调 on_result(result)
+
+    Returns:
+        dict: 摘要 {'total', 'skipped', 'succeeded', 'failed'}
+    """
+    if rate_limiter is None:
+        rate_limiter = RateLimiter(limits=parse_rate_limits())
+
+    completed = load_completed_ids(output_path)
+    pending = [record for record in records if record["id"] not in completed]
+    summary = {"total": len(records), "skipped": len(records) - len(pending), "succeeded": 0, "failed": 0}
+    if not pending:
+        return summary
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+
+    with open(output_path, "a", encoding="utf-8") as output_file, \
+            ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="req-agent-batch") as executor:
+        futures = [
+            executor.submit(process_requirement, record, model_type, rate_limiter, runner)
+            for record in pending
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            # 结果只在主线程写入，每条写完立即刷新，中断后可从结果文件续跑
+            output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output_file.flush()
+            summary["succeeded" if result["status"] == STATUS_OK else "failed"] += 1
+            if on_result:
+                on_result(result)
+
+    return summary
@@ -7,6 +7,17 @@ import streamlit as st
 from streamlit_tree_select import tree_select
 from atlassian import Confluence
 
+from .confluence_pages import (
+    CONFLUENCE_PAGE_CHUNK_SIZE,
+    LazyPageTree,
+    build_page_tree,
+    get_child_pages,
+    get_root_pages,
+    iter_space_page_chunks
+)
+from .connection_pool import confluence_pool
+from .page_cache import get_cached_page, get_page_cache
+
 
 def get_confluence_connection():
     """检查Confluence连接是否配置正确"""
@@ -27,10 +38,12 @@ def get_confluence_client():
     confluence_user = os.getenv("CONFLUENCE_USER")
     confluence_token = os.getenv("CONFLUENCE_TOKEN")
 
-    return Confluence(
-        url=confluence_url,
-        username=confluence_user,
-        password=confluence_token,
+    # 使用共享会话池，Streamlit重跑时复用已建立的连接
+    return confluence_pool.get_client(
+        Confluence,
+        confluence_url,
+        confluence_user,
+        confluence_token,
         cloud=True
     )
 
@@ -64,41 +77,45 @@ def get_spaces():
         return []
 
 
-def get_pages(space_key):
-    """获取指定空间的页面"""
-    try:
-        confluence = get_confluence_client()
-        response = confluence.get_all_pages_from_space(
-            space=space_key,
-            start=0,
-            limit=9999,
-            expand='space,history,ancestors'
-        )
+def _normalize_page(page, space_key):
+    """提取页面树所需的字段"""
+    # 获取父页面ID（最后一个祖先通常是直接父页面）
+    parent_id = None
+    ancestors = page.get('ancestors', [])
+    if ancestors:
+        parent_id = ancestors[-1].get('id')
+
+    return {
+        'id': page.get('id', ''),
+        'title': page.get('title', ''),
+        'space': page.get('space', {}).get('key', space_key),
+        'url': page.get('_links', {}).get('webui', f"/spaces/{space_key}/pages/{page.get('id', '')}"),
+        'parent_id': parent_id,
+        'ancestors': ancestors
+    }
 
-        # 兼容不同响应格式
-        if isinstance(response, dict) and 'results' in response:
-            pages_data = response['results']
-        elif isinstance(response, list):
-            pages_data = response
-        else:
-            pages_data = []
 
-        result = []
-        for page in pages_data:
-            # 获取父页面ID（最后一个祖先通常是直接父页面）
-            parent_id = None
-            ancestors = page.get('ancestors', [])
-            if ancestors:
-                parent_id = ancestors[-1].get('id')
+def iter_pages(space_key, chunk_size=CONFLUENCE_PAGE_CHUNK_SIZE):
+    """逐块获取指定空间的页面（生成器），每块为规范化后的页面列表"""
+    confluence = get_confluence_client()
+    for chunk in iter_space_page_chunks(confluence, space_key, chunk_size=chunk_size):
+        yield [_normalize_page(page, space_key) for page in chunk]
 
-            result.append({
-                'id': page.get('id', ''),
-                'title': page.get('title', ''),
-                'space': page.get('space', {}).get('key', space_key),
-                'url': page.get('_links', {}).get('webui', f"/spaces/{space_key}/pages/{page.get('id', '')}"),
-                'parent_id': parent_id,
-                'ancestors': ancestors
-            })
+
+def get_pages(space_key, on_chunk=None):
+    """
+    获取指定空间的页面
+
+    Args:
+        space_key (str): 空间键
+        on_chunk (callable): 每加载完一块时回调，参数为已加载的全部页面
+    """
+    try:
+        result = []
+        for chunk in iter_pages(space_key):
+            result.extend(chunk)
+            if on_chunk:
+                on_chunk(result)
         print(f"成功获取 {len(result)} 个页面")
         return result
     except Exception as e:
@@ -107,24 +124,27 @@ def get_pages(space_key):
 
 
 def get_page_content(page_id):
-    """获取页面内容"""
+    """获取页面内容，优先使用按版本校验的磁盘缓存"""
     try:
         confluence = get_confluence_client()
 
-        # 获取页面详情和内容
-        page = confluence.get_page_by_id(page_id=page_id, expand='space,history,body.storage')
+        def fetch(page_id):
+            # 获取页面详情和内容
+            page = confluence.get_page_by_id(page_id=page_id, expand='space,history,body.storage,version')
 
-        page_content = page.get('body', {}).get('storage', {}).get('value', '')
+            page_content = page.get('body', {}).get('storage', {}).get('value', '')
 
-        result = {
-            'id': page.get('id', ''),
-            'title': page.get('title', ''),
-            'space': page.get('space', {}).get('key', ''),
-            'content': page_content,
-            'version': page.get('version', {}).get('number', ''),
-            'last_modified': page.get('history', {}).get('lastUpdated', {}).get('when', '') if page.get('history', {}).get('lastUpdated') else '',
-            'url': f"{os.getenv('CONFLUENCE_URL')}{page.get('_links', {}).get('webui', '')}"
-        }
+            return {
+                'id': page.get('id', ''),
+                'title': page.get('title', ''),
+                'space': page.get('space', {}).get('key', ''),
+                'content': page_content,
+                'version': page.get('version', {}).get('number', ''),
+                'last_modified': page.get('history', {}).get('lastUpdated', {}).get('when', '') if page.get('history', {}).get('lastUpdated') else '',
+                'url': f"{os.getenv('CONFLUENCE_URL')}{page.get('_links', {}).get('webui', '')}"
+            }
+
+        result = get_cached_page(confluence, page_id, get_page_cache(), fetch)
         print(f"成功获取页面内容: {page_id}, 标题: {result['title']}")
         return result
     except Exception as e:
@@ -134,47 +154,18 @@ def get_page_content(page_id):
 
 def build_page_tree_for_selector(pages):
     """为tree_select组件构建页面树结构"""
-    # 创建页面字典
-    page_dict = {
-        page['id']: {
-            'id': page['id'],
-            'title': page['title'],
-            'url': page['url'],
-            'parent_id': page['parent_id'],
-            'ancestors': page['ancestors']
-        }
-        for page in pages
-    }
-
-    # 递归构建树节点
-    def build_tree_node(page_info):
-        # 找到所有子页面
-        children = []
-        for p_id, p_info in page_dict.items():
-            if p_info['parent_id'] == page_info['id']:
-                children.append(build_tree_node(p_info))
-
-        # 创建树节点
-        node = {
-            'label': page_info['title'],
-            'value': page_info['id']
-        }
+    return build_page_tree(pages)
 
-        if children:
-            node['children'] = children
 
-        return node
-
-    # 找到所有根页面（没有父页面或父页面不在当前列表中）
-    root_pages = [
-        page_info for page_id, page_info in page_dict.items()
-        if not page_info['parent_id'] or page_info['parent_id'] not in page_dict
-    ]
-
-    # 构建树结构
-    tree_nodes = [build_tree_node(page_info) for page_info in root_pages]
-
-    return tree_nodes
+def get_lazy_page_tree(space_key):
+    """获取（或创建）空间的按需加载页面树，保存在session_state中以缓存已展开的子树"""
+    trees = st.session_state.lazy_page_trees
+    if space_key not in trees:
+        trees[space_key] = LazyPageTree(
+            load_roots=lambda: get_root_pages(get_confluence_client(), space_key),
+            load_children=lambda page_id: get_child_pages(get_confluence_client(), page_id)
+        )
+    return trees[space_key]
 
 
 def initialize_session_state():
@@ -192,9 +183,19 @@ def initialize_session_state():
     if 'cached_page_content' not in st.session_state:
         st.session_state.cached_page_content = {}
 
+    # 按需加载模式下每个空间的页面树
+    if 'lazy_page_trees' not in st.session_state:
+        st.session_state.lazy_page_trees = {}
 
-def render_page_tree(tree_nodes):
-    """渲染页面树形选择器"""
+
+def render_page_tree(tree_nodes, lazy_tree=None):
+    """
+    渲染页面树形选择器
+
+    Args:
+        tree_nodes (list): 树节点列表
+        lazy_tree (LazyPageTree): 按需加载模式下的页面树，节点展开时加载其子页面
+    """
     if not tree_nodes:
         st.info("空间中没有找到页面")
         return None
@@ -212,8 +213,19 @@ def render_page_tree(tree_nodes):
         # 始终同步展开状态
         st.session_state.tree_expanded = result.get('expanded', [])
 
-        # 只在选中状态变化时更新选中的页面ID
-        new_checked = result.get('checked', [])
+        # 有节点首次展开时加载其子页面，并重跑以显示新节点
+        if lazy_tree is not None:
+            try:
+                with st.spinner("正在加载子页面..."):
+                    loaded = lazy_tree.expand(st.session_state.tree_expanded)
+            except Exception as e:
+                st.error(f"加载子页面失败: {str(e)}")
+                loaded = []
+            if loaded:
+                st.rerun()
+
+        # 只在选中状态变化时更新选中的页面ID（忽略占位节点）
+        new_checked = [value for value in result.get('checked', []) if not LazyPageTree.is_placeholder(value)]
         if new_checked != st.session_state.tree_checked:
             st.session_state.tree_checked = new_checked
             # 更新选中的页面ID
@@ -234,8 +246,8 @@ def render_page_content(page_id):
             page_content = get_page_content(page_id)
 
         if page_content:
-            # 缓存页面内容
-            st.session_state.cached_page_content[page_id] = page_content
+            # 会话中只保留当前页面，避免重跑时重复请求；其它页面由共享的磁盘缓存提供
+            st.session_state.cached_page_content = {page_id: page_content}
 
     if not page_content:
         st.error("无法加载页面内容")
@@ -314,18 +326,48 @@ def show_confluence_browser():
     with col1:
         st.subheader("🗂️ 页面树")
 
-        # 获取页面列表
-        with st.spinner("正在加载页面列表..."):
-            pages = get_pages(configured_space_key)
-
-        if pages:
-            # 构建树形结构
-            tree_nodes = build_page_tree_for_selector(pages)
+        # 大空间默认按需加载：只加载根页面，展开节点时再加载子页面
+        lazy_mode = st.checkbox(
+            "按需加载子页面",
+            value=os.getenv("CONFLUENCE_LAZY_TREE", "true").lower() == "true"
+        )
 
-            # 渲染树形选择器
-            selected_page_id = render_page_tree(tree_nodes)
+        if lazy_mode:
+            lazy_tree = get_lazy_page_tree(configured_space_key)
+            try:
+                with st.spinner("正在加载根页面..."):
+                    tree_nodes = lazy_tree.to_nodes()
+            except Exception as e:
+                st.error(f"获取空间 {configured_space_key} 的页面列表失败: {str(e)}")
+                lazy_tree.invalidate()
+                tree_nodes = []
+
+            if tree_nodes:
+                selected_page_id = render_page_tree(tree_nodes, lazy_tree)
+            else:
+                st.info(f"空间 {configured_space_key} 中没有找到页面")
+
+            if st.button("🔄 刷新页面树"):
+                lazy_tree.invalidate()
+                st.rerun()
         else:
-            st.info(f"空间 {configured_space_key} 中没有找到页面")
+            # 分块加载页面列表，实时显示加载进度
+            progress = st.empty()
+            with st.spinner("正在加载页面列表..."):
+                pages = get_pages(
+                    configured_space_key,
+                    on_chunk=lambda loaded: progress.caption(f"已加载 {len(loaded)} 个页面...")
+                )
+            progress.empty()
+
+            if pages:
+                # 构建树形结构
+                tree_nodes = build_page_tree_for_selector(pages)
+
+                # 渲染树形选择器
+                selected_page_id = render_page_tree(tree_nodes)
+            else:
+                st.info(f"空间 {configured_space_key} 中没有找到页面")
 
     with col2:
         # 显示页面内容
@@ -0,0 +1,296 @@
+"""
+Confluence 页面辅助模块
+提供与界面无关的页面分页等功能，供工具和浏览器共用
+"""
+import os
+from collections import defaultdict, deque
+from urllib.parse import urlparse, parse_qs
+
+# 每次请求的页面数量，需不超过服务端对单次返回数量的限制
+CONFLUENCE_PAGE_CHUNK_SIZE = int(os.getenv("CONFLUENCE_PAGE_CHUNK_SIZE", "50"))
+DEFAULT_PAGE_EXPAND = 'space,history,ancestors'
+
+
+def _extract_results(response):
+    """兼容不同响应格式，提取页面列表"""
+    if isinstance(response, dict) and 'results' in response:
+        return response['results'] or []
+    elif isinstance(response, list):
+        return response
+    return []
+
+
+def _next_start(response, start, limit, count):
+    """根据响应计算下一块的start游标，没有下一块时返回None"""
+    if isinstance(response, dict) and '_links' in response:
+        next_link = (response.get('_links') or {}).get('next')
+        if not next_link:
+            return None
+        query = parse_qs(urlparse(next_link).query)
+        if 'start' in query:
+            return int(query['start'][0])
+        return start + count
+
+    # 响应中没有游标信息时，返回数量不足一块即视为最后一块
+    if count < limit:
+        return None
+    return start + count
+
+
+def _iter_chunks(fetch, chunk_size, max_results=None):
+    """
+    通用分块迭代：fetch(start, limit) 返回一块响应，跟随 _links.next / start 游标直到结束
+
+    调用方停止迭代即可提前终止，后续的块不会再被请求
+    """
+    start = 0
+    remaining = max_results
+    while remaining is None or remaining > 0:
+        limit = chunk_size if remaining is None else min(chunk_size, remaining)
+        response = fetch(start, limit)
+        results = _extract_results(response)
+        if not results:
+            return
+
+        next_start = _next_start(response, start, limit, len(results))
+        if remaining is not None:
+            results = results[:remaining]
+            remaining -= len(results)
+
+        yield results
+
+        if next_start is None or next_start <= start:
+            return
+        start = next_start
+
+
+def iter_space_page_chunks(confluence, space_key, chunk_size=CONFLUENCE_PAGE_CHUNK_SIZE,
+                           max_results=None, expand=DEFAULT_PAGE_EXPAND):
+    """
+    按固定大小分块获取空间中的页面（生成器），跟随 _links.next / start 游标
+
+    调用方停止迭代即可提前终止，后续的块不会再被请求
+
+    Args:
+        confluence: Confluence客户端实例
+        space_key (str): 空间键
+        chunk_size (int): 每块（每次请求）的页面数量
+        max_results (int): 最多返回的页面数量，None表示不限制
+        expand (str): 需要展开的属性
+
+    Yields:
+        list: 原始页面数据列表
+    """
+    # 优先使用返回完整响应（含_links.next）的raw接口，旧版客户端只能按返回数量判断是否结束
+    if hasattr(type(confluence), 'get_all_pages_from_space_raw'):
+        fetch = confluence.get_all_pages_from_space_raw
+    else:
+        fetch = confluence.get_all_pages_from_space
+
+    yield from _iter_chunks(
+        lambda start, limit: fetch(space=space_key, start=start, limit=limit, expand=expand),
+        chunk_size,
+        max_results
+    )
+
+
+def iter_space_pages(confluence, space_key, chunk_size=CONFLUENCE_PAGE_CHUNK_SIZE,
+                     max_results=None, expand=DEFAULT_PAGE_EXPAND):
+    """逐个生成空间中的原始页面数据"""
+    for chunk in iter_space_page_chunks(confluence, space_key, chunk_size, max_results, expand):
+        yield from chunk
+
+
+def get_root_pages(confluence, space_key, chunk_size=CONFLUENCE_PAGE_CHUNK_SIZE):
+    """获取空间的根页面（不含子页面），只返回id/title等基础字段"""
+    def fetch(start, limit):
+        return confluence.get_space_content(
+            space_key, depth='root', start=start, limit=limit, content_type='page', expand=None
+        )
+
+    return [page for chunk in _iter_chunks(fetch, chunk_size) for page in chunk]
+
+
+def get_child_pages(confluence, page_id, chunk_size=CONFLUENCE_PAGE_CHUNK_SIZE):
+    """获取页面的直接子页面"""
+    def fetch(start, limit):
+        return confluence.get_page_child_by_type(page_id, type='page', start=start, limit=limit)
+
+    return [page for chunk in _iter_chunks(fetch, chunk_size) for page in chunk]
+
+
+def _sibling_sort_key(page):
+    """兄弟页面排序键：按标题（忽略大小写）排序，标题相同时按ID，保证顺序稳定"""
+    title = page.get('title') or ''
+    return (title.casefold(), title, str(page.get('id', '')))
+
+
+def build_page_tree(pages):
+    """
+    构建tree_select组件使用的页面树
+
+    一次遍历建立 父页面→子页面 索引，再非递归地组装节点，复杂度与页面数量线性相关（兄弟排序除外），
+    层级再深也不会触发递归深度限制
+
+    父页面不在列表中的页面作为根节点；父子关系成环时，环中排序最靠前的页面提升为根节点
+
+    Args:
+        pages (list): 规范化后的页面列表，需包含 id、title、parent_id
+
+    Returns:
+        list: 树节点列表，节点格式为 {'label', 'value', 'children'(可选)}
+    """
+    page_by_id = {page['id']: page for page in pages}
+
+    children_ids = defaultdict(list)
+    root_ids = []
+    for page_id, page in page_by_id.items():
+        parent_id = page.get('parent_id')
+        if parent_id and parent_id != page_id and parent_id in page_by_id:
+            children_ids[parent_id].append(page_id)
+        else:
+            root_ids.append(page_id)
+
+    def sort_ids(ids):
+        ids.sort(key=lambda page_id: _sibling_sort_key(page_by_id[page_id]))
+
+    sort_ids(root_ids)
+    for ids in children_ids.values():
+        sort_ids(ids)
+
+    # 从根节点出发标记可达页面，剩下的页面处于父子环中
+    visited = set()
+
+    def mark_reachable(start_id):
+        queue = deque([start_id])
+        visited.add(start_id)
+        while queue:
+            for child_id in children_ids.get(queue.popleft(), ()):
+                if child_id not in visited:
+                    visited.add(child_id)
+                    queue.append(child_id)
+
+    for root_id in root_ids:
+        mark_reachable(root_id)
+
+    if len(visited) < len(page_by_id):
+        unreachable = [page_id for page_id in page_by_id if page_id not in visited]
+        sort_ids(unreachable)
+        for page_id in unreachable:
+            if page_id in visited:
+                continue
+            # 断开环：把该页面从父页面的子列表中移除并提升为根节点
+            children_ids[page_by_id[page_id]['parent_id']].remove(page_id)
+            root_ids.append(page_id)
+            mark_reachable(page_id)
+
+    nodes = {
+        page_id: {'label': page['title'], 'value': page_id}
+        for page_id, page in page_by_id.items()
+    }
+    for parent_id, ids in children_ids.items():
+        if ids:
+            nodes[parent_id]['children'] = [nodes[child_id] for child_id in ids]
+
+    return [nodes[root_id] for root_id in root_ids]
+
+
+class LazyPageTree:
+    """
+    按需加载的页面树
+
+    初始只加载根页面，节点展开时才通过子页面接口加载其子节点，已加载的子树会被缓存。
+    未加载的节点带一个占位子节点，使tree_select组件显示展开箭头
+    """
+
+    PLACEHOLDER_SUFFIX = '::loading'
+
+    def __init__(self, load_roots, load_children):
+        """
+        Args:
+            load_roots (callable): load_roots() 返回根页面列表
+            load_children (callable): load_children(page_id) 返回子页面列表
+        """
+        self._load_roots = load_roots
+        self._load_children = load_children
+        self._pages = {}
+        self._root_ids = None
+        self._children = {}
+
+    @classmethod
+    def is_placeholder(cls, value):
+        """判断节点值是否为占位节点"""
+        return str(value).endswith(cls.PLACEHOLDER_SUFFIX)
+
+    def _register(self, pages):
+        ids = []
+        for page in pages:
+            page_id = str(page.get('id', ''))
+            self._pages[page_id] = page
+            ids.append(page_id)
+        ids.sort(key=lambda page_id: _sibling_sort_key(self._pages[page_id]))
+        return ids
+
+    def get_page(self, page_id):
+        """返回已加载的页面数据"""
+        return self._pages.get(str(page_id))
+
+    def is_loaded(self, page_id):
+        """子页面是否已加载"""
+        return str(page_id) in self._children
+
+    def ensure_roots(self):
+        """加载根页面（只加载一次）"""
+        if self._root_ids is None:
+            self._root_ids = self._register(self._load_roots())
+        return list(self._root_ids)
+
+    def load_children(self, page_id):
+        """加载并缓存页面的子页面"""
+        page_id = str(page_id)
+        if page_id not in self._children:
+            self._children[page_id] = self._register(self._load_children(page_id))
+        return list(self._children[page_id])
+
+    def expand(self, expanded_ids):
+        """
+        为展开的节点加载子页面
+
+        Returns:
+            list: 本次新加载了子页面的节点ID
+        """
+        loaded = []
+        for page_id in expanded_ids:
+            page_id = str(page_id)
+            if self.is_placeholder(page_id) or self.is_loaded(page_id) or page_id not in self._pages:
+                continue
+            self.load_children(page_id)
+            loaded.append(page_id)
+        return loaded
+
+    def invalidate(self):
+        """清空已加载的页面，下次重新从根页面开始加载"""
+        self._pages = {}
+        self._root_ids = None
+        self._children = {}
+
+    def to_nodes(self):
+        """生成tree_select组件使用的节点列表（非递归）"""
+        root_ids = self.ensure_roots()
+
+        def make_node(page_id):
+            return {'label': self._pages[page_id].get('title', ''), 'value': page_id}
+
+        roots = [make_node(page_id) for page_id in root_ids]
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            page_id = node['value']
+            if not self.is_loaded(page_id):
+                node['children'] = [{'label': '加载中...', 'value': page_id + self.PLACEHOLDER_SUFFIX}]
+                continue
+            children = [make_node(child_id) for child_id in self._children[page_id]]
+            if children:
+                node['children'] = children
+                stack.extend(children)
+        return roots
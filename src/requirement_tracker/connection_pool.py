@@ -0,0 +1,275 @@
+"""
+连接池模块
+为Azure DevOps和Confluence提供进程级共享的连接与会话，避免每次调用都重新握手
+"""
+import hashlib
+import os
+import threading
+import time
+
+# 连接存活时间（秒），超时后下次调用会重新建立连接
+ADO_CONNECTION_TTL = int(os.getenv("ADO_CONNECTION_TTL", "1800"))
+
+# Confluence HTTP连接池配置
+CONFLUENCE_POOL_SIZE = int(os.getenv("CONFLUENCE_POOL_SIZE", "10"))
+CONFLUENCE_MAX_RETRIES = int(os.getenv("CONFLUENCE_MAX_RETRIES", "3"))
+CONFLUENCE_BACKOFF_FACTOR = float(os.getenv("CONFLUENCE_BACKOFF_FACTOR", "0.5"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _hash_secret(secret):
+    """对凭证做哈希，避免明文出现在缓存键中"""
+    return hashlib.sha256((secret or "").encode("utf-8")).hexdigest()
+
+
+def _enable_keep_alive(client):
+    """为msrest客户端开启keep-alive，复用底层HTTP会话"""
+    config = getattr(client, 'config', None)
+    if config is not None and hasattr(config, 'keep_alive'):
+        config.keep_alive = True
+
+
+class _AdoEntry:
+    """注册表中的单个连接及其已解析的客户端"""
+
+    def __init__(self, connection, created_at):
+        self.connection = connection
+        self.created_at = created_at
+        self.clients = {}
+        self.lock = threading.Lock()
+
+
+class AdoConnectionRegistry:
+    """线程安全的ADO连接注册表，按 (组织URL, PAT哈希) 缓存连接和客户端"""
+
+    def __init__(self, ttl=ADO_CONNECTION_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {
+            'connection_hits': 0,
+            'connection_misses': 0,
+            'client_hits': 0,
+            'client_misses': 0,
+            'invalidations': 0
+        }
+
+    def get_connection(self, org_url, pat, factory):
+        """
+        获取共享连接，不存在或已过期时通过factory创建
+
+        Args:
+            org_url (str): ADO组织URL
+            pat (str): 个人访问令牌
+            factory (callable): 无参函数，返回新的azure.devops Connection
+
+        Returns:
+            Connection: 共享的连接实例
+        """
+        key = (org_url, _hash_secret(pat))
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created_at < self.ttl:
+                self._stats['connection_hits'] += 1
+                return entry.connection
+
+            self._stats['connection_misses'] += 1
+
+            # 过期连接以及同一组织下旧凭证的连接一并失效
+            stale_keys = [k for k in self._entries if k == key or k[0] == org_url]
+            for stale_key in stale_keys:
+                del self._entries[stale_key]
+                self._stats['invalidations'] += 1
+
+            connection = factory()
+            entry = _AdoEntry(connection, now)
+            self._install_client_cache(entry)
+            self._entries[key] = entry
+            return connection
+
+    def _install_client_cache(self, entry):
+        """拦截连接的get_client，使每种客户端只解析一次（避免重复的location服务请求）"""
+        connection = entry.connection
+        resolve_client = getattr(connection, 'get_client', None)
+        if resolve_client is None:
+            return
+
+        def get_client(client_type, *args, **kwargs):
+            with entry.lock:
+                client = entry.clients.get(client_type)
+                if client is not None:
+                    self._count('client_hits')
+                    return client
+
+                self._count('client_misses')
+                client = resolve_client(client_type, *args, **kwargs)
+                _enable_keep_alive(client)
+                entry.clients[client_type] = client
+                return client
+
+        connection.get_client = get_client
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def invalidate(self, org_url=None):
+        """使缓存的连接失效，不指定org_url时清空全部"""
+        with self._lock:
+            keys = [k for k in self._entries if org_url is None or k[0] == org_url]
+            for key in keys:
+                del self._entries[key]
+            self._stats['invalidations'] += len(keys)
+
+    def get_stats(self):
+        """返回命中/未命中计数，用于监控"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['connections'] = len(self._entries)
+            return stats
+
+
+def _create_metered_adapter(pool_size, max_retries, backoff_factor):
+    """创建带重试和使用率统计的HTTPAdapter"""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class MeteredAdapter(HTTPAdapter):
+        """记录并发中的请求数、峰值和重试次数"""
+
+        def __init__(self, *args, **kwargs):
+            self.metrics_lock = threading.Lock()
+            self.metrics = {'requests': 0, 'in_flight': 0, 'peak_in_flight': 0, 'retries': 0}
+            super().__init__(*args, **kwargs)
+
+        def send(self, request, *args, **kwargs):
+            with self.metrics_lock:
+                self.metrics['requests'] += 1
+                self.metrics['in_flight'] += 1
+                self.metrics['peak_in_flight'] = max(self.metrics['peak_in_flight'], self.metrics['in_flight'])
+            try:
+                response = super().send(request, *args, **kwargs)
+            finally:
+                with self.metrics_lock:
+                    self.metrics['in_flight'] -= 1
+
+            retries = getattr(getattr(response, 'raw', None), 'retries', None)
+            if retries is not None and retries.history:
+                with self.metrics_lock:
+                    self.metrics['retries'] += len(retries.history)
+            return response
+
+    # 429/5xx自动退避重试，并遵循服务端返回的Retry-After
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    return MeteredAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=retry
+    )
+
+
+class ConfluenceSessionPool:
+    """共享的Confluence HTTP会话池，按 (URL, 用户, Token哈希) 复用keep-alive会话"""
+
+    def __init__(self, pool_size=CONFLUENCE_POOL_SIZE, max_retries=CONFLUENCE_MAX_RETRIES,
+                 backoff_factor=CONFLUENCE_BACKOFF_FACTOR, adapter_factory=_create_metered_adapter):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._adapter_factory = adapter_factory
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {'session_hits': 0, 'session_misses': 0, 'invalidations': 0}
+
+    def get_session(self, url, username, token):
+        """获取共享的requests会话，凭证变更时关闭旧会话"""
+        key = (url, username, _hash_secret(token))
+
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self._stats['session_hits'] += 1
+                return entry[0]
+
+            self._stats['session_misses'] += 1
+
+            # 同一URL和用户下旧Token的会话失效
+            for stale_key in [k for k in self._sessions if k[:2] == key[:2]]:
+                self._sessions.pop(stale_key)[0].close()
+                self._stats['invalidations'] += 1
+
+            import requests
+            session = requests.Session()
+            adapter = self._adapter_factory(self.pool_size, self.max_retries, self.backoff_factor)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._sessions[key] = (session, adapter)
+            return session
+
+    def get_client(self, confluence_class, url, username, token, **kwargs):
+        """
+        构建绑定共享会话的Confluence客户端
+
+        Confluence对象本身构建开销很小，TLS连接和会话由连接池复用
+
+        Args:
+            confluence_class: atlassian.Confluence类
+            url (str): Confluence地址
+            username (str): 用户邮箱
+            token (str): API Token
+            **kwargs: 透传给Confluence的其他参数（如cloud=True）
+        """
+        session = self.get_session(url, username, token)
+        return confluence_class(url=url, username=username, password=token, session=session, **kwargs)
+
+    def close_all(self):
+        """关闭并清空所有会话"""
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._stats['invalidations'] += len(self._sessions)
+            self._sessions.clear()
+
+    def get_stats(self):
+        """返回会话复用计数和连接池使用率"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+            stats['pool_size'] = self.pool_size
+            totals = {'requests': 0, 'in_flight': 0, 'peak_in_flight': 0, 'retries': 0}
+            for _, adapter in self._sessions.values():
+                metrics = getattr(adapter, 'metrics', {})
+                for name in totals:
+                    if name == 'peak_in_flight':
+                        totals[name] = max(totals[name], metrics.get(name, 0))
+                    else:
+                        totals[name] += metrics.get(name, 0)
+            stats.update(totals)
+            capacity = self.pool_size * max(len(self._sessions), 1)
+            stats['utilization'] = totals['in_flight'] / capacity if capacity else 0.0
+            return stats
+
+
+# 进程级共享实例（模块在Streamlit重跑和多次Crew运行之间保持不变）
+ado_registry = AdoConnectionRegistry()
+confluence_pool = ConfluenceSessionPool()
+
+
+def get_ado_pool_stats():
+    """获取ADO连接池统计信息"""
+    return ado_registry.get_stats()
+
+
+def get_confluence_pool_stats():
+    """获取Confluence会话池统计信息"""
+    return confluence_pool.get_stats()
@@ -2,6 +2,10 @@
 from crewai import Crew, Task, LLM
 import os
 import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv, dotenv_values
 from pathlib import Path
 from typing import Dict, Any, Optional
@@ -11,10 +15,56 @@ load_dotenv()
 
 from .agents import create_analyzer, create_publisher
 from .tasks import generation_task, create_feature  # 如果你也拆了tasks.py
+from .analysis_cache import get_analysis_cache, get_cached_analysis, lookup_analysis, store_analysis
+from .idempotency import (
+    KIND_ADO_FEATURE,
+    KIND_CONFLUENCE_PAGE,
+    get_idempotency_scope,
+    get_scope_artifacts,
+    get_submitter,
+    idempotency_scope,
+    make_idempotency_key,
+    submitter_scope
+)
+from .publisher import (
+    delete_artifacts,
+    make_llm_formatter,
+    parse_analysis,
+    publish_requirement,
+    render_publish_result
+)
+from .run_store import (
+    STATUS_DISCARDED,
+    STATUS_DONE,
+    STATUS_FAILED,
+    RunCheckpoint,
+    get_run_store
+)
+from .streaming import emit_step, kickoff_crew
+
+ENV_PATH = Path(__file__).parent.parent.parent / ".env"
+
+# 缓存的LLM实例数量上限（每个 (模型, 配置指纹) 一个）
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "8"))
+
+# 发布方式：agent 由发布者Agent调用工具；direct 解析分析结果后在代码中直接创建工作项和页面
+PUBLISH_AGENT = "agent"
+PUBLISH_DIRECT = "direct"
+PUBLISH_MODE = os.getenv("PUBLISH_MODE", PUBLISH_AGENT)
+# direct 模式下是否用LLM排版页面正文（默认使用固定模板，不消耗额外的LLM调用）
+PUBLISH_FORMAT_WITH_LLM = os.getenv("PUBLISH_FORMAT_WITH_LLM", "false").lower() == "true"
+
+# 影响LLM配置的进程环境变量，变化时重新创建LLM
+_LLM_ENV_KEYS = (
+    "SELECTED_MODEL", "LLM_CONFIG",
+    "DASHSCOPE_API_KEY", "QWEN_MODEL_NAME", "QWEN_BASE_URL",
+    "GROK_API_KEY", "GROK_MODEL_NAME", "GROK_BASE_URL",
+    "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_DEPLOYMENT_NAME",
+)
 
 def load_env_vars():
     """加载环境变量"""
-    env_path = Path(__file__).parent.parent.parent / ".env"
+    env_path = ENV_PATH
     if env_path.exists():
         try:
             return dotenv_values(env_path)
@@ -160,7 +210,7 @@ def create_crew(selected_model: str, env_vars: Optional[Dict[str, str]] = None)
     Returns:
         Crew: 配置好的Crew实例
     """
-    llm = get_llm(selected_model, env_vars)
+    llm = llm_cache.get(selected_model, env_vars)
     analyzer = create_analyzer(llm)
     publisher = create_publisher(llm)
     
@@ -176,6 +226,50 @@ def create_crew(selected_model: str, env_vars: Optional[Dict[str, str]] = None)
         verbose=True
     )
 
+def create_analysis_crew(selected_model: str, env_vars: Optional[Dict[str, str]] = None) -> Crew:
+    """创建只包含需求分析任务的Crew，供direct发布模式使用"""
+    llm = llm_cache.get(selected_model, env_vars)
+    analyzer = create_analyzer(llm)
+
+    from .tasks import task1_description, task1_expected_output
+
+    task1_instance = create_task1_instance(task1_description, task1_expected_output, analyzer)
+
+    return Crew(
+        agents=[analyzer],
+        tasks=[task1_instance],
+        verbose=True
+    )
+
+def create_publish_crew(selected_model: str, env_vars: Optional[Dict[str, str]] = None) -> Crew:
+    """创建只包含发布任务的Crew，分析结果通过 {analysis_json} 传给发布者Agent"""
+    llm = llm_cache.get(selected_model, env_vars)
+    publisher = create_publisher(llm)
+
+    from .tasks import task2_analysis_input, task2_description, task2_expected_output
+
+    task2_instance = create_task2_instance(task2_analysis_input + task2_description, task2_expected_output,
+                                           publisher)
+
+    return Crew(
+        agents=[publisher],
+        tasks=[task2_instance],
+        verbose=True
+    )
+
+def get_task_analysis(crew) -> Optional[Dict[str, str]]:
+    """读取Crew中分析任务已完成的输出并解析，任务未完成或输出不是有效的分析JSON时返回None"""
+    tasks = getattr(crew, "tasks", None)
+    if not isinstance(tasks, list) or not tasks:
+        return None
+    raw = getattr(getattr(tasks[0], "output", None), "raw", None)
+    if not isinstance(raw, str):
+        return None
+    try:
+        return parse_analysis(raw)
+    except ValueError:
+        return None
+
 def create_task1_instance(description, expected_output, agent):
     """创建任务1实例，用于测试目的"""
     return Task(
@@ -192,7 +286,297 @@ def create_task2_instance(description, expected_output, agent):
         agent=agent
     )
 
-def run_crew(input_text: str, model_type: str = "qwen", env_vars: Optional[Dict[str, str]] = None) -> str:
+def get_config_fingerprint(env_vars: Optional[Dict[str, str]] = None) -> str:
+    """
+    LLM配置指纹：.env文件的修改时间和大小、相关进程环境变量以及传入的env_vars（包括凭据）
+
+    只读取文件元数据，不重新解析.env；返回SHA-256摘要，缓存键中不保存明文凭据
+    """
+    try:
+        stat = ENV_PATH.stat()
+        file_state = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        file_state = None
+    environ = tuple(os.getenv(key) for key in _LLM_ENV_KEYS)
+    explicit = tuple(sorted((str(key), str(value)) for key, value in env_vars.items())) if env_vars else None
+    return hashlib.sha256(repr((file_state, environ, explicit)).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    LLM实例缓存，按 (模型, 配置指纹) 复用 get_llm 的结果
+
+    只缓存不随运行变化的LLM客户端；Agent、Task和Crew保存任务输出、对话记忆和执行状态，
+    每次运行都由 create_crew 重新创建。不同凭据（env_vars）的配置指纹不同，各自缓存、互不影响；
+    .env或LLM_CONFIG修改后指纹变化，旧实例不再命中，按最近最少使用淘汰
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, model_type: str, env_vars: Optional[Dict[str, str]] = None) -> Any:
+        """返回模型和当前配置对应的LLM，未缓存时调用get_llm创建"""
+        key = (model_type, get_config_fingerprint(env_vars))
+        with self._lock:
+            llm = self._entries.get(key)
+            if llm is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return llm
+            self._stats['misses'] += 1
+
+        llm = get_llm(model_type, env_vars)
+        with self._lock:
+            self._entries[key] = llm
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return llm
+
+    def clear(self):
+        """丢弃全部缓存的LLM并重置统计"""
+        with self._lock:
+            self._entries.clear()
+            self._stats = {'hits': 0, 'misses': 0}
+
+    def get_stats(self):
+        """返回复用情况"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+# 进程级共享的LLM缓存
+llm_cache = LLMCache()
+
+def _start_run(input_text, model_type, publish_mode, run_id=None):
+    """创建或打开运行记录，返回 (运行ID, 检查点)；未启用运行进度保存或写入失败时检查点为None"""
+    store = get_run_store()
+    if store is None:
+        return run_id, None
+    try:
+        if run_id is None:
+            run_id = store.create_run(input_text, model_type, get_idempotency_scope(), publish_mode=publish_mode,
+                                      owner=get_submitter())
+        return run_id, RunCheckpoint(store, run_id)
+    except sqlite3.Error as e:
+        print(f"保存运行进度失败: {str(e)}")
+        return run_id, None
+
+
+def _fail_run(checkpoint, run_id, error):
+    """保存失败状态并返回带运行ID的异常，未保存进度时返回原异常"""
+    if checkpoint is None:
+        return error
+    checkpoint.save(status=STATUS_FAILED, error=str(error))
+    return Exception(f"{str(error)}（运行 {run_id} 已保存进度，可继续运行）")
+
+
+def run_direct_publish(input_text: str, model_type: str = "qwen", env_vars: Optional[Dict[str, str]] = None,
+                       format_with_llm: bool = PUBLISH_FORMAT_WITH_LLM, run_id: Optional[str] = None) -> str:
+    """
+    只用LLM完成需求分析，发布步骤在代码中直接调用ADO和Confluence
+
+    启用运行进度保存时，每个阶段完成后保存检查点；失败后可用 resume_run(run_id) 从失败的阶段继续
+
+    Args:
+        input_text (str): 输入文本
+        model_type (str): 模型类型
+        env_vars (dict): 环境变量字典，用于测试时mock
+        format_with_llm (bool): 是否用LLM排版页面正文
+        run_id (str): 继续已有的运行，None时创建新的运行记录
+
+    Returns:
+        str: Markdown格式的需求和发布结果
+    """
+    run_id, checkpoint = _start_run(input_text, model_type, PUBLISH_DIRECT, run_id)
+
+    def analyze(text):
+        crew = create_analysis_crew(model_type, env_vars)
+        return parse_analysis(kickoff_crew(crew, {"input_text": text}))
+
+    try:
+        analysis = checkpoint.get("analysis") if checkpoint else None
+        if analysis is None:
+            # 重复或相似的需求复用缓存的分析结果，不再调用LLM
+            analysis = get_cached_analysis(get_analysis_cache(), input_text, model_type, analyze)
+            if checkpoint:
+                checkpoint.save(analysis=analysis)
+        else:
+            emit_step(f"使用运行 {run_id} 已保存的分析结果")
+
+        formatter = None
+        if format_with_llm:
+            formatter = make_llm_formatter(llm_cache.get(model_type, env_vars))
+
+        emit_step(f"分析完成，正在创建ADO工作项和Confluence页面：{analysis['summary']}")
+        result = publish_requirement(analysis, formatter, checkpoint=checkpoint)
+        output = render_publish_result(analysis, result)
+    except Exception as e:
+        raise _fail_run(checkpoint, run_id, e)
+
+    if checkpoint:
+        checkpoint.save(status=STATUS_DONE, result=output, error=None)
+    return output
+
+
+def run_agent_publish(input_text: str, model_type: str = "qwen", env_vars: Optional[Dict[str, str]] = None,
+                      run_id: Optional[str] = None) -> Any:
+    """
+    由发布者Agent创建工作项和页面
+
+    分析结果来自运行检查点或命中缓存时只运行发布任务，不再调用分析LLM；否则运行分析和发布两个任务，
+    分析任务完成后结果写入缓存和检查点，发布任务失败时继续运行也不再重新分析。
+    运行结束或失败时把台账中本次运行已创建的工作项和页面写入检查点，继续运行时沿用同一幂等键复用它们，
+    放弃运行时删除它们
+
+    Args:
+        input_text (str): 输入文本
+        model_type (str): 模型类型
+        env_vars (dict): 环境变量字典，用于测试时mock
+        run_id (str): 继续已有的运行，None时创建新的运行记录
+
+    Returns:
+        CrewOutput: 发布者Agent的输出
+    """
+    run_id, checkpoint = _start_run(input_text, model_type, PUBLISH_AGENT, run_id)
+    cache = get_analysis_cache()
+    analysis = checkpoint.get("analysis") if checkpoint else None
+    if analysis is not None:
+        emit_step(f"使用运行 {run_id} 已保存的分析结果")
+    else:
+        analysis, analysis_input = lookup_analysis(cache, input_text, model_type)
+        if analysis is not None and checkpoint:
+            checkpoint.save(analysis=analysis)
+
+    crew = None
+    try:
+        if analysis is not None:
+            emit_step(f"使用已有的分析结果，只运行发布任务：{analysis['summary']}")
+            crew = create_publish_crew(model_type, env_vars)
+            result = kickoff_crew(crew, {"input_text": input_text,
+                                         "analysis_json": json.dumps(analysis, ensure_ascii=False, indent=2)})
+        else:
+            # 每次运行使用新的Crew、Agent和Task，LLM从缓存中复用
+            crew = create_crew(model_type, env_vars)
+            try:
+                result = kickoff_crew(crew, {"input_text": analysis_input})
+            finally:
+                analysis = get_task_analysis(crew)
+                if analysis is not None:
+                    store_analysis(cache, input_text, model_type, analysis)
+                    if checkpoint:
+                        checkpoint.save(analysis=analysis)
+    except Exception as e:
+        if checkpoint:
+            _save_agent_artifacts(checkpoint)
+        raise _fail_run(checkpoint, run_id, e)
+
+    if checkpoint:
+        _save_agent_artifacts(checkpoint)
+        checkpoint.save(status=STATUS_DONE, result=str(result), error=None, title_updated=True)
+    return result
+
+
+def _save_agent_artifacts(checkpoint):
+    """把台账中本次运行（幂等范围）已创建的Feature和页面写入检查点"""
+    artifacts = get_scope_artifacts(get_idempotency_scope())
+    fields = {}
+    if artifacts.get(KIND_ADO_FEATURE):
+        fields["work_item_id"] = artifacts[KIND_ADO_FEATURE][-1]
+    if artifacts.get(KIND_CONFLUENCE_PAGE):
+        fields["page_id"] = artifacts[KIND_CONFLUENCE_PAGE][-1]
+    if fields:
+        checkpoint.save(**fields)
+
+
+def resume_run(run_id: str, env_vars: Optional[Dict[str, str]] = None,
+               format_with_llm: bool = PUBLISH_FORMAT_WITH_LLM, owner: Optional[str] = None) -> str:
+    """
+    从失败的阶段继续运行：已保存的分析结果、工作项和页面直接复用
+
+    Args:
+        run_id (str): 运行ID
+        env_vars (dict): 环境变量字典，用于测试时mock
+        format_with_llm (bool): 是否用LLM排版页面正文（direct模式）
+        owner (str): 提交人，不为None时只能继续该提交人的运行
+
+    Returns:
+        str: 运行结果，已完成的运行直接返回保存的结果
+    """
+    store = get_run_store()
+    run = store.get_run(run_id) if store is not None else None
+    if run is None or (owner is not None and run["owner"] != owner):
+        return f"Error: 运行 {run_id} 不存在"
+    if run["status"] == STATUS_DONE:
+        return run["result"]
+    if run["status"] == STATUS_DISCARDED:
+        return f"Error: 运行 {run_id} 已放弃"
+    # 只有失败的运行可以继续；同时点击两次或两个会话同时继续时只有一个能领取
+    if not store.claim(run_id):
+        return f"Error: 运行 {run_id} 正在运行"
+
+    try:
+        # 沿用原运行的幂等键，已创建的工作项和页面不会重复创建
+        scope_key = run["idempotency_key"] or make_idempotency_key(run["input_text"], submitter=run["owner"])
+        with idempotency_scope(scope_key), submitter_scope(run["owner"]):
+            if run["publish_mode"] == PUBLISH_AGENT:
+                return str(run_agent_publish(run["input_text"], run["model_type"], env_vars, run_id=run_id))
+            return run_direct_publish(run["input_text"], run["model_type"], env_vars, format_with_llm,
+                                      run_id=run_id)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def discard_run(run_id: str, owner: Optional[str] = None) -> str:
+    """
+    放弃失败的运行：删除运行已创建的ADO工作项和Confluence页面（含临时标题的页面），
+    删除幂等台账中的记录，并把运行标记为已放弃，不再出现在未完成的运行中
+
+    部分删除失败时保存已删除的结果，再次放弃只删除剩下的产物
+
+    Args:
+        run_id (str): 运行ID
+        owner (str): 提交人，不为None时只能放弃该提交人的运行
+
+    Returns:
+        str: 删除结果，失败时以 "Error:" 开头
+    """
+    store = get_run_store()
+    run = store.get_run(run_id) if store is not None else None
+    if run is None or (owner is not None and run["owner"] != owner):
+        return f"Error: 运行 {run_id} 不存在"
+    if run["status"] == STATUS_DONE:
+        return f"Error: 运行 {run_id} 已完成，不能放弃"
+    if run["status"] == STATUS_DISCARDED:
+        return f"运行 {run_id} 已放弃"
+    # 与继续运行互斥：正在继续的运行不能放弃
+    if not store.claim(run_id):
+        return f"Error: 运行 {run_id} 正在运行"
+
+    errors = delete_artifacts(run["work_item_id"], run["page_id"])
+    deleted = {}
+    if run["work_item_id"] and "work_item" not in errors:
+        deleted["work_item_id"] = None
+    if run["page_id"] and "page" not in errors:
+        deleted.update(page_id=None, page_title=None, title_updated=False)
+    if errors:
+        message = "；".join(errors.values())
+        store.update(run_id, status=STATUS_FAILED, error=message, **deleted)
+        return f"Error: {message}"
+
+    store.update(run_id, status=STATUS_DISCARDED, error=None, **deleted)
+    removed = [f"工作项 {run['work_item_id']}"] if run["work_item_id"] else []
+    removed += [f"页面 {run['page_id']}"] if run["page_id"] else []
+    return f"运行 {run_id} 已放弃" + (f"，已删除{'、'.join(removed)}" if removed else "")
+
+
+def run_crew(input_text: str, model_type: str = "qwen", env_vars: Optional[Dict[str, str]] = None,
+             publish_mode: Optional[str] = None, idempotency_key: Optional[str] = None) -> str:
     """
     运行Crew任务
     
@@ -200,13 +584,20 @@ def run_crew(input_text: str, model_type: str = "qwen", env_vars: Optional[Dict[
         input_text (str): 输入文本
         model_type (str): 模型类型
         env_vars (dict): 环境变量字典，用于测试时mock
+        publish_mode (str): agent 或 direct，None时使用PUBLISH_MODE
+        idempotency_key (str): 幂等键，None时沿用外层设置的幂等键或由需求文本生成；
+            同一幂等键只创建一个Feature和一个页面，重试时返回已创建的工作项和页面
     
     Returns:
         str: 运行结果
     """
+    scope_key = idempotency_key or get_idempotency_scope() or make_idempotency_key(input_text)
     try:
-        crew = create_crew(model_type, env_vars)
-        result = crew.kickoff(inputs={"input_text": input_text})
+        with idempotency_scope(scope_key):
+            if (publish_mode or PUBLISH_MODE) == PUBLISH_DIRECT:
+                return run_direct_publish(input_text, model_type, env_vars)
+
+            result = run_agent_publish(input_text, model_type, env_vars)
         return str(result)  # 返回值，便于测试
     except Exception as e:
         return f"Error: {str(e)}"  # 覆盖异常
\ No newline at end of file
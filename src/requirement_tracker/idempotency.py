@@ -0,0 +1,416 @@
+"""
+外部写入的幂等模块
+为创建ADO工作项和Confluence页面生成幂等键，把已创建的工作项ID和页面ID记录在本地台账中；
+相同幂等键的重复创建（重试run_crew、发布者Agent重复调用工具）直接返回已有的工作项或页面
+
+run_crew 在一次运行中用 idempotency_scope(key) 设置幂等范围：幂等键由调用方提供，或由ADO组织和项目、
+Confluence空间、提交人和需求文本生成，范围内每类产物只创建一次；范围外直接调用工具时按写入内容生成幂等键
+
+创建前先在台账中预留幂等键（写事务中插入pending记录），多个进程同时创建同一产物时只有一个调用执行创建，
+其余调用等待并复用结果；复用前确认产物仍然存在，已被手动删除的产物重新创建
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .analysis_cache import normalize_text
+
+IDEMPOTENCY_LEDGER_PATH = os.getenv("IDEMPOTENCY_LEDGER_PATH", os.path.join(".cache", "ledger.db"))
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+# 台账记录的有效期（秒），过期后同一幂等键会重新创建
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(7 * 24 * 3600)))
+# 预留的幂等键超过该时长（秒）仍未完成创建时视为创建方已退出，其他调用可以重新预留
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "300"))
+# 等待其他调用完成创建时查询台账的间隔（秒）
+IDEMPOTENCY_POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", "0.2"))
+
+# 产物类型
+KIND_ADO_FEATURE = "ado_feature"
+KIND_ADO_WORK_ITEM = "ado_work_item"
+KIND_CONFLUENCE_PAGE = "confluence_page"
+
+# 台账记录状态：pending 已预留、正在创建；created 已创建
+ENTRY_PENDING = "pending"
+ENTRY_CREATED = "created"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    idempotency_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    artifact_id TEXT NOT NULL,
+    scope TEXT,
+    status TEXT NOT NULL DEFAULT 'created',
+    owner TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_artifact ON ledger (kind, artifact_id);
+"""
+
+# 旧版本台账文件缺少的列
+_MIGRATIONS = (
+    ("status", "ALTER TABLE ledger ADD COLUMN status TEXT NOT NULL DEFAULT 'created'"),
+    ("owner", "ALTER TABLE ledger ADD COLUMN owner TEXT"),
+)
+
+_scope = ContextVar("idempotency_scope", default=None)
+_submitter = ContextVar("idempotency_submitter", default=None)
+
+
+def get_idempotency_namespace(submitter=None):
+    """生成幂等键的命名空间：ADO组织和项目、Confluence站点和空间，以及提交人（已知时）"""
+    return (
+        (os.getenv("ADO_ORG_URL") or "").rstrip("/").lower(),
+        os.getenv("ADO_PROJECT") or "",
+        (os.getenv("CONFLUENCE_URL") or "").rstrip("/").lower(),
+        os.getenv("CONFLUENCE_SPACE") or "",
+        submitter or "",
+    )
+
+
+def make_idempotency_key(input_text, caller_key=None, submitter=None):
+    """
+    一次运行的幂等键：调用方提供时直接使用，否则为命名空间和规范化需求文本的SHA-256
+
+    不同项目、空间或提交人提交相同的需求文本不会复用彼此的工作项和页面；
+    submitter为None时使用 submitter_scope 设置的提交人。需要在不同的运行之间复用时由调用方提供幂等键
+    """
+    if caller_key:
+        return str(caller_key)
+    raw = "\0".join(get_idempotency_namespace(submitter or _submitter.get()) + (normalize_text(input_text),))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_idempotency_scope():
+    """当前上下文的幂等键，不在run_crew中时返回None"""
+    return _scope.get()
+
+
+@contextmanager
+def idempotency_scope(key):
+    """在上下文中设置幂等键，范围内同一类产物只创建一次"""
+    token = _scope.set(key)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def get_submitter():
+    """当前上下文的提交人（如Web会话ID），未知时返回None"""
+    return _submitter.get()
+
+
+@contextmanager
+def submitter_scope(submitter):
+    """在上下文中设置提交人，由需求文本生成的幂等键按提交人区分"""
+    token = _submitter.set(submitter)
+    try:
+        yield
+    finally:
+        _submitter.reset(token)
+
+
+def make_artifact_key(kind, content, include_content=False):
+    """
+    产物的幂等键：有幂等范围时为 (范围, 类型)，否则为 (类型, 规范化的写入内容)
+
+    include_content为True时（一次调用创建多个同类产物，如批量创建工作项）幂等键同时包含范围和写入内容
+    """
+    scope = get_idempotency_scope()
+    if scope and include_content:
+        raw = f"{kind}\0scope\0{scope}\0content\0{normalize_text(content)}"
+    elif scope:
+        raw = f"{kind}\0scope\0{scope}"
+    else:
+        raw = f"{kind}\0content\0{normalize_text(content)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IdempotencyLedger:
+    """已创建产物的本地台账"""
+
+    def __init__(self, path=IDEMPOTENCY_LEDGER_PATH, ttl=IDEMPOTENCY_TTL, clock=time.time,
+                 pending_timeout=IDEMPOTENCY_PENDING_TIMEOUT, poll_interval=IDEMPOTENCY_POLL_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._stats = {'created': 0, 'reused': 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ledger)")}
+            for column, statement in _MIGRATIONS:
+                if column not in columns:
+                    conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, key):
+        """返回幂等键对应的已创建产物ID，不存在、正在创建或已过期时返回None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT artifact_id FROM ledger WHERE idempotency_key = ? AND status = ? AND created_at >= ?",
+                (key, ENTRY_CREATED, self._clock() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, key, kind, artifact_id):
+        """记录已创建的产物"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ledger (idempotency_key, kind, artifact_id, scope, status, owner, created_at) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                (key, kind, str(artifact_id), get_idempotency_scope(), ENTRY_CREATED, self._clock())
+            )
+
+    def _reserve(self, keys, kind, owner):
+        """
+        在一个写事务中预留幂等键
+
+        Returns:
+            tuple: ({键: 已创建的产物ID}, 其他调用正在创建的键列表)；其余的键由owner预留
+        """
+        now = self._clock()
+        existing, pending = {}, []
+        with self._connect() as conn:
+            # 写锁保证多个进程不会同时预留同一个键
+            conn.execute("BEGIN IMMEDIATE")
+            for key in keys:
+                row = conn.execute(
+                    "SELECT artifact_id, status, created_at FROM ledger WHERE idempotency_key = ?", (key,)
+                ).fetchone()
+                if row and row[1] == ENTRY_CREATED and row[2] >= now - self.ttl:
+                    existing[key] = row[0]
+                elif row and row[1] == ENTRY_PENDING and row[2] >= now - self.pending_timeout:
+                    pending.append(key)
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ledger "
+                        "(idempotency_key, kind, artifact_id, scope, status, owner, created_at) "
+                        "VALUES (?, ?, '', ?, ?, ?, ?)",
+                        (key, kind, get_idempotency_scope(), ENTRY_PENDING, owner, now)
+                    )
+        return existing, pending
+
+    def _release(self, owner):
+        """删除owner预留但没有创建成功的键，之后的调用会重新创建"""
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM ledger WHERE status = ? AND owner = ?", (ENTRY_PENDING, owner))
+        except sqlite3.Error as e:
+            print(f"释放幂等键失败: {str(e)}")
+
+    def _acquire(self, keys, kind, owner, exists=None):
+        """
+        预留幂等键，返回 {键: 已有产物ID}，其余的键由owner预留
+
+        其他调用正在创建的键等待其完成后复用；已有产物被删除（exists返回False）时移除记录并重新预留
+        """
+        found = {}
+        waiting = list(dict.fromkeys(keys))
+        while waiting:
+            existing, pending = self._reserve(waiting, kind, owner)
+            gone = []
+            for key, artifact_id in existing.items():
+                if exists is not None and not self._still_exists(exists, kind, artifact_id):
+                    print(f"台账中的{kind} {artifact_id} 已不存在，重新创建")
+                    self.forget(kind, artifact_id)
+                    gone.append(key)
+                else:
+                    found[key] = artifact_id
+            if pending and not gone:
+                time.sleep(self.poll_interval)
+            waiting = pending + gone
+        return found
+
+    @staticmethod
+    def _still_exists(exists, kind, artifact_id):
+        """确认已有产物仍然存在，无法确认时按存在处理，避免重复创建"""
+        try:
+            return exists(artifact_id)
+        except Exception as e:
+            print(f"无法确认{kind} {artifact_id} 是否存在: {str(e)}")
+            return True
+
+    def forget(self, kind, artifact_id):
+        """产物被删除后移除记录，之后同一幂等键会重新创建"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM ledger WHERE kind = ? AND artifact_id = ?", (kind, str(artifact_id)))
+
+    def create_once(self, kind, content, create, exists=None):
+        """
+        幂等地创建产物
+
+        Args:
+            kind (str): 产物类型
+            content (str): 写入内容（无幂等范围时用于生成幂等键）
+            create (callable): 实际创建产物的函数，返回产物ID
+            exists (callable): exists(artifact_id) -> bool，复用前确认产物仍然存在，None表示不确认
+
+        Returns:
+            str: 新建或已有的产物ID
+        """
+        key = make_artifact_key(kind, content)
+        owner = uuid.uuid4().hex
+        try:
+            existing = self._acquire([key], kind, owner, exists).get(key)
+        except sqlite3.Error as e:
+            print(f"读取幂等台账失败: {str(e)}")
+            return create()
+        if existing is not None:
+            self._stats['reused'] += 1
+            print(f"幂等键已存在，复用已创建的{kind}: {existing}")
+            return existing
+
+        try:
+            artifact_id = create()
+        except BaseException:
+            self._release(owner)
+            raise
+        self._stats['created'] += 1
+        try:
+            self.record(key, kind, artifact_id)
+        except sqlite3.Error as e:
+            print(f"写入幂等台账失败: {str(e)}")
+            self._release(owner)
+        return artifact_id
+
+    def create_many(self, kind, contents, create, exists=None):
+        """
+        幂等地批量创建产物，每个产物的幂等键由范围和各自的写入内容生成
+
+        Args:
+            kind (str): 产物类型
+            contents (list): 每个产物的写入内容
+            create (callable): create(existing) -> list，existing为 {序号: 已有产物ID}，
+                只创建其余的产物，返回与contents顺序一致的产物ID（创建失败为None）
+            exists (callable): exists(artifact_id) -> bool，复用前确认产物仍然存在，None表示不确认
+
+        Returns:
+            list: create 的返回值
+        """
+        keys = [make_artifact_key(kind, content, include_content=True) for content in contents]
+        owner = uuid.uuid4().hex
+        try:
+            found = self._acquire(keys, kind, owner, exists)
+        except sqlite3.Error as e:
+            print(f"读取幂等台账失败: {str(e)}")
+            return create({})
+        existing = {index: found[key] for index, key in enumerate(keys) if key in found}
+        if existing:
+            self._stats['reused'] += len(existing)
+            print(f"幂等键已存在，复用 {len(existing)} 个已创建的{kind}")
+
+        try:
+            artifact_ids = create(existing)
+            for index, artifact_id in enumerate(artifact_ids):
+                if artifact_id is None or index in existing:
+                    continue
+                self._stats['created'] += 1
+                try:
+                    self.record(keys[index], kind, artifact_id)
+                except sqlite3.Error as e:
+                    print(f"写入幂等台账失败: {str(e)}")
+        finally:
+            # 创建失败的项不保留预留记录
+            self._release(owner)
+        return artifact_ids
+
+    def get_scope_artifacts(self, scope):
+        """幂等范围内已创建的产物 {类型: [产物ID]}，按创建时间排序"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT kind, artifact_id FROM ledger WHERE scope = ? AND status = ? ORDER BY created_at, rowid",
+                (scope, ENTRY_CREATED)
+            ).fetchall()
+        artifacts = {}
+        for kind, artifact_id in rows:
+            artifacts.setdefault(kind, []).append(artifact_id)
+        return artifacts
+
+    def clear(self):
+        """清空台账"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM ledger")
+
+    def get_stats(self):
+        """返回新建和复用次数以及已创建的台账条目数"""
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM ledger WHERE status = ?", (ENTRY_CREATED,)).fetchone()[0]
+        return dict(self._stats, entries=entries)
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_idempotency_ledger():
+    """获取进程级共享的台账，未启用或台账文件无法创建时返回None"""
+    global _ledger
+    if not IDEMPOTENCY_ENABLED:
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            try:
+                _ledger = IdempotencyLedger(IDEMPOTENCY_LEDGER_PATH)
+            except (OSError, sqlite3.Error) as e:
+                print(f"无法创建幂等台账 {IDEMPOTENCY_LEDGER_PATH}: {str(e)}")
+                return None
+        return _ledger
+
+
+def create_once(kind, content, create, exists=None):
+    """使用共享台账幂等地创建产物，台账不可用时直接创建"""
+    ledger = get_idempotency_ledger()
+    if ledger is None:
+        return create()
+    return ledger.create_once(kind, content, create, exists)
+
+
+def create_many(kind, contents, create, exists=None):
+    """使用共享台账幂等地批量创建产物，台账不可用时全部直接创建"""
+    ledger = get_idempotency_ledger()
+    if ledger is None:
+        return create({})
+    return ledger.create_many(kind, contents, create, exists)
+
+
+def forget_artifact(kind, artifact_id):
+    """从共享台账中移除已删除的产物，台账不可用或写入失败时忽略"""
+    ledger = get_idempotency_ledger()
+    if ledger is None:
+        return
+    try:
+        ledger.forget(kind, artifact_id)
+    except sqlite3.Error as e:
+        print(f"更新幂等台账失败: {str(e)}")
+
+
+def get_scope_artifacts(scope):
+    """共享台账中幂等范围内已创建的产物 {类型: [产物ID]}，台账不可用或读取失败时返回空字典"""
+    ledger = get_idempotency_ledger()
+    if ledger is None or not scope:
+        return {}
+    try:
+        return ledger.get_scope_artifacts(scope)
+    except sqlite3.Error as e:
+        print(f"读取幂等台账失败: {str(e)}")
+        return {}
@@ -0,0 +1,384 @@
+"""
+后台任务队列模块
+需求处理任务写入本地SQLite队列，由独立的工作进程池取出执行并写回状态和结果；
+Streamlit页面只提交任务并轮询状态，不在脚本线程中运行Crew，页面刷新或关闭后结果仍然保留
+
+工作进程随Web应用启动（JOB_WORKERS），也可以单独运行：
+    python -m src.requirement_tracker.job_queue --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .idempotency import submitter_scope
+from .streaming import EVENT_TOKEN, describe_event, stream_crew_events
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.db"))
+# Web应用启动的工作进程数量，0表示由单独运行的工作进程处理
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# 工作进程空闲时查询新任务的间隔（秒），页面也按这个间隔刷新任务状态
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# 运行中的任务每隔这么久（秒）更新一次心跳
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+# 心跳超过该时长（秒）未更新的任务视为工作进程已退出，重新排队；运行时间再长也不会被重新排队
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "300"))
+# 每个任务最多领取的次数；工作进程反复异常退出的任务达到上限后标记为失败，不再重新排队
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    input_text TEXT NOT NULL,
+    model_type TEXT NOT NULL,
+    publish_mode TEXT,
+    submitter TEXT,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+# 旧版本队列文件缺少的列
+_MIGRATIONS = (
+    ("heartbeat_at", "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL"),
+    ("submitter", "ALTER TABLE jobs ADD COLUMN submitter TEXT"),
+)
+
+
+class JobQueue:
+    """持久化的任务队列，多个进程可以同时提交和领取任务"""
+
+    def __init__(self, path=JOB_QUEUE_PATH, clock=time.time):
+        self.path = path
+        self._clock = clock
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in _MIGRATIONS:
+                if column not in columns:
+                    conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, input_text, model_type, publish_mode=None, submitter=None):
+        """提交任务并返回任务ID，submitter为提交人（如Web会话ID）"""
+        job_id = uuid.uuid4().hex[:12]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, input_text, model_type, publish_mode, submitter, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, input_text, model_type, publish_mode, submitter, JOB_QUEUED, self._clock())
+            )
+        return job_id
+
+    def claim(self, worker_id):
+        """领取最早排队的任务并标记为运行中，没有任务时返回None"""
+        with self._connect() as conn:
+            # 写锁保证多个工作进程不会领取同一个任务
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at, rowid LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = self._clock()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1, "
+                "progress = NULL WHERE job_id = ?",
+                (JOB_RUNNING, worker_id, now, now, row["job_id"])
+            )
+            return dict(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone())
+
+    def heartbeat(self, job_id, worker_id):
+        """
+        更新运行中任务的心跳
+
+        Returns:
+            bool: 任务仍由该工作进程运行时返回True；已被重新排队或由其他工作进程领取时返回False
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = ? AND worker = ?",
+                (self._clock(), job_id, JOB_RUNNING, worker_id)
+            )
+            return cursor.rowcount > 0
+
+    def set_progress(self, job_id, progress):
+        """记录任务当前的处理步骤"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE job_id = ?", (progress, job_id))
+
+    def complete(self, job_id, result, worker_id):
+        """任务完成，返回是否写入（任务已被重新排队时不写入）"""
+        return self._finish(job_id, worker_id, JOB_DONE, result=result)
+
+    def fail(self, job_id, error, worker_id):
+        """任务失败，返回是否写入（任务已被重新排队时不写入）"""
+        return self._finish(job_id, worker_id, JOB_FAILED, error=error)
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None):
+        # 与心跳相同，只有当前领取任务的工作进程可以写入结果，重新排队前的工作进程不会覆盖新的结果
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE job_id = ? AND status = ? AND worker = ?",
+                (status, result, error, self._clock(), job_id, JOB_RUNNING, worker_id)
+            )
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, timeout=JOB_TIMEOUT, max_attempts=JOB_MAX_ATTEMPTS):
+        """
+        把心跳超时的任务重新排队（工作进程异常退出），返回重新排队的数量
+
+        仍在运行的任务由工作进程定期更新心跳，不会因为运行时间长而被其他工作进程重复执行；
+        已领取 max_attempts 次的任务（例如每次都让工作进程崩溃的需求）标记为失败，不再重新排队
+        """
+        now = self._clock()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, finished_at = ?, "
+                "error = '工作进程异常退出，已重试 ' || attempts || ' 次' "
+                "WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ? AND attempts >= ?",
+                (JOB_FAILED, now, JOB_RUNNING, now - timeout, max_attempts)
+            )
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL "
+                "WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ?",
+                (JOB_QUEUED, JOB_RUNNING, now - timeout)
+            )
+            return cursor.rowcount
+
+    def get_job(self, job_id):
+        """返回任务字典，不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_jobs(self, job_ids):
+        """按给定顺序返回存在的任务"""
+        jobs = (self.get_job(job_id) for job_id in job_ids)
+        return [job for job in jobs if job is not None]
+
+    def get_stats(self):
+        """各状态的任务数量"""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+
+
+@contextmanager
+def keep_alive(queue, job, interval=JOB_HEARTBEAT_INTERVAL):
+    """在后台线程中定期更新任务心跳，直到退出上下文"""
+    stop_event = threading.Event()
+
+    def beat():
+        while not stop_event.wait(interval):
+            try:
+                queue.heartbeat(job["job_id"], job["worker"])
+            except sqlite3.Error as e:
+                print(f"更新任务 {job['job_id']} 心跳失败: {str(e)}")
+
+    thread = threading.Thread(target=beat, name=f"req-agent-heartbeat-{job['job_id']}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def process_job(queue, job, runner, heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+    """
+    执行一个已领取的任务，把处理步骤写入progress，结果写回队列；执行期间定期更新心跳
+
+    Args:
+        queue (JobQueue): 任务队列
+        job (dict): claim 返回的任务
+        runner (callable): runner(input_text, model_type, publish_mode=...) -> str，通常为run_crew
+        heartbeat_interval (float): 心跳间隔（秒）
+    """
+    def handler(event):
+        # 文本片段太多，只记录任务切换、工具调用和代码步骤
+        if event["type"] != EVENT_TOKEN:
+            queue.set_progress(job["job_id"], describe_event(event))
+
+    try:
+        # 按提交人生成幂等键，不同会话提交相同的需求文本不会复用彼此的工作项和页面
+        with keep_alive(queue, job, heartbeat_interval), stream_crew_events(handler), \
+                submitter_scope(job["submitter"]):
+            result = runner(job["input_text"], job["model_type"], publish_mode=job["publish_mode"])
+    except Exception as e:
+        queue.fail(job["job_id"], str(e), job["worker"])
+        return
+
+    # run_crew 不抛出异常，失败时返回 "Error: ..."
+    if str(result).startswith("Error:"):
+        queue.fail(job["job_id"], str(result), job["worker"])
+    else:
+        queue.complete(job["job_id"], str(result), job["worker"])
+
+
+def run_worker(path=JOB_QUEUE_PATH, poll_interval=JOB_POLL_INTERVAL, stop_event=None, runner=None,
+               max_jobs=None):
+    """
+    工作进程主循环：领取并执行任务，空闲时重新排队心跳超时的任务并等待
+
+    Args:
+        path (str): 队列文件路径
+        poll_interval (float): 空闲时的查询间隔（秒）
+        stop_event: 设置后在当前任务完成后退出
+        runner (callable): 执行任务的函数，None时使用run_crew
+        max_jobs (int): 处理这么多任务后退出，None表示不限制
+
+    Returns:
+        int: 处理的任务数量
+    """
+    if runner is None:
+        from .crew import run_crew as runner
+
+    queue = JobQueue(path)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    processed = 0
+    while not (stop_event is not None and stop_event.is_set()):
+        if max_jobs is not None and processed >= max_jobs:
+            break
+        job = queue.claim(worker_id)
+        if job is None:
+            queue.requeue_stale()
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        process_job(queue, job, runner)
+        processed += 1
+    return processed
+
+
+class WorkerPool:
+    """工作进程池：每个进程运行 run_worker，进程之间通过队列文件协调"""
+
+    def __init__(self, size=JOB_WORKERS, path=JOB_QUEUE_PATH, poll_interval=JOB_POLL_INTERVAL):
+        self.size = size
+        self.path = path
+        self.poll_interval = poll_interval
+        # spawn：不继承Streamlit进程中的线程和连接
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._processes = []
+
+    def start(self):
+        """启动工作进程（已启动时补齐退出的进程）"""
+        if self._stop_event is None:
+            self._stop_event = self._context.Event()
+        self._processes = [process for process in self._processes if process.is_alive()]
+        while len(self._processes) < self.size:
+            process = self._context.Process(
+                target=run_worker, args=(self.path, self.poll_interval, self._stop_event),
+                name=f"req-agent-worker-{len(self._processes) + 1}", daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout=10):
+        """通知工作进程在当前任务完成后退出，超时仍未退出的进程被终止"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._stop_event = None
+
+    def alive_count(self):
+        return sum(1 for process in self._processes if process.is_alive())
+
+
+_job_queue = None
+_worker_pool = None
+_lock = threading.Lock()
+
+
+def get_job_queue():
+    """获取进程级共享的任务队列"""
+    global _job_queue
+    with _lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_QUEUE_PATH)
+        return _job_queue
+
+
+def ensure_workers():
+    """确保Web应用的工作进程已启动，JOB_WORKERS为0时不启动（由单独运行的工作进程处理）"""
+    global _worker_pool
+    if JOB_WORKERS <= 0:
+        return None
+    with _lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool(JOB_WORKERS, JOB_QUEUE_PATH)
+        _worker_pool.start()
+        return _worker_pool
+
+
+def submit_job(input_text, model_type, publish_mode=None, submitter=None):
+    """提交需求处理任务并确保有工作进程处理，返回任务ID"""
+    job_id = get_job_queue().submit(input_text, model_type, publish_mode, submitter)
+    ensure_workers()
+    return job_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='需求处理任务的工作进程')
+    parser.add_argument('--workers', type=int, default=max(JOB_WORKERS, 1), help='工作进程数量')
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.workers, JOB_QUEUE_PATH)
+    pool.start()
+    print(f"已启动 {args.workers} 个工作进程，队列 {JOB_QUEUE_PATH}，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(JOB_POLL_INTERVAL)
+            pool.start()
+    except KeyboardInterrupt:
+        print("正在等待当前任务完成...")
+        pool.stop(timeout=JOB_TIMEOUT)
+
+
+if __name__ == "__main__":
+    main()
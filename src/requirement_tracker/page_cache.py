@@ -0,0 +1,187 @@
+"""
+Confluence 页面内容缓存模块
+基于SQLite的磁盘缓存，按 (页面ID, 版本号) 保存页面内容，可在多个会话和进程间共享
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# 缓存文件路径和容量上限（字节）
+PAGE_CACHE_PATH = os.getenv("CONFLUENCE_PAGE_CACHE_PATH", os.path.join(".cache", "confluence_pages.db"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("CONFLUENCE_PAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_content (
+    page_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_page_content_last_access ON page_content (last_access);
+"""
+
+
+class PageContentCache:
+    """
+    页面内容的磁盘缓存
+
+    每个页面只保留最新版本；总大小超过上限时按最近访问时间（LRU）淘汰
+    """
+
+    def __init__(self, path=PAGE_CACHE_PATH, max_bytes=PAGE_CACHE_MAX_BYTES, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # WAL模式允许多个进程同时读取
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, page_id, version):
+        """
+        读取指定版本的页面内容
+
+        Returns:
+            dict: 缓存的页面内容，不存在或版本不一致时返回None
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT version, data FROM page_content WHERE page_id = ?", (str(page_id),)
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            if row[0] != int(version):
+                self._stats['stale'] += 1
+                return None
+
+            conn.execute(
+                "UPDATE page_content SET last_access = ? WHERE page_id = ?", (self._clock(), str(page_id))
+            )
+            self._stats['hits'] += 1
+            return json.loads(row[1])
+
+    def put(self, page_id, version, content):
+        """写入页面内容（覆盖旧版本），并在超出容量时淘汰最久未访问的页面"""
+        data = json.dumps(content, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_content (page_id, version, data, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(page_id), int(version), data, size, self._clock())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_content").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for page_id, size in conn.execute(
+            "SELECT page_id, size FROM page_content ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM page_content WHERE page_id = ?", (page_id,))
+            total -= size
+            self._stats['evictions'] += 1
+
+    def invalidate(self, page_id=None):
+        """删除指定页面的缓存，page_id为None时清空全部缓存"""
+        with self._lock, self._connect() as conn:
+            if page_id is None:
+                conn.execute("DELETE FROM page_content")
+            else:
+                conn.execute("DELETE FROM page_content WHERE page_id = ?", (str(page_id),))
+
+    def get_stats(self):
+        """返回缓存命中情况和占用空间"""
+        with self._lock, self._connect() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_content"
+            ).fetchone()
+            stats = dict(self._stats)
+        stats['entries'] = entries
+        stats['bytes'] = total
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+def get_page_version(confluence, page_id):
+    """只获取页面的版本号（不下载正文），用于判断缓存是否仍然有效"""
+    page = confluence.get_page_by_id(page_id=page_id, expand='version')
+    return (page or {}).get('version', {}).get('number')
+
+
+def get_cached_page(confluence, page_id, cache, fetch):
+    """
+    带版本校验的页面读取
+
+    先用轻量的版本请求检查缓存，版本一致时直接返回缓存内容，否则调用fetch下载完整页面并写入缓存。
+    缓存读写失败时直接下载，不影响页面显示
+
+    Args:
+        confluence: Confluence客户端实例
+        page_id (str): 页面ID
+        cache (PageContentCache): 内容缓存，None表示不使用缓存
+        fetch (callable): fetch(page_id) 返回页面内容字典，需包含'version'
+
+    Returns:
+        dict: 页面内容
+    """
+    if cache is None:
+        return fetch(page_id)
+
+    try:
+        version = get_page_version(confluence, page_id)
+        if version is not None:
+            cached = cache.get(page_id, version)
+            if cached is not None:
+                return cached
+    except sqlite3.Error as e:
+        print(f"读取页面缓存失败: {str(e)}")
+
+    content = fetch(page_id)
+    if content and content.get('version') not in (None, ''):
+        try:
+            cache.put(page_id, content['version'], content)
+        except sqlite3.Error as e:
+            print(f"写入页面缓存失败: {str(e)}")
+    return content
+
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """获取进程级共享的页面内容缓存，缓存文件无法创建时返回None"""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            try:
+                _page_cache = PageContentCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"无法创建页面缓存 {PAGE_CACHE_PATH}: {str(e)}")
+                return None
+        return _page_cache
@@ -0,0 +1,265 @@
+"""
+需求发布模块
+解析分析师输出的结构化JSON，直接调用ADO和Confluence工具函数创建工作项和页面，
+不经过发布者Agent的LLM工具调用循环；只有在需要时才用LLM排版页面正文
+
+工作项和页面并发创建：页面先使用临时标题，拿到工作项ID后再更新为正式标题；
+任一步失败时删除已创建的另一方，不留下半成品（保存运行进度时保留，供继续运行使用，
+不再继续的运行用 crew.discard_run 删除）
+"""
+import html
+import json
+import os
+import re
+import uuid
+
+from . import tools
+from .async_tools import run_tool_calls
+
+# 分析师输出JSON中的字段（见 tasks.generation_task）
+ANALYSIS_FIELDS = ("summary", "problem", "goal", "artifacts", "criteria", "risks")
+
+# 页面正文中各字段的标题
+SECTION_TITLES = (
+    ("problem", "Problem Statement"),
+    ("goal", "Requirement/Goal"),
+    ("artifacts", "Artifacts"),
+    ("criteria", "Acceptance Criteria"),
+    ("risks", "Dependency/Risk/Impact"),
+)
+
+_FENCED_JSON_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+FORMAT_PROMPT = """请将以下结构化需求排版为Confluence存储格式（XHTML）的页面正文，
+使用 <h2> 作为各部分标题，验收标准使用列表，只返回HTML，不要添加任何说明：
+
+{analysis_json}
+"""
+
+
+def _normalize_value(value):
+    """把列表或字典形式的字段值转换为文本"""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "\n".join(_normalize_value(item) for item in value)
+    if isinstance(value, dict):
+        return "\n".join(f"{key}: {_normalize_value(item)}" for key, item in value.items())
+    return str(value).strip()
+
+
+def parse_analysis(output):
+    """
+    解析分析师的输出
+
+    支持纯JSON、```json 代码块以及前后带说明文字的JSON
+
+    Returns:
+        dict: 包含 ANALYSIS_FIELDS 全部键的字典，值为文本
+
+    Raises:
+        ValueError: 找不到JSON或缺少summary
+    """
+    text = str(output).strip()
+    candidates = [text]
+    fenced = _FENCED_JSON_PATTERN.search(text)
+    if fenced:
+        candidates.insert(0, fenced.group(1))
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        candidates.append(text[start:end + 1])
+
+    data = None
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            break
+        data = None
+
+    if data is None:
+        raise ValueError("分析结果不是有效的JSON")
+
+    analysis = {field: _normalize_value(data.get(field)) for field in ANALYSIS_FIELDS}
+    if not analysis["summary"]:
+        raise ValueError("分析结果缺少summary")
+    return analysis
+
+
+def _text_to_html(text):
+    """多行文本转换为HTML，多行时使用列表"""
+    lines = [line.strip().lstrip("-*•").strip() for line in text.splitlines() if line.strip()]
+    if len(lines) > 1:
+        return "<ul>" + "".join(f"<li>{html.escape(line)}</li>" for line in lines) + "</ul>"
+    return f"<p>{html.escape(lines[0]) if lines else ''}</p>"
+
+
+def render_page_html(analysis, work_item_id=None):
+    """按固定模板生成Confluence页面正文"""
+    parts = []
+    if work_item_id:
+        parts.append(f"<p><strong>ADO Work Item:</strong> {html.escape(str(work_item_id))}</p>")
+    for field, title in SECTION_TITLES:
+        if analysis.get(field):
+            parts.append(f"<h2>{title}</h2>{_text_to_html(analysis[field])}")
+    return "".join(parts)
+
+
+def make_llm_formatter(llm):
+    """用LLM排版页面正文的formatter，签名为 formatter(analysis) -> html"""
+    def formatter(analysis):
+        prompt = FORMAT_PROMPT.format(analysis_json=json.dumps(analysis, ensure_ascii=False, indent=2))
+        return str(llm.call([{"role": "user", "content": prompt}])).strip()
+    return formatter
+
+
+def get_page_link(page_id):
+    """Confluence页面链接"""
+    base_url = (os.getenv("CONFLUENCE_URL") or tools.CONFLUENCE_URL or "").rstrip("/")
+    return f"{base_url}/pages/viewpage.action?pageId={page_id}"
+
+
+def get_work_item_link(work_item_id):
+    """ADO工作项链接"""
+    org_url = (os.getenv("ADO_ORG_URL") or tools.ADO_ORG_URL or "").rstrip("/")
+    project = os.getenv("ADO_PROJECT") or tools.ADO_PROJECT or ""
+    return f"{org_url}/{project}/_workitems/edit/{work_item_id}"
+
+
+def make_page_title(work_item_id, summary):
+    """页面标题：BR <工作项ID> <summary>"""
+    return f"BR {work_item_id} {summary}"
+
+
+def make_provisional_title(summary):
+    """工作项ID未知时的临时页面标题，带随机后缀避免与空间中已有页面重名"""
+    return f"BR (pending {uuid.uuid4().hex[:8]}) {summary}"
+
+
+def _create_work_item(analysis):
+    return tools.create_ado_feature.func(
+        summary=analysis["summary"],
+        description=analysis["goal"],
+        problem_statement=analysis["problem"],
+        acceptance_criteria=analysis["criteria"]
+    )
+
+
+def _create_page(analysis, title, formatter):
+    body_html = formatter(analysis) if formatter else render_page_html(analysis)
+    return tools.create_confluence_page.func(title=title, body_html=body_html)
+
+
+def delete_artifacts(work_item_id=None, page_id=None):
+    """
+    删除已创建的工作项和页面（同时删除幂等台账中的记录）
+
+    Returns:
+        dict: 删除失败的产物及错误信息，键为 "work_item" 或 "page"，全部删除成功时为空
+    """
+    errors = {}
+    if page_id is not None:
+        try:
+            tools.delete_confluence_page.func(page_id=page_id)
+        except Exception as e:
+            errors["page"] = f"删除Confluence页面 {page_id} 失败: {str(e)}"
+    if work_item_id is not None:
+        try:
+            tools.delete_ado_workitem.func(workitem_id=work_item_id)
+        except Exception as e:
+            errors["work_item"] = f"删除ADO工作项 {work_item_id} 失败: {str(e)}"
+    return errors
+
+
+def _compensate(work_item_id=None, page_id=None):
+    """删除已创建的工作项和页面，补偿失败只记录日志"""
+    for error in delete_artifacts(work_item_id, page_id).values():
+        print(f"补偿{error}")
+
+
+def publish_requirement(analysis, formatter=None, checkpoint=None):
+    """
+    直接发布需求：并发创建ADO Feature和Confluence页面，再把页面标题更新为 "BR <工作项ID> <summary>"
+
+    任一创建或标题更新失败时，删除另一方已创建的工作项或页面后抛出异常。
+    传入checkpoint时每完成一步就保存结果，已完成的步骤不再执行；失败时保留已创建的工作项和页面，
+    下次从失败的步骤继续
+
+    Args:
+        analysis (dict): parse_analysis 的结果
+        formatter (callable): 生成页面正文的函数 formatter(analysis) -> html，None时使用固定模板
+        checkpoint (RunCheckpoint): 运行检查点，None表示不保存进度
+
+    Returns:
+        dict: {'work_item_id', 'work_item_link', 'page_id', 'page_title', 'page_link'}
+    """
+    work_item_id = checkpoint.get("work_item_id") if checkpoint else None
+    page_id = checkpoint.get("page_id") if checkpoint else None
+
+    # 未完成的创建并发执行；工具在调用方上下文的副本中执行，能读取到run_crew设置的幂等键
+    calls, kinds = [], []
+    if work_item_id is None:
+        calls.append((_create_work_item, {"analysis": analysis}))
+        kinds.append("work_item")
+    if page_id is None:
+        calls.append((_create_page, {"analysis": analysis, "title": make_provisional_title(analysis["summary"]),
+                                     "formatter": formatter}))
+        kinds.append("page")
+    results = dict(zip(kinds, run_tool_calls(calls))) if calls else {}
+
+    errors = []
+    if "work_item" in results:
+        if isinstance(results["work_item"], Exception):
+            errors.append(f"创建ADO工作项失败: {str(results['work_item'])}")
+        else:
+            work_item_id = results["work_item"]
+            if checkpoint:
+                checkpoint.save(work_item_id=work_item_id)
+    if "page" in results:
+        if isinstance(results["page"], Exception):
+            errors.append(f"创建Confluence页面失败: {str(results['page'])}")
+        else:
+            page_id = results["page"]
+            if checkpoint:
+                checkpoint.save(page_id=page_id)
+
+    if errors:
+        if checkpoint is None:
+            _compensate(work_item_id, page_id)
+        raise Exception("；".join(errors))
+
+    page_title = make_page_title(work_item_id, analysis["summary"])
+    if not (checkpoint and checkpoint.get("title_updated")):
+        try:
+            tools.update_confluence_title.func(page_id=page_id, new_title=page_title)
+        except Exception as e:
+            if checkpoint is None:
+                _compensate(work_item_id, page_id)
+            raise Exception(f"更新Confluence页面标题失败: {str(e)}")
+        if checkpoint:
+            checkpoint.save(page_title=page_title, title_updated=True)
+
+    return {
+        "work_item_id": work_item_id,
+        "work_item_link": get_work_item_link(work_item_id),
+        "page_id": page_id,
+        "page_title": page_title,
+        "page_link": get_page_link(page_id),
+    }
+
+
+def render_publish_result(analysis, result):
+    """生成与发布者Agent输出类似的Markdown结果"""
+    lines = [f"# {analysis['summary']}", ""]
+    for field, title in SECTION_TITLES:
+        if analysis.get(field):
+            lines.extend([f"## {title}", "", analysis[field], ""])
+    lines.extend([
+        "## 发布结果",
+        "",
+        f"- 工作项 ID: {result['work_item_id']} ({result['work_item_link']})",
+        f"- Confluence页面: {result['page_title']} ({result['page_link']})",
+    ])
+    return "\n".join(lines)
@@ -0,0 +1,209 @@
+"""
+运行进度检查点模块
+发布按阶段执行：需求分析 -> 创建工作项 -> 创建页面 -> 更新页面标题。
+每个阶段完成后把结果（分析JSON、工作项ID、页面ID、标题）按运行ID保存到本地SQLite
+（agent模式保存分析结果，以及运行结束或失败时台账中已创建的工作项和页面），
+运行失败后 resume_run(run_id) 从失败的阶段继续，不再重新调用LLM分析；
+不再继续的运行用 discard_run(run_id) 删除已创建的工作项和页面
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+RUN_CHECKPOINT_PATH = os.getenv("RUN_CHECKPOINT_PATH", os.path.join(".cache", "runs.db"))
+RUN_CHECKPOINTS_ENABLED = os.getenv("RUN_CHECKPOINTS_ENABLED", "true").lower() == "true"
+
+# 运行状态
+STATUS_RUNNING = "running"
+STATUS_FAILED = "failed"
+STATUS_DONE = "done"
+STATUS_DISCARDED = "discarded"
+
+# 阶段（按执行顺序）
+STAGE_ANALYSIS = "analysis"
+STAGE_WORK_ITEM = "work_item"
+STAGE_PAGE = "page"
+STAGE_TITLE = "title"
+STAGES = (STAGE_ANALYSIS, STAGE_WORK_ITEM, STAGE_PAGE, STAGE_TITLE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    input_text TEXT NOT NULL,
+    model_type TEXT NOT NULL,
+    publish_mode TEXT,
+    owner TEXT,
+    idempotency_key TEXT,
+    status TEXT NOT NULL,
+    analysis TEXT,
+    work_item_id TEXT,
+    page_id TEXT,
+    page_title TEXT,
+    title_updated INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status, updated_at);
+"""
+
+# 旧版本运行进度文件缺少的列
+_MIGRATIONS = (
+    ("publish_mode", "ALTER TABLE runs ADD COLUMN publish_mode TEXT"),
+    ("owner", "ALTER TABLE runs ADD COLUMN owner TEXT"),
+)
+
+# 可以通过 update 写入的列
+_CHECKPOINT_COLUMNS = ("status", "analysis", "work_item_id", "page_id", "page_title", "title_updated",
+                       "result", "error")
+
+
+def get_pending_stage(run):
+    """运行中第一个未完成的阶段，全部完成时返回None"""
+    if not run.get("analysis"):
+        return STAGE_ANALYSIS
+    if not run.get("work_item_id"):
+        return STAGE_WORK_ITEM
+    if not run.get("page_id"):
+        return STAGE_PAGE
+    if not run.get("title_updated"):
+        return STAGE_TITLE
+    return None
+
+
+class RunStore:
+    """运行进度的本地存储"""
+
+    def __init__(self, path=RUN_CHECKPOINT_PATH, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+            for column, statement in _MIGRATIONS:
+                if column not in columns:
+                    conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create_run(self, input_text, model_type, idempotency_key=None, publish_mode=None, owner=None):
+        """创建运行记录并返回运行ID，owner为提交人（如Web会话ID）"""
+        run_id = uuid.uuid4().hex[:12]
+        now = self._clock()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO runs (run_id, input_text, model_type, publish_mode, owner, idempotency_key, status, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, input_text, model_type, publish_mode, owner, idempotency_key, STATUS_RUNNING, now, now)
+            )
+        return run_id
+
+    def claim(self, run_id):
+        """把失败的运行标记为运行中，返回是否成功；运行不是失败状态（已在继续或放弃）时返回False"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE runs SET status = ?, error = NULL, updated_at = ? WHERE run_id = ? AND status = ?",
+                (STATUS_RUNNING, self._clock(), run_id, STATUS_FAILED)
+            )
+            return cursor.rowcount == 1
+
+    def get_run(self, run_id):
+        """返回运行记录字典（analysis已解析），不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def update(self, run_id, **fields):
+        """保存检查点字段"""
+        unknown = set(fields) - set(_CHECKPOINT_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知的检查点字段: {', '.join(sorted(unknown))}")
+        if "analysis" in fields and fields["analysis"] is not None:
+            fields["analysis"] = json.dumps(fields["analysis"], ensure_ascii=False)
+        if "title_updated" in fields:
+            fields["title_updated"] = int(bool(fields["title_updated"]))
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE runs SET {assignments}, updated_at = ? WHERE run_id = ?",
+                (*fields.values(), self._clock(), run_id)
+            )
+
+    def list_runs(self, status=None, limit=20, owner=None):
+        """按更新时间倒序列出运行记录，status为None时列出全部，owner不为None时只列出该提交人的运行"""
+        query = "SELECT * FROM runs"
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if owner is not None:
+            conditions.append("owner = ?")
+            params.append(owner)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [self._to_dict(row) for row in conn.execute(query, params)]
+
+    @staticmethod
+    def _to_dict(row):
+        run = dict(row)
+        run["analysis"] = json.loads(run["analysis"]) if run["analysis"] else None
+        run["title_updated"] = bool(run["title_updated"])
+        run["pending_stage"] = get_pending_stage(run)
+        return run
+
+
+class RunCheckpoint:
+    """一次运行的检查点：读取已完成阶段的结果，保存新完成的阶段"""
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+        self._state = store.get_run(run_id) or {}
+
+    def get(self, field):
+        return self._state.get(field)
+
+    def save(self, **fields):
+        self.store.update(self.run_id, **fields)
+        self._state.update(fields)
+
+
+_run_store = None
+_run_store_lock = threading.Lock()
+
+
+def get_run_store():
+    """获取进程级共享的运行进度存储，未启用或文件无法创建时返回None"""
+    global _run_store
+    if not RUN_CHECKPOINTS_ENABLED:
+        return None
+    with _run_store_lock:
+        if _run_store is None:
+            try:
+                _run_store = RunStore(RUN_CHECKPOINT_PATH)
+            except (OSError, sqlite3.Error) as e:
+                print(f"无法创建运行进度存储 {RUN_CHECKPOINT_PATH}: {str(e)}")
+                return None
+        return _run_store
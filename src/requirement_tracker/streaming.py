@@ -0,0 +1,127 @@
+"""
+Crew 流式输出模块
+把crewai的流式输出转换为简单的事件字典，交给界面（Streamlit页面、命令行）实时显示
+
+调用方用 stream_crew_events(handler) 包住 run_crew 即可开启流式输出，run_crew 的参数和返回值不变
+"""
+import contextvars
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 事件类型
+EVENT_TASK = "task"            # 开始执行新的任务 {'task_index', 'agent_role', 'content': 任务描述}
+EVENT_TOKEN = "token"          # LLM输出的文本片段 {'content', 'task_index', 'agent_role'}
+EVENT_TOOL_CALL = "tool_call"  # Agent调用工具 {'tool_name', 'task_index', 'agent_role'}
+EVENT_STEP = "step"            # 代码中执行的步骤（如直接发布）{'content'}
+
+_event_handler = ContextVar("crew_event_handler", default=None)
+
+
+def get_event_handler():
+    """当前上下文中的事件处理函数，未开启流式输出时返回None"""
+    return _event_handler.get()
+
+
+@contextmanager
+def stream_crew_events(handler):
+    """
+    在上下文中开启流式输出，handler(event) 在调用run_crew的线程中被调用
+
+    Args:
+        handler (callable): 接收事件字典的函数
+    """
+    token = _event_handler.set(handler)
+    try:
+        yield
+    finally:
+        _event_handler.reset(token)
+
+
+def emit_step(content):
+    """发送代码步骤事件（未开启流式输出时忽略）"""
+    handler = get_event_handler()
+    if handler is not None:
+        handler({"type": EVENT_STEP, "content": content})
+
+
+def describe_event(event):
+    """非文本事件的一行说明"""
+    if event["type"] == EVENT_TASK:
+        return f"{event.get('agent_role') or 'Agent'} 开始第 {event.get('task_index', 0) + 1} 个任务"
+    if event["type"] == EVENT_TOOL_CALL:
+        return f"{event.get('agent_role') or 'Agent'} 调用工具：{event['tool_name']}"
+    return event.get('content', '')
+
+
+def forward_stream_chunks(chunks, handler):
+    """
+    把crewai的StreamChunk转换为事件
+
+    任务切换时发送task事件；工具调用的参数是分片到达的，每次调用只发送一次tool_call事件
+    """
+    current_task = None
+    seen_tool_calls = set()
+    for chunk in chunks:
+        if chunk.task_index != current_task:
+            current_task = chunk.task_index
+            handler({"type": EVENT_TASK, "task_index": chunk.task_index,
+                     "agent_role": chunk.agent_role, "content": chunk.task_name})
+
+        tool_call = getattr(chunk, "tool_call", None)
+        if tool_call is not None:
+            call_key = (chunk.task_index, tool_call.tool_id or tool_call.index)
+            if tool_call.tool_name and call_key not in seen_tool_calls:
+                seen_tool_calls.add(call_key)
+                handler({"type": EVENT_TOOL_CALL, "tool_name": tool_call.tool_name,
+                         "task_index": chunk.task_index, "agent_role": chunk.agent_role})
+        elif chunk.content:
+            handler({"type": EVENT_TOKEN, "content": chunk.content,
+                     "task_index": chunk.task_index, "agent_role": chunk.agent_role})
+
+
+def make_context_propagator(context=None):
+    """
+    crewai的before_kickoff回调：在执行kickoff的线程中恢复调用方的contextvars
+
+    流式kickoff在crewai自己创建的线程中运行（不复制调用方的上下文），
+    回调在该线程开始执行任务前把幂等键、事件处理函数等上下文变量设置为调用方的值
+    """
+    context = contextvars.copy_context() if context is None else context
+
+    def propagate(inputs):
+        for var, value in context.items():
+            var.set(value)
+        return inputs
+
+    return propagate
+
+
+def kickoff_crew(crew, inputs):
+    """
+    执行kickoff；当前上下文开启了流式输出时以流式方式执行并转发事件
+
+    Returns:
+        CrewOutput: 运行结果
+    """
+    handler = get_event_handler()
+    if handler is None:
+        return crew.kickoff(inputs=inputs)
+
+    callbacks = getattr(crew, "before_kickoff_callbacks", None)
+    propagate = make_context_propagator()
+    if isinstance(callbacks, list):
+        callbacks.insert(0, propagate)
+
+    crew.stream = True
+    try:
+        streaming = crew.kickoff(inputs=inputs)
+        forward_stream_chunks(streaming, handler)
+        return streaming.result
+    finally:
+        # crewai会把Agent的LLM切换为流式，运行结束后恢复
+        crew.stream = False
+        for agent in crew.agents:
+            if getattr(agent, "llm", None) is not None:
+                agent.llm.stream = False
+        if isinstance(callbacks, list) and propagate in callbacks:
+            callbacks.remove(propagate)
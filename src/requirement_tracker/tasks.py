@@ -42,5 +42,11 @@ task1_expected_output = generation_task.expected_output
 task2_description = create_feature.description
 task2_expected_output = create_feature.expected_output
 
+# 分析结果来自缓存、只运行发布任务时，把分析JSON作为"上一步JSON"放在发布任务描述之前
+task2_analysis_input = """
+    上一步的需求分析JSON：
+    {analysis_json}
+    """
+
 # 导出变量，以便测试可以访问
-__all__ = ['generation_task', 'create_feature', 'task1_description', 'task1_expected_output', 'task2_description', 'task2_expected_output']
\ No newline at end of file
+__all__ = ['generation_task', 'create_feature', 'task1_description', 'task1_expected_output', 'task2_description', 'task2_expected_output', 'task2_analysis_input']
\ No newline at end of file
@@ -1,7 +1,18 @@
 from crewai import Agent, Task, Crew
 from crewai.tools import BaseTool as Tool, tool
+import json
 import os
 
+from .ado_bulk import bulk_create_work_items, feature_fields
+from .ado_fetch import fetch_work_items, fetch_work_item_description, get_list_fields, work_item_to_dict
+from .ado_metadata import ado_metadata
+from .ado_query import build_id_query, fetch_partitioned_work_items
+from .ado_sync import sync_work_items
+from .confluence_pages import iter_space_pages
+from .idempotency import KIND_ADO_FEATURE, KIND_ADO_WORK_ITEM, KIND_CONFLUENCE_PAGE, create_many, create_once, forget_artifact
+from .connection_pool import ado_registry, confluence_pool
+from .work_item_store import SORTABLE_COLUMNS, get_work_item_store, record_work_items
+
 # 环境变量安全存放凭证（强烈推荐！）
 CONFLUENCE_URL = os.getenv("CONFLUENCE_URL")
 CONFLUENCE_USER = os.getenv("CONFLUENCE_USER")  # 用户邮箱
@@ -30,17 +41,47 @@ def get_ado_connection():
             "Missing Azure DevOps dependencies. Install with: pip install req_agent[azure]"
         ) from e
 
-    if not ADO_PAT or not ADO_ORG_URL:
+    # 运行时读取凭证，凭证变更后连接池会自动换用新连接
+    org_url = os.getenv("ADO_ORG_URL") or ADO_ORG_URL
+    pat = os.getenv("ADO_PAT") or ADO_PAT
+
+    if not pat or not org_url:
         raise Exception("ADO配置不完整，请检查环境变量ADO_ORG_URL和ADO_PAT")
 
     try:
-        credentials = BasicAuthentication('', ADO_PAT)
-        connection = Connection(base_url=ADO_ORG_URL, creds=credentials)
-        return connection
+        # 复用进程级共享连接，客户端只解析一次
+        return ado_registry.get_connection(
+            org_url,
+            pat,
+            lambda: Connection(base_url=org_url, creds=BasicAuthentication('', pat))
+        )
     except Exception as e:
         raise Exception(f"ADO连接失败: {str(e)}")
 
 
+def _get_synced_work_items(wit_client, project_name, work_item_type, area_path=None, include_area_path=True):
+    """增量同步到本地快照后从快照读取工作项，描述不在快照中（description为None）"""
+    store = get_work_item_store()
+    summary = sync_work_items(wit_client, store, project_name, work_item_type, area_path)
+    print(f"{'增量' if summary['mode'] == 'incremental' else '全量'}同步完成: "
+          f"{summary['changed']} 个变化, {summary['deleted']} 个删除, 水位线 {summary['watermark']}")
+    for failure in summary['failed_batches']:
+        print(f"同步批次 {failure['batch']} 失败（{len(failure['ids'])} 个工作项）: {failure['error']}")
+
+    work_items = store.get_scope_items(project_name, work_item_type, area_path)
+    if not include_area_path:
+        for work_item in work_items:
+            work_item.pop('area_path', None)
+    return work_items
+
+
+def _ado_work_item_exists(wit_client, work_item_id):
+    """工作项仍然存在且未被标记为Removed（已删除到回收站的工作项不会返回）"""
+    work_items = wit_client.get_work_items(ids=[int(work_item_id)], fields=["System.State"], error_policy="omit")
+    work_item = work_items[0] if work_items else None
+    return work_item is not None and (work_item.fields or {}).get("System.State") != "Removed"
+
+
 # Tool 1: 在ADO创建Feature
 @tool("Create ADO Feature")
 def create_ado_feature(summary: str, description: str, problem_statement: str = "", acceptance_criteria: str = "") -> str:
@@ -57,28 +98,61 @@ def create_ado_feature(summary: str, description: str, problem_statement: str =
     connection = get_ado_connection()
     wit_client = connection.clients.get_work_item_tracking_client()
 
-    # 构建补丁操作，仅使用ADO中实际存在的字段
-    patch = [
-        JsonPatchOperation(op="add", path="/fields/System.Title", value=summary),
-    ]
-    
-    if problem_statement:
-        patch.append(JsonPatchOperation(op="add", path="/fields/Custom.Problem", value=problem_statement))
-
-    if description:
-        patch.append(JsonPatchOperation(op="add", path="/fields/System.Description", value=description))
-    
-    # 只有当acceptance_criteria不为空时才添加
-    if acceptance_criteria:
-        patch.append(JsonPatchOperation(op="add", path="/fields/Custom.Acceptance", value=acceptance_criteria))
-    
-    # 添加工作项类型和区域路径
-    patch.append(JsonPatchOperation(op="add", path="/fields/System.WorkItemType", value=ADO_FEATURE_TYPE))
-    patch.append(JsonPatchOperation(op="add", path="/fields/System.AreaPath", 
-                                  value="Move and Sell\\01. Move and Sell Portfolio\\Iron Ore Product Group\\Portside IMS"))
-
-    work_item = wit_client.create_work_item(document=patch, project=ADO_PROJECT, type=ADO_FEATURE_TYPE)
-    return str(work_item.id)
+    # 构建补丁操作，仅使用ADO中实际存在的字段（与批量创建共用字段定义）
+    fields = feature_fields(summary, description, problem_statement, acceptance_criteria, ADO_FEATURE_TYPE)
+    patch = [JsonPatchOperation(op="add", path=f"/fields/{name}", value=value) for name, value in fields.items()]
+
+    def create():
+        work_item = wit_client.create_work_item(document=patch, project=ADO_PROJECT, type=ADO_FEATURE_TYPE)
+        return str(work_item.id)
+
+    # 同一幂等键已创建过Feature时直接返回已有ID，避免重试或重复调用创建重复的Feature；
+    # 没有幂等范围时按完整的写入内容（项目和全部字段）生成幂等键，不同需求即使标题相同也不会被合并
+    # 复用前确认Feature仍然存在，已被手动删除时重新创建
+    content = json.dumps({"project": ADO_PROJECT, "fields": fields}, ensure_ascii=False, sort_keys=True)
+    return create_once(KIND_ADO_FEATURE, content, create,
+                       exists=lambda work_item_id: _ado_work_item_exists(wit_client, work_item_id))
+
+
+# Tool 1.1: 批量创建ADO工作项
+@tool("Bulk Create ADO Work Items")
+def bulk_create_ado_work_items(items: list, project_name: str = None) -> list:
+    """通过ADO $batch接口批量创建工作项，按输入顺序返回 {'index', 'id', 'error'}。
+    每项为字典：summary、description、problem_statement、acceptance_criteria、work_item_type（默认Feature）、
+    fields（额外字段）、parent（同一次调用中父工作项的序号）或 parent_id（已存在的父工作项ID）。
+    重复调用时已创建的工作项直接返回已有ID，不会重复创建"""
+    try:
+        from msrest.authentication import BasicAuthentication
+        from azure.devops.connection import Connection
+    except ImportError as e:
+        raise ImportError(
+            "Missing Azure DevOps dependencies for bulk_create_ado_work_items. Install with: pip install req_agent[azure]"
+        ) from e
+
+    connection = get_ado_connection()
+    wit_client = connection.clients.get_work_item_tracking_client()
+    org_url = os.getenv("ADO_ORG_URL") or ADO_ORG_URL
+
+    project = project_name or ADO_PROJECT
+
+    # 每一项按 (项目, 序号, 内容) 记录在幂等台账中，重试时只提交还未创建成功的工作项
+    contents = [json.dumps({"project": project, "index": index, "item": item}, ensure_ascii=False,
+                           sort_keys=True, default=str) for index, item in enumerate(items)]
+    results = []
+
+    def create(existing):
+        results.extend(bulk_create_work_items(
+            wit_client, items, project, org_url, default_type=ADO_FEATURE_TYPE,
+            existing={index: int(work_item_id) for index, work_item_id in existing.items()}
+        ))
+        return [result['id'] for result in results]
+
+    create_many(KIND_ADO_WORK_ITEM, contents, create,
+                exists=lambda work_item_id: _ado_work_item_exists(wit_client, work_item_id))
+    failed = [result for result in results if result['error']]
+    if failed:
+        print(f"批量创建: {len(results) - len(failed)} 个成功，{len(failed)} 个失败")
+    return results
 
 
 # Tool 2: 获取ADO项目列表
@@ -96,16 +170,17 @@ def get_ado_projects() -> list:
     try:
         connection = get_ado_connection()
         core_client = connection.clients.get_core_client()
-        projects = core_client.get_projects()
-        return [project.name for project in projects]
+        # 项目列表很少变化，使用共享的元数据缓存
+        return list(ado_metadata.get_project_names(core_client))
     except Exception as e:
         raise Exception(f"获取ADO项目列表失败: {str(e)}")
 
 
 # Tool 2.1: 获取ADO工作项
 @tool("Get ADO Work Items")
-def get_ado_work_items(project_name: str, work_item_type: str = "Feature") -> list:
-    """获取指定项目中的工作项"""
+def get_ado_work_items(project_name: str, work_item_type: str = "Feature", lazy_description: bool = False, incremental: bool = False) -> list:
+    """获取指定项目中的工作项，lazy_description为True时不返回描述（description为None），可用Get ADO Work Item Description按需获取；
+    incremental为True时只同步自上次以来变化的工作项到本地快照并从快照返回（不含描述）"""
     try:
         from msrest.authentication import BasicAuthentication
         from azure.devops.connection import Connection
@@ -118,51 +193,45 @@ def get_ado_work_items(project_name: str, work_item_type: str = "Feature") -> li
     try:
         connection = get_ado_connection()
         wit_client = connection.clients.get_work_item_tracking_client()
+
+        if incremental:
+            return _get_synced_work_items(wit_client, project_name, work_item_type, include_area_path=False)
         
         # 查询工作项的WIQL查询
         # 对项目名称和工作项类型进行适当的转义处理
         escaped_project_name = project_name.replace("'", "''")
         escaped_work_item_type = work_item_type.replace("'", "''")
-        
-        wiql_query = Wiql(
-            query=f"""
-            SELECT [System.Id], [System.Title], [System.State], [System.WorkItemType], [System.AssignedTo]
-            FROM WorkItems
-            WHERE [System.TeamProject] = '{escaped_project_name}'
-            AND [System.WorkItemType] = '{escaped_work_item_type}'
-            ORDER BY [System.Id] DESC
-            """
-        )
+        where_clause = f"[System.TeamProject] = '{escaped_project_name}' AND [System.WorkItemType] = '{escaped_work_item_type}'"
         
         # 添加调试信息
         print(f"执行WIQL查询: 项目='{escaped_project_name}', 类型='{escaped_work_item_type}'")
-        print(f"完整查询语句: {wiql_query.query}")
+        print(f"完整查询语句: {build_id_query(where_clause)}")
         
-        # 执行查询
-        query_result = wit_client.query_by_wiql(wiql=wiql_query)
+        # 并发分批获取工作项详情（ADO API对批量请求有限制），单批失败不影响其他批次
+        def log_batch(batch_number, batch_ids, error):
+            status = f"失败: {error}" if error else "完成"
+            print(f"获取批次 {batch_number}: {len(batch_ids)} 个工作项 {status}")
+
+        # 只请求列表需要的字段，lazy_description模式下不下载描述
+        include_description = not lazy_description
+        fields = get_list_fields(include_area_path=False, include_description=include_description,
+                                 include_store_fields=True)
+        # 超过WIQL单次查询上限时按ID区间分区查询，每个分区查询完成后立即获取详情
+        work_item_ids, batch_items, failed_batches = fetch_partitioned_work_items(
+            wit_client, where_clause, fields=fields, on_batch=log_batch
+        )
         work_items = []
         
-        if query_result.work_items:
-            print(f"查询返回 {len(query_result.work_items)} 个工作项")
-            # 获取详细的工作项信息
-            work_item_ids = [item.id for item in query_result.work_items]
-            if work_item_ids:
-                # 分批获取工作项详情，避免404错误（ADO API对批量请求有限制）
-                batch_size = 200  # ADO API推荐的批量大小
-                for i in range(0, len(work_item_ids), batch_size):
-                    batch_ids = work_item_ids[i:i + batch_size]
-                    print(f"获取批次 {i//batch_size + 1}: {len(batch_ids)} 个工作项")
-                    
-                    batch_items = wit_client.get_work_items(ids=batch_ids)
-                    for item in batch_items:
-                        work_items.append({
-                            'id': item.id,
-                            'title': item.fields.get('System.Title', 'No Title'),
-                            'type': item.fields.get('System.WorkItemType', 'N/A'),
-                            'state': item.fields.get('System.State', 'N/A'),
-                            'assigned_to': item.fields.get('System.AssignedTo', {}).get('displayName', 'Unassigned') if item.fields.get('System.AssignedTo') else 'Unassigned',
-                            'description': item.fields.get('System.Description', 'N/A')
-                        })
+        if work_item_ids:
+            print(f"查询返回 {len(work_item_ids)} 个工作项")
+            # 同时写入本地存储，供Query Local ADO Work Items查询
+            record_work_items(batch_items, project_name)
+            for item in batch_items:
+                work_items.append(work_item_to_dict(item, include_area_path=False, include_description=include_description))
+
+            if failed_batches:
+                print(f"警告: {len(failed_batches)} 个批次获取失败，"
+                      f"{sum(len(failure['ids']) for failure in failed_batches)} 个工作项未获取")
         else:
             print("查询返回0个工作项")
         
@@ -177,8 +246,8 @@ def get_ado_work_items(project_name: str, work_item_type: str = "Feature") -> li
 
 # Tool 2.2: 获取ADO Area路径
 @tool("Get ADO Area Paths")
-def get_area_paths(project_name: str) -> list:
-    """获取指定项目的所有Area路径"""
+def get_area_paths(project_name: str, under: str = None, prefix: str = None) -> list:
+    """获取指定项目的所有Area路径；under只返回该Area及其下的全部Area，prefix只返回以prefix开头的Area（忽略大小写）"""
     try:
         from msrest.authentication import BasicAuthentication
         from azure.devops.connection import Connection
@@ -193,48 +262,16 @@ def get_area_paths(project_name: str) -> list:
         # 获取 Work Item Tracking 客户端
         wit_client = connection.clients.get_work_item_tracking_client()
         
-        # 获取 Area Path 分类节点
+        # 获取 Area Path 分类节点（按项目缓存，一次展开为有序索引）
         try:
-            # 获取根节点及其所有子节点
-            area_root = wit_client.get_classification_node(
-                project=project_name,
-                structure_group='areas',
-                depth=100  # 获取所有层级
-            )
-            
-            # 递归提取所有Area路径
-            def extract_areas(node, parent_path=""):
-                areas = []
-                current_path = f"{parent_path}\\{node.name}" if parent_path else node.name
-                
-                # 添加当前节点
-                areas.append({
-                    'name': node.name,
-                    'path': current_path,
-                    'id': node.id
-                })
-                
-                # 递归处理子节点
-                if hasattr(node, 'children') and node.children:
-                    for child in node.children:
-                        areas.extend(extract_areas(child, current_path))
-                
-                return areas
-            
-            # 提取所有Area路径
-            if hasattr(area_root, 'children') and area_root.children:
-                all_areas = []
-                for child in area_root.children:
-                    all_areas.extend(extract_areas(child))
-                return all_areas
-            else:
-                # 如果没有子节点，返回根节点本身
-                return [{
-                    'name': area_root.name,
-                    'path': area_root.name,
-                    'id': area_root.id
-                }] if area_root.name else []
-                
+            index = ado_metadata.get_area_index(wit_client, project_name)
+            if not under and not prefix:
+                return index.areas
+            paths = index.descendants(under) if under else index.search_prefix(prefix, limit=None)
+            if under and prefix:
+                key = prefix.casefold()
+                paths = [path for path in paths if path.casefold().startswith(key)]
+            return index.get_areas(paths)
         except Exception as e:
             print(f"获取 Area Path 失败: {str(e)}")
             return []
@@ -244,8 +281,9 @@ def get_area_paths(project_name: str) -> list:
 
 # Tool 2.3: 获取ADO工作项（支持Area过滤）
 @tool("Get ADO Work Items with Area Filter")
-def get_ado_work_items_with_area(project_name: str, work_item_type: str = "Feature", area_path: str = None) -> list:
-    """获取指定项目的工作项，支持Area路径过滤"""
+def get_ado_work_items_with_area(project_name: str, work_item_type: str = "Feature", area_path: str = None, lazy_description: bool = False, incremental: bool = False) -> list:
+    """获取指定项目的工作项，支持Area路径过滤，lazy_description为True时不返回描述（description为None）；
+    incremental为True时增量同步到本地快照并从快照返回（不含描述）"""
     try:
         from msrest.authentication import BasicAuthentication
         from azure.devops.connection import Connection
@@ -258,6 +296,9 @@ def get_ado_work_items_with_area(project_name: str, work_item_type: str = "Featu
     try:
         connection = get_ado_connection()
         wit_client = connection.clients.get_work_item_tracking_client()
+
+        if incremental:
+            return _get_synced_work_items(wit_client, project_name, work_item_type, area_path)
         
         # 构建查询条件
         escaped_project_name = project_name.replace("'", "''")
@@ -269,40 +310,22 @@ def get_ado_work_items_with_area(project_name: str, work_item_type: str = "Featu
             escaped_area_path = area_path.replace("'", "''")
             where_clause += f" AND [System.AreaPath] = '{escaped_area_path}'"
         
-        # 查询工作项的WIQL查询
-        wiql_query = Wiql(
-            query=f"""
-            SELECT [System.Id], [System.Title], [System.State], [System.WorkItemType], [System.AssignedTo], [System.AreaPath], [System.Description]
-            FROM WorkItems
-            WHERE {where_clause}
-            ORDER BY [System.Id] DESC
-            """
-        )
-        
-        # 执行查询
-        query_result = wit_client.query_by_wiql(wiql=wiql_query)
+        # 并发分批获取工作项详情（ADO API对批量请求有限制），单批失败不影响其他批次
+        # 只请求列表需要的字段，lazy_description模式下不下载描述
+        include_description = not lazy_description
+        fields = get_list_fields(include_description=include_description, include_store_fields=True)
+        # 超过WIQL单次查询上限时按ID区间分区查询
+        work_item_ids, batch_items, failed_batches = fetch_partitioned_work_items(wit_client, where_clause, fields=fields)
         work_items = []
         
-        if query_result.work_items:
-            # 获取详细的工作项信息
-            work_item_ids = [item.id for item in query_result.work_items]
-            if work_item_ids:
-                # 分批获取工作项详情，避免404错误（ADO API对批量请求有限制）
-                batch_size = 200  # ADO API推荐的批量大小
-                for i in range(0, len(work_item_ids), batch_size):
-                    batch_ids = work_item_ids[i:i + batch_size]
-                    
-                    batch_items = wit_client.get_work_items(ids=batch_ids)
-                    for item in batch_items:
-                        work_items.append({
-                            'id': item.id,
-                            'title': item.fields.get('System.Title', 'No Title'),
-                            'type': item.fields.get('System.WorkItemType', 'N/A'),
-                            'state': item.fields.get('System.State', 'N/A'),
-                            'area_path': item.fields.get('System.AreaPath', 'N/A'),
-                            'assigned_to': item.fields.get('System.AssignedTo', {}).get('displayName', 'Unassigned') if item.fields.get('System.AssignedTo') else 'Unassigned',
-                            'description': item.fields.get('System.Description', 'N/A')
-                        })
+        if work_item_ids:
+            # 同时写入本地存储，供Query Local ADO Work Items查询
+            record_work_items(batch_items, project_name)
+            for item in batch_items:
+                work_items.append(work_item_to_dict(item, include_description=include_description))
+
+            for failure in failed_batches:
+                print(f"获取批次 {failure['batch']} 失败（{len(failure['ids'])} 个工作项）: {failure['error']}")
         
         return work_items
     except Exception as e:
@@ -312,30 +335,92 @@ def get_ado_work_items_with_area(project_name: str, work_item_type: str = "Featu
         raise Exception(f"获取ADO工作项失败: {str(e)}")
 
 
+# Tool 2.4: 按需获取ADO工作项描述
+@tool("Get ADO Work Item Description")
+def get_ado_work_item_description(work_item_id: int) -> str:
+    """获取单个工作项的描述（HTML），配合lazy_description模式按需加载"""
+    try:
+        from msrest.authentication import BasicAuthentication
+        from azure.devops.connection import Connection
+    except ImportError as e:
+        raise ImportError(
+            "Missing Azure DevOps dependencies for get_ado_work_item_description. Install with: pip install req_agent[azure]"
+        ) from e
+
+    try:
+        connection = get_ado_connection()
+        wit_client = connection.clients.get_work_item_tracking_client()
+        return fetch_work_item_description(wit_client, work_item_id)
+    except Exception as e:
+        raise Exception(f"获取工作项 {work_item_id} 描述失败: {str(e)}")
+
+
+# Tool 2.5: 查询本地工作项存储
+@tool("Query Local ADO Work Items")
+def query_local_work_items(project_name: str = None, work_item_type: str = None, state: str = None,
+                           area_path: str = None, assigned_to: str = None, title_contains: str = None,
+                           order_by: str = "id", descending: bool = True, limit: int = 50,
+                           group_by: str = None) -> dict:
+    """在本地工作项存储中过滤、排序和统计工作项（不访问ADO，数据来自之前的ADO读取和同步）。
+    area_path匹配该Area及其子Area；order_by可选 id/title/type/state/area_path/assigned_to/changed_date；
+    指定group_by（project/type/state/area_path/assigned_to）时返回各分组的数量"""
+    try:
+        store = get_work_item_store()
+        filters = {
+            'project': project_name,
+            'work_item_type': work_item_type,
+            'state': state,
+            'area_path': area_path,
+            'assigned_to': assigned_to,
+            'title_contains': title_contains
+        }
+        if group_by:
+            return {'group_by': group_by, 'counts': store.count(group_by, **filters)}
+
+        if order_by not in SORTABLE_COLUMNS:
+            order_by = "id"
+        return store.query(order_by=order_by, descending=descending, limit=limit, **filters)
+    except Exception as e:
+        print(f"查询本地工作项失败: {str(e)}")
+        raise Exception(f"查询本地工作项失败: {str(e)}")
+
+
 # Tool 3: 创建Confluence页面
 @tool("Create Confluence Page")
 def create_confluence_page(title: str, body_html: str) -> str:
     """创建Confluence页面，返回页面ID"""
     try:
         from atlassian import Confluence
+        from atlassian.errors import ApiError
     except ImportError as e:
         raise ImportError(
             "Missing Confluence dependencies for create_confluence_page. Install with: pip install req_agent[confluence]"
         ) from e
 
-    # 使用用户名和API token进行认证
-    confluence = Confluence(
-        url=CONFLUENCE_URL, 
-        username=CONFLUENCE_USER,  # 用户邮箱
-        password=CONFLUENCE_TOKEN  # API Token
-    )
-    page = confluence.create_page(
-        space=CONFLUENCE_SPACE,
-        title=title,
-        body=body_html,
-        parent_id=CONFLUENCE_PARENT_ID  # 可选
-    )
-    return str(page['id'])
+    def exists(page_id):
+        confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
+        try:
+            confluence.get_page_by_id(page_id=page_id, expand="version")
+        except ApiError:
+            # 页面不存在（已删除或移入回收站）
+            return False
+        return True
+
+    def create():
+        # 复用连接池中的共享会话（用户名和API token认证）
+        confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
+        page = confluence.create_page(
+            space=CONFLUENCE_SPACE,
+            title=title,
+            body=body_html,
+            parent_id=CONFLUENCE_PARENT_ID  # 可选
+        )
+        return str(page['id'])
+
+    # 同一幂等键已创建过页面且页面仍然存在时直接返回已有页面ID；没有幂等范围时按空间、标题和正文生成幂等键
+    content = json.dumps({"space": CONFLUENCE_SPACE, "title": title, "body": body_html}, ensure_ascii=False,
+                         sort_keys=True)
+    return create_once(KIND_CONFLUENCE_PAGE, content, create, exists)
 
 
 # Tool 4: 更新Confluence页面标题
@@ -349,12 +434,8 @@ def update_confluence_title(page_id: str, new_title: str) -> str:
             "Missing Confluence dependencies for update_confluence_title. Install with: pip install req_agent[confluence]"
         ) from e
 
-    # 使用用户名和API token进行认证
-    confluence = Confluence(
-        url=CONFLUENCE_URL, 
-        username=CONFLUENCE_USER,  # 用户邮箱
-        password=CONFLUENCE_TOKEN  # API Token
-    )
+    # 复用连接池中的共享会话（用户名和API token认证）
+    confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
     confluence.update_page(page_id=page_id, title=new_title)
     return "标题更新成功"
 
@@ -371,12 +452,8 @@ def get_confluence_spaces(max_results: int = 100) -> list:
         ) from e
 
     try:
-        # 使用用户名和API token进行认证
-        confluence = Confluence(
-            url=CONFLUENCE_URL,
-            username=CONFLUENCE_USER,  # 用户邮箱
-            password=CONFLUENCE_TOKEN  # API Token
-        )
+        # 复用连接池中的共享会话（用户名和API token认证）
+        confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
         
         # 获取空间列表
         response = confluence.get_all_spaces(start=0, limit=max_results, expand='description.plain,homepage')
@@ -425,23 +502,11 @@ def get_confluence_pages(space_key: str, max_results: int = 100) -> list:
         ) from e
 
     try:
-        # 使用用户名和API token进行认证
-        confluence = Confluence(
-            url=CONFLUENCE_URL,
-            username=CONFLUENCE_USER,  # 用户邮箱
-            password=CONFLUENCE_TOKEN  # API Token
-        )
+        # 复用连接池中的共享会话（用户名和API token认证）
+        confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
         
-        # 获取页面列表
-        response = confluence.get_all_pages_from_space(space=space_key, start=0, limit=max_results, expand='space,history,ancestors')
-
-        # 检查响应格式并相应处理
-        if isinstance(response, dict) and 'results' in response:
-            pages_data = response['results']
-        elif isinstance(response, list):
-            pages_data = response
-        else:
-            pages_data = []
+        # 分块流式获取页面列表，达到max_results后停止请求
+        pages_data = iter_space_pages(confluence, space_key, max_results=max_results, expand='space,history,ancestors')
 
         page_list = []
 
@@ -488,12 +553,8 @@ def get_confluence_page_content(page_id: str) -> dict:
         ) from e
 
     try:
-        # 使用用户名和API token进行认证
-        confluence = Confluence(
-            url=CONFLUENCE_URL,
-            username=CONFLUENCE_USER,  # 用户邮箱
-            password=CONFLUENCE_TOKEN  # API Token
-        )
+        # 复用连接池中的共享会话（用户名和API token认证）
+        confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
         
         # 获取页面详情
         page = confluence.get_page_by_id(page_id=page_id, expand='space,history')
@@ -540,15 +601,12 @@ def delete_confluence_page(page_id: str) -> str:
         ) from e
 
     try:
-        # 使用用户名和API token进行认证
-        confluence = Confluence(
-            url=CONFLUENCE_URL,
-            username=CONFLUENCE_USER,  # 用户邮箱
-            password=CONFLUENCE_TOKEN  # API Token
-        )
+        # 复用连接池中的共享会话（用户名和API token认证）
+        confluence = confluence_pool.get_client(Confluence, CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN)
         
         # 删除页面
         confluence.remove_page(page_id=page_id)
+        forget_artifact(KIND_CONFLUENCE_PAGE, page_id)
         return f"页面 {page_id} 删除成功"
     except Exception as e:
         raise Exception(f"删除页面 {page_id} 失败: {str(e)}")
@@ -577,6 +635,8 @@ def delete_ado_workitem(workitem_id: str) -> str:
             id=int(workitem_id),
             project=ADO_PROJECT
         )
+        forget_artifact(KIND_ADO_FEATURE, workitem_id)
+        forget_artifact(KIND_ADO_WORK_ITEM, workitem_id)
         
         return f"工作项 {workitem_id} 删除成功"
     except AzureDevOpsServiceError as e:
@@ -593,6 +653,8 @@ def delete_ado_workitem(workitem_id: str) -> str:
                 document=patch,
                 id=int(workitem_id)
             )
+            forget_artifact(KIND_ADO_FEATURE, workitem_id)
+            forget_artifact(KIND_ADO_WORK_ITEM, workitem_id)
             
             return f"工作项 {workitem_id} 状态更新为已移除"
         except Exception as update_error:
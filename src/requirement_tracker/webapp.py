@@ -3,6 +3,8 @@ from dotenv import load_dotenv, dotenv_values
 import os
 import sys
 import json
+import time
+import uuid
 from pathlib import Path
 
 # 加载环境变量
@@ -11,11 +13,67 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '..', '.en
 # 添加项目根目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from src.requirement_tracker.crew import run_crew
+from src.requirement_tracker.crew import discard_run, resume_run, run_crew
+from src.requirement_tracker.job_queue import (
+    ACTIVE_STATUSES, JOB_DONE, JOB_FAILED, JOB_POLL_INTERVAL, JOB_QUEUED, JOB_RUNNING, get_job_queue, submit_job
+)
+from src.requirement_tracker.idempotency import submitter_scope
+from src.requirement_tracker.run_store import STATUS_FAILED, get_run_store
+from src.requirement_tracker.streaming import (
+    EVENT_TASK, EVENT_TOKEN, EVENT_TOOL_CALL, describe_event, stream_crew_events
+)
+
+# 处理需求时是否实时显示LLM输出和Agent步骤
+WEB_STREAMING = os.getenv("WEB_STREAMING", "true").lower() == "true"
+# 流式输出重新渲染的最小间隔（秒），期间收到的文本片段合并到下一次渲染
+WEB_STREAM_RENDER_INTERVAL = float(os.getenv("WEB_STREAM_RENDER_INTERVAL", "0.3"))
+# 是否默认提交到后台任务队列（由工作进程处理），否则在页面脚本中同步运行
+WEB_JOB_QUEUE = os.getenv("WEB_JOB_QUEUE", "true").lower() == "true"
 
 # 导入重构后的配置函数
 from src.requirement_tracker.config_utils import load_env_vars, load_custom_llms
 
+def format_stream_event(event):
+    """把非文本事件转换为步骤说明"""
+    icons = {EVENT_TASK: "🧑‍💼", EVENT_TOOL_CALL: "🔧"}
+    return f"{icons.get(event['type'], '⚙️')} {describe_event(event)}"
+
+
+def create_stream_handler(container, interval=WEB_STREAM_RENDER_INTERVAL, clock=time.monotonic):
+    """
+    创建把Crew流式事件实时显示到页面上的处理函数
+
+    文本片段先累积在列表中，距上次渲染超过interval秒时才重新渲染全文，避免每个片段都重新发送整段文本；
+    运行结束后调用 handler.flush() 渲染最后未显示的片段
+    """
+    steps_placeholder = container.empty()
+    output_placeholder = container.empty()
+    state = {"steps": [], "chunks": [], "dirty": False, "rendered_at": None}
+
+    def flush():
+        if state["dirty"]:
+            output_placeholder.markdown("".join(state["chunks"]))
+            state["dirty"] = False
+        state["rendered_at"] = clock()
+
+    def handler(event):
+        if event["type"] == EVENT_TOKEN:
+            state["chunks"].append(event["content"])
+            state["dirty"] = True
+            if state["rendered_at"] is None or clock() - state["rendered_at"] >= interval:
+                flush()
+            return
+        # 切换任务或调用工具前先显示已收到的文本
+        flush()
+        if event["type"] == EVENT_TASK and state["chunks"]:
+            state["chunks"].append("\n\n---\n\n")
+        state["steps"].append(format_stream_event(event))
+        steps_placeholder.markdown("\n".join(f"- {step}" for step in state["steps"]))
+
+    handler.flush = flush
+    return handler
+
+
 def main():
     st.set_page_config(
         page_title="Requirement Tracker",
@@ -232,6 +290,11 @@ def show_main_page():
         placeholder="请在此处粘贴您的需求描述..."
     )
     
+    background = st.checkbox("后台运行", value=WEB_JOB_QUEUE,
+                             help="提交到后台任务队列，由工作进程处理；页面刷新或关闭后结果仍会保留")
+    streaming = st.checkbox("实时显示处理过程", value=WEB_STREAMING,
+                            help="在处理过程中显示LLM输出和Agent调用的工具")
+
     col1, col2 = st.columns(2)
     
     with col1:
@@ -240,11 +303,24 @@ def show_main_page():
                 st.error("请输入需求描述")
             elif missing_vars:
                 st.error("请先配置所有必需的环境变量")
+            elif background:
+                job_id = submit_job(user_input.strip(), model_option, submitter=get_session_id())
+                remember_job(job_id)
+                st.success(f"✅ 已提交任务 {job_id}，处理结果会显示在下方")
             else:
                 with st.spinner(f"正在使用 {model_name} 处理您的需求，请稍候..."):
                     try:
-                        # 启动 Crew，传入输入文字和模型类型
-                        result = run_crew(user_input.strip(), model_option)
+                        # 启动 Crew，传入输入文字和模型类型；幂等键按当前会话区分
+                        with submitter_scope(get_session_id()):
+                            if streaming:
+                                handler = create_stream_handler(st.container())
+                                try:
+                                    with stream_crew_events(handler):
+                                        result = run_crew(user_input.strip(), model_option)
+                                finally:
+                                    handler.flush()
+                            else:
+                                result = run_crew(user_input.strip(), model_option)
                         
                         st.success("✅ 需求处理完成!")
                         
@@ -260,6 +336,9 @@ def show_main_page():
         if st.button("🧹 清空输入", use_container_width=True):
             st.rerun()
 
+    show_jobs()
+    show_failed_runs(streaming)
+
     # 使用说明
     st.header("ℹ️ 使用说明")
     st.markdown("""
@@ -272,5 +351,106 @@ def show_main_page():
     > 💡 提示: 您可以在左侧边栏的「LLM 配置」页面中永久配置默认模型和API密钥
     """)
 
+
+# 任务状态的显示名称
+JOB_STATUS_LABELS = {JOB_QUEUED: "⏳ 排队中", JOB_RUNNING: "🔄 处理中", JOB_DONE: "✅ 已完成", JOB_FAILED: "❌ 失败"}
+
+
+def get_session_id():
+    """当前会话的ID，作为提交人区分不同用户的幂等键；页面刷新后从URL参数恢复"""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+    st.query_params["session"] = st.session_state.session_id
+    return st.session_state.session_id
+
+
+def get_session_job_ids():
+    """当前会话提交的任务ID；页面刷新后从URL参数恢复"""
+    if "job_ids" not in st.session_state:
+        jobs_param = st.query_params.get("jobs", "")
+        st.session_state.job_ids = [job_id for job_id in jobs_param.split(",") if job_id]
+    return st.session_state.job_ids
+
+
+def remember_job(job_id):
+    """记录提交的任务，并写入URL参数以便刷新页面后继续查看"""
+    job_ids = [job_id] + [existing for existing in get_session_job_ids() if existing != job_id]
+    st.session_state.job_ids = job_ids[:20]
+    st.query_params["jobs"] = ",".join(st.session_state.job_ids)
+
+
+def render_jobs(job_ids, polling=False):
+    """显示任务状态和结果；轮询中的任务全部结束后刷新整个页面以停止轮询"""
+    jobs = get_job_queue().get_jobs(job_ids)
+    st.header("📬 后台任务")
+    for job in jobs:
+        label = JOB_STATUS_LABELS.get(job["status"], job["status"])
+        summary = job["input_text"][:40].replace("\n", " ")
+        with st.expander(f"{label} · {job['job_id']} · {summary}", expanded=job["status"] != JOB_DONE):
+            if job["status"] in ACTIVE_STATUSES:
+                st.caption(job["progress"] or "等待工作进程处理...")
+            elif job["status"] == JOB_DONE:
+                st.text_area("输出结果:", value=job["result"] or "", height=300, key=f"job_result_{job['job_id']}")
+            else:
+                st.error(job["error"] or "任务失败")
+
+    if polling and not any(job["status"] in ACTIVE_STATUSES for job in jobs):
+        st.rerun()
+
+
+def show_jobs():
+    """显示当前会话的后台任务，有未完成的任务时定时刷新"""
+    job_ids = get_session_job_ids()
+    if not job_ids:
+        return
+    active = any(job["status"] in ACTIVE_STATUSES for job in get_job_queue().get_jobs(job_ids))
+    if active:
+        st.fragment(render_jobs, run_every=JOB_POLL_INTERVAL)(job_ids, polling=True)
+    else:
+        render_jobs(job_ids)
+
+
+# 阶段的显示名称
+STAGE_LABELS = {"analysis": "需求分析", "work_item": "创建ADO工作项", "page": "创建Confluence页面",
+                "title": "更新页面标题"}
+
+
+def show_failed_runs(streaming=False):
+    """列出当前会话失败的运行，可从失败的阶段继续，或放弃运行并删除已创建的产物"""
+    store = get_run_store()
+    session_id = get_session_id()
+    runs = store.list_runs(status=STATUS_FAILED, limit=10, owner=session_id) if store else []
+    if not runs:
+        return
+
+    st.header("🔁 未完成的运行")
+    for run in runs:
+        summary = (run["analysis"] or {}).get("summary") or run["input_text"][:40]
+        stage = STAGE_LABELS.get(run["pending_stage"], run["pending_stage"])
+        with st.expander(f"{run['run_id']} · {summary}（停在：{stage}）"):
+            st.caption(f"错误: {run['error']}")
+            if st.button("继续运行", key=f"resume_{run['run_id']}"):
+                with st.spinner("正在从失败的阶段继续..."):
+                    if streaming:
+                        handler = create_stream_handler(st.container())
+                        try:
+                            with stream_crew_events(handler):
+                                result = resume_run(run["run_id"], owner=session_id)
+                        finally:
+                            handler.flush()
+                    else:
+                        result = resume_run(run["run_id"], owner=session_id)
+                if str(result).startswith("Error:"):
+                    st.error(result)
+                else:
+                    st.success("✅ 运行已完成!")
+                    st.text_area("输出结果:", value=str(result), height=300, key=f"resume_result_{run['run_id']}")
+            if st.button("放弃并删除已创建的工作项和页面", key=f"discard_{run['run_id']}"):
+                result = discard_run(run["run_id"], owner=session_id)
+                if str(result).startswith("Error:"):
+                    st.error(result)
+                else:
+                    st.success(result)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
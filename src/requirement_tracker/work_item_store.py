@@ -0,0 +1,290 @@
+"""
+ADO 工作项本地存储模块
+基于SQLite保存工作项快照和增量同步水位线，刷新时只需同步变化的工作项
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+WORK_ITEM_STORE_PATH = os.getenv("WORK_ITEM_STORE_PATH", os.path.join(".cache", "work_items.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    type TEXT,
+    title TEXT,
+    state TEXT,
+    area_path TEXT,
+    assigned_to TEXT,
+    changed_date TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_items_project ON work_items (project);
+CREATE INDEX IF NOT EXISTS idx_work_items_type ON work_items (type);
+CREATE INDEX IF NOT EXISTS idx_work_items_state ON work_items (state);
+CREATE INDEX IF NOT EXISTS idx_work_items_area_path ON work_items (area_path);
+CREATE INDEX IF NOT EXISTS idx_work_items_assigned_to ON work_items (assigned_to);
+CREATE INDEX IF NOT EXISTS idx_work_items_changed_date ON work_items (changed_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    type TEXT NOT NULL,
+    area_path TEXT,
+    watermark TEXT,
+    last_sync REAL NOT NULL
+);
+"""
+
+_COLUMNS = ('id', 'project', 'type', 'title', 'state', 'area_path', 'assigned_to', 'changed_date')
+# 允许排序和分组的列
+SORTABLE_COLUMNS = ('id', 'title', 'type', 'state', 'area_path', 'assigned_to', 'changed_date')
+GROUPABLE_COLUMNS = ('project', 'type', 'state', 'area_path', 'assigned_to')
+
+
+def make_scope(project, work_item_type, area_path=None):
+    """同步范围的键：(项目, 类型, Area)"""
+    return f"{project}|{work_item_type}|{area_path or ''}"
+
+
+def work_item_to_row(item, project_name=None):
+    """将ADO工作项转换为存储行，需要请求 get_list_fields(include_store_fields=True) 中的字段"""
+    fields = item.fields
+    assigned_to = fields.get('System.AssignedTo')
+    changed_date = fields.get('System.ChangedDate')
+    return {
+        'id': int(item.id),
+        'project': fields.get('System.TeamProject', project_name),
+        'type': fields.get('System.WorkItemType', 'N/A'),
+        'title': fields.get('System.Title', 'No Title'),
+        'state': fields.get('System.State', 'N/A'),
+        'area_path': fields.get('System.AreaPath', 'N/A'),
+        'assigned_to': assigned_to.get('displayName', 'Unassigned') if assigned_to else 'Unassigned',
+        'changed_date': str(changed_date) if changed_date else None
+    }
+
+
+def _escape_like(value):
+    """转义LIKE模式中的通配符"""
+    return value.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def _build_filters(project=None, work_item_type=None, state=None, area_path=None,
+                   assigned_to=None, title_contains=None, changed_since=None):
+    """构建查询条件，area_path匹配该Area及其子Area"""
+    clauses, params = [], []
+    for column, value in (('project', project), ('type', work_item_type),
+                          ('state', state), ('assigned_to', assigned_to)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if area_path:
+        clauses.append("(area_path = ? OR area_path LIKE ? ESCAPE '!')")
+        params.extend([area_path, _escape_like(area_path) + '\\%'])
+    if title_contains:
+        clauses.append("title LIKE ? ESCAPE '!'")
+        params.append(f"%{_escape_like(title_contains)}%")
+    if changed_since:
+        clauses.append("changed_date >= ?")
+        params.append(changed_since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def _row_to_dict(row):
+    """转换为与work_item_to_dict一致的列表视图字典，描述不在本地保存"""
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'type': row['type'],
+        'state': row['state'],
+        'area_path': row['area_path'],
+        'assigned_to': row['assigned_to'],
+        'description': None
+    }
+
+
+class WorkItemStore:
+    """工作项快照存储，可在多个会话和进程间共享"""
+
+    def __init__(self, path=WORK_ITEM_STORE_PATH, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行，结束后提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def upsert(self, rows):
+        """
+        写入或更新工作项
+
+        Args:
+            rows (list): 字典列表，键为 id、project、type、title、state、area_path、assigned_to、changed_date
+        """
+        if not rows:
+            return
+        now = self._clock()
+        values = [tuple(row.get(column) for column in _COLUMNS) + (now,) for row in rows]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO work_items ({', '.join(_COLUMNS)}, synced_at) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)}, ?)",
+                values
+            )
+
+    def delete(self, work_item_ids):
+        """删除工作项，返回实际删除的数量"""
+        ids = [(int(work_item_id),) for work_item_id in work_item_ids]
+        if not ids:
+            return 0
+        with self._lock, self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany("DELETE FROM work_items WHERE id = ?", ids)
+            return conn.total_changes - before
+
+    def _scope_clause(self, project, work_item_type, area_path):
+        clause = "project = ? AND type = ?"
+        params = [project, work_item_type]
+        if area_path:
+            clause += " AND area_path = ?"
+            params.append(area_path)
+        return clause, params
+
+    def get_scope_ids(self, project, work_item_type, area_path=None):
+        """返回同步范围内的全部工作项ID"""
+        clause, params = self._scope_clause(project, work_item_type, area_path)
+        with self._lock, self._connect() as conn:
+            return {row['id'] for row in conn.execute(f"SELECT id FROM work_items WHERE {clause}", params)}
+
+    def get_scope_items(self, project, work_item_type, area_path=None):
+        """返回同步范围内的工作项（按ID倒序，与WIQL查询一致）"""
+        clause, params = self._scope_clause(project, work_item_type, area_path)
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM work_items WHERE {clause} ORDER BY id DESC", params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def query(self, project=None, work_item_type=None, state=None, area_path=None, assigned_to=None,
+              title_contains=None, changed_since=None, order_by='id', descending=True, limit=100, offset=0):
+        """
+        在本地存储中查询工作项，不访问ADO
+
+        Args:
+            project, work_item_type, state, assigned_to: 精确匹配条件，None表示不过滤
+            area_path (str): 完整Area路径，匹配该Area及其子Area
+            title_contains (str): 标题包含的文本
+            changed_since (str): 只返回ChangedDate不早于该时间（ISO格式）的工作项
+            order_by (str): 排序列，见SORTABLE_COLUMNS
+            descending (bool): 是否倒序
+            limit (int): 最多返回数量，None表示不限制
+            offset (int): 跳过的数量
+
+        Returns:
+            dict: {'total': 符合条件的总数, 'items': 当前页的工作项列表}
+        """
+        if order_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"不支持的排序列: {order_by}，可选: {', '.join(SORTABLE_COLUMNS)}")
+
+        where, params = _build_filters(project, work_item_type, state, area_path,
+                                       assigned_to, title_contains, changed_since)
+        direction = "DESC" if descending else "ASC"
+        # 以ID作为次要排序，保证分页结果稳定
+        order = f"ORDER BY {order_by} {direction}" + (f", id {direction}" if order_by != 'id' else "")
+        page = " LIMIT ? OFFSET ?" if limit is not None else ""
+        page_params = [int(limit), int(offset)] if limit is not None else []
+
+        with self._lock, self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM work_items {where}", params).fetchone()[0]
+            rows = conn.execute(f"SELECT * FROM work_items {where} {order}{page}", params + page_params).fetchall()
+
+        items = []
+        for row in rows:
+            item = _row_to_dict(row)
+            item['project'] = row['project']
+            item['changed_date'] = row['changed_date']
+            items.append(item)
+        return {'total': total, 'items': items}
+
+    def count(self, group_by, project=None, work_item_type=None, state=None, area_path=None,
+              assigned_to=None, title_contains=None, changed_since=None):
+        """
+        按列分组统计工作项数量
+
+        Returns:
+            dict: {分组值: 数量}，按数量从多到少排列
+        """
+        if group_by not in GROUPABLE_COLUMNS:
+            raise ValueError(f"不支持的分组列: {group_by}，可选: {', '.join(GROUPABLE_COLUMNS)}")
+
+        where, params = _build_filters(project, work_item_type, state, area_path,
+                                       assigned_to, title_contains, changed_since)
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {group_by} AS value, COUNT(*) AS total FROM work_items {where} "
+                f"GROUP BY {group_by} ORDER BY total DESC, value ASC",
+                params
+            ).fetchall()
+        return {row['value']: row['total'] for row in rows}
+
+    def get_watermark(self, scope):
+        """返回同步范围的ChangedDate水位线，从未同步过时返回None"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT watermark FROM sync_state WHERE scope = ?", (scope,)).fetchone()
+        return row['watermark'] if row else None
+
+    def set_watermark(self, project, work_item_type, area_path, watermark):
+        """记录同步范围的水位线"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (scope, project, type, area_path, watermark, last_sync) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (make_scope(project, work_item_type, area_path), project, work_item_type,
+                 area_path, watermark, self._clock())
+            )
+
+    def clear(self):
+        """清空全部工作项和水位线"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM work_items")
+            conn.execute("DELETE FROM sync_state")
+
+
+_work_item_store = None
+_work_item_store_lock = threading.Lock()
+
+
+def get_work_item_store():
+    """获取进程级共享的工作项存储"""
+    global _work_item_store
+    with _work_item_store_lock:
+        if _work_item_store is None:
+            _work_item_store = WorkItemStore(WORK_ITEM_STORE_PATH)
+        return _work_item_store
+
+
+def record_work_items(items, project_name=None):
+    """
+    将ADO读取路径获取到的工作项写入本地存储，供本地查询使用
+
+    写入失败只打印警告，不影响调用方
+    """
+    try:
+        get_work_item_store().upsert([work_item_to_row(item, project_name) for item in items])
+    except Exception as e:
+        print(f"写入本地工作项存储失败: {str(e)}")
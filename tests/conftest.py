@@ -0,0 +1,64 @@
+import pytest
+
+from src.requirement_tracker import work_item_store
+
+
+@pytest.fixture(autouse=True)
+def isolated_work_item_store(tmp_path, monkeypatch):
+    """ADO读取路径会写入本地工作项存储，测试中改用临时文件"""
+    monkeypatch.setattr(work_item_store, "WORK_ITEM_STORE_PATH", str(tmp_path / "work_items.db"))
+    monkeypatch.setattr(work_item_store, "_work_item_store", None)
+
+
+@pytest.fixture(autouse=True)
+def reset_ado_metadata_cache():
+    """ADO元数据缓存是进程级共享的，每个测试前清空"""
+    from src.requirement_tracker.ado_metadata import ado_metadata
+    ado_metadata.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def reset_llm_cache():
+    """LLM缓存是进程级共享的，每个测试前清空"""
+    from src.requirement_tracker.crew import llm_cache
+    llm_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def isolated_analysis_cache(tmp_path, monkeypatch):
+    """分析结果缓存改用临时文件，避免测试之间互相命中"""
+    from src.requirement_tracker import analysis_cache
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_PATH", str(tmp_path / "analysis.db"))
+    monkeypatch.setattr(analysis_cache, "_analysis_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_idempotency_ledger(tmp_path, monkeypatch):
+    """幂等台账改用临时文件，避免测试之间复用已创建的产物"""
+    from src.requirement_tracker import idempotency
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEDGER_PATH", str(tmp_path / "ledger.db"))
+    monkeypatch.setattr(idempotency, "_ledger", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_run_store(tmp_path, monkeypatch):
+    """运行进度存储改用临时文件"""
+    from src.requirement_tracker import run_store
+    monkeypatch.setattr(run_store, "RUN_CHECKPOINT_PATH", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(run_store, "_run_store", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_job_queue(tmp_path, monkeypatch):
+    """任务队列改用临时文件，测试中不启动工作进程"""
+    from src.requirement_tracker import job_queue
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(job_queue, "JOB_WORKERS", 0)
+    monkeypatch.setattr(job_queue, "_job_queue", None)
+    monkeypatch.setattr(job_queue, "_worker_pool", None)
+
+
+@pytest.fixture(autouse=True)
+def synchronous_web_runs(monkeypatch):
+    """页面测试默认在脚本中同步运行，后台任务在test_job_queue.py中单独测试"""
+    monkeypatch.setattr("src.requirement_tracker.webapp.WEB_JOB_QUEUE", False)
@@ -0,0 +1,82 @@
+import pytest
+
+from src.requirement_tracker.ado_browser import description_to_markdown, paginate_work_items
+
+
+def make_items(count):
+    """创建工作项字典列表"""
+    return [
+        {
+            'id': i,
+            'title': f'Item {i:03d}',
+            'type': 'Feature',
+            'state': 'Active' if i % 2 else 'New',
+            'area_path': 'Proj',
+            'assigned_to': 'Alice' if i % 3 == 0 else 'Bob',
+            'description': None
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+class TestPaginateWorkItems:
+    """测试工作项表格的过滤、排序和分页"""
+
+    def test_only_current_page_materialised(self):
+        """测试只返回当前页的行"""
+        result = paginate_work_items(make_items(1000), page=3, page_size=50)
+
+        assert len(result['rows']) == 50
+        assert result['total'] == 1000
+        assert result['page_count'] == 20
+        assert result['rows'][0]['id'] == 900
+
+    def test_filter_by_state_and_search(self):
+        """测试按状态和关键字过滤"""
+        result = paginate_work_items(make_items(30), search='alice', state='Active', page_size=100)
+
+        assert [row['id'] for row in result['rows']] == [27, 21, 15, 9, 3]
+        assert result['total'] == 5
+
+    def test_sort_ascending_by_title(self):
+        """测试按标题升序排序"""
+        result = paginate_work_items(make_items(5), sort_by='title', descending=False)
+
+        assert [row['id'] for row in result['rows']] == [1, 2, 3, 4, 5]
+
+    @pytest.mark.parametrize("page, expected", [(0, 1), (99, 4)])
+    def test_page_clamped(self, page, expected):
+        """测试页码超出范围时自动修正"""
+        result = paginate_work_items(make_items(100), page=page, page_size=25)
+
+        assert result['page'] == expected
+
+    def test_empty(self):
+        """测试没有工作项"""
+        assert paginate_work_items([]) == {'rows': [], 'total': 0, 'page': 1, 'page_count': 1}
+
+
+class TestDescriptionToMarkdown:
+    """测试工作项描述的安全显示"""
+
+    def test_markup_and_scripts_removed(self):
+        """测试标签、属性和脚本内容都不会出现在输出中"""
+        markdown = description_to_markdown(
+            '<div onclick="x()">Hello <b>world</b><script>alert(1)</script>'
+            '<img src=x onerror=alert(1)><iframe src="https://evil"></iframe></div>'
+        )
+
+        assert markdown == 'Hello world'
+
+    def test_text_escaped(self):
+        """测试文本中的HTML实体和Markdown字符按原样显示"""
+        markdown = description_to_markdown('<p>&lt;script&gt; *bold* [link](javascript:alert(1))</p>')
+
+        assert '<' not in markdown.replace('\\<', '')
+        assert markdown == '\\<script\\> \\*bold\\* \\[link\\]\\(javascript:alert\\(1\\)\\)'
+
+    def test_structure_kept(self):
+        """测试段落、列表和换行"""
+        markdown = description_to_markdown('<p>Intro</p><ul><li>one</li><li>two<br>three</li></ul>')
+
+        assert markdown == 'Intro\n\n- one\n- two\\\nthree'
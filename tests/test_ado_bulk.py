@@ -0,0 +1,210 @@
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from src.requirement_tracker.ado_bulk import (
+    PARENT_LINK_TYPE,
+    build_create_request,
+    bulk_create_work_items,
+    feature_fields,
+    post_batch,
+)
+
+ORG_URL = "https://dev.azure.com/org"
+
+
+class FakeBatchService:
+    """模拟 $batch 接口：按请求顺序分配ID，临时ID在同一批次内解析为真实ID"""
+
+    def __init__(self, fail_titles=(), next_id=100):
+        self.next_id = next_id
+        self.fail_titles = set(fail_titles)
+        self.calls = []
+        self.links = {}
+
+    def __call__(self, wit_client, requests):
+        self.calls.append(requests)
+        temp_ids = {}
+        responses = []
+        for request in requests:
+            fields = {op["path"]: op["value"] for op in request["body"] if op["path"].startswith("/fields/")}
+            if fields["/fields/System.Title"] in self.fail_titles:
+                responses.append({"code": 400, "body": json.dumps({"message": "TF401320: 字段无效"})})
+                continue
+            work_item_id = self.next_id
+            self.next_id += 1
+            for op in request["body"]:
+                if op["path"] == "/id":
+                    temp_ids[op["value"]] = work_item_id
+                elif op["path"] == "/relations/-":
+                    parent = int(op["value"]["url"].rsplit("/", 1)[1])
+                    self.links[work_item_id] = temp_ids.get(parent, parent)
+            responses.append({"code": 200, "body": json.dumps({"id": work_item_id})})
+        return responses
+
+
+class TestBuildRequest:
+    """测试请求构建"""
+
+    def test_feature_fields_skip_empty(self):
+        """测试空字段不写入"""
+        fields = feature_fields("标题", description="描述", area_path="Proj")
+
+        assert fields == {"System.Title": "标题", "System.Description": "描述",
+                          "System.WorkItemType": "Feature", "System.AreaPath": "Proj"}
+
+    def test_create_request(self):
+        """测试请求包含临时ID、字段和父链接"""
+        request = build_create_request("Proj", "User Story", {"System.Title": "子项"}, -2,
+                                       f"{ORG_URL}/_apis/wit/workItems/-1")
+
+        assert request["method"] == "PATCH"
+        assert request["uri"].startswith("/Proj/_apis/wit/workitems/$User%20Story?")
+        assert request["body"][0] == {"op": "add", "path": "/id", "value": -2}
+        assert request["body"][-1]["value"]["rel"] == PARENT_LINK_TYPE
+
+    def test_uri_encodes_project_and_type(self):
+        """测试项目名称和类型中的空格和特殊字符被编码"""
+        request = build_create_request("Move and Sell", "User Story", {"System.Title": "标题"})
+
+        assert request["uri"] == "/Move%20and%20Sell/_apis/wit/workitems/$User%20Story?api-version=4.1"
+        assert build_create_request("R&D/Ops", "Bug", {})["uri"].startswith("/R%26D%2FOps/")
+
+    def test_post_batch(self):
+        """测试通过客户端连接发送 $batch 请求"""
+        wit_client = Mock()
+        wit_client.config.base_url = ORG_URL + "/"
+        wit_client._send_request.return_value.json.return_value = {"count": 1, "value": [{"code": 200}]}
+
+        assert post_batch(wit_client, [{"method": "PATCH"}]) == [{"code": 200}]
+        wit_client._client.post.assert_called_once_with(f"{ORG_URL}/_apis/wit/$batch", params={"api-version": "4.1"})
+        assert wit_client._send_request.call_args.kwargs["content"] == [{"method": "PATCH"}]
+
+
+class TestBulkCreate:
+    """测试批量创建"""
+
+    def test_results_in_input_order(self):
+        """测试按输入顺序返回ID，超过上限时拆分为多个 $batch 请求"""
+        service = FakeBatchService()
+        items = [{"summary": f"Feature {i}"} for i in range(5)]
+
+        results = bulk_create_work_items(Mock(), items, "Proj", ORG_URL, max_requests=2, send=service)
+
+        assert [result["id"] for result in results] == [100, 101, 102, 103, 104]
+        assert all(result["error"] is None for result in results)
+        assert [len(call) for call in service.calls] == [2, 2, 1]
+
+    def test_parent_child_links(self):
+        """测试子工作项在父工作项之后提交并链接到父工作项，即使输入中子项在前"""
+        service = FakeBatchService()
+        items = [
+            {"summary": "Story", "work_item_type": "User Story", "parent": 1},
+            {"summary": "Feature"},
+            {"summary": "Existing child", "parent_id": 42},
+        ]
+
+        results = bulk_create_work_items(Mock(), items, "Proj", ORG_URL, send=service)
+
+        feature_id, story_id = results[1]["id"], results[0]["id"]
+        assert service.links[story_id] == feature_id
+        assert service.links[results[2]["id"]] == 42
+
+    def test_parent_in_earlier_batch(self):
+        """测试父工作项在之前的批次中创建时使用真实ID链接"""
+        service = FakeBatchService()
+        items = [{"summary": "Feature"}, {"summary": "Story", "parent": 0}]
+
+        results = bulk_create_work_items(Mock(), items, "Proj", ORG_URL, max_requests=1, send=service)
+
+        assert service.links[results[1]["id"]] == results[0]["id"]
+        assert f"{ORG_URL}/_apis/wit/workItems/{results[0]['id']}" in json.dumps(service.calls[1])
+
+    def test_per_item_errors(self):
+        """测试单个工作项失败不影响其他工作项，父工作项失败时子工作项不提交"""
+        service = FakeBatchService(fail_titles={"Bad"})
+        items = [{"summary": "Bad"}, {"summary": "Child", "parent": 0}, {"summary": "Good"}]
+
+        results = bulk_create_work_items(Mock(), items, "Proj", ORG_URL, max_requests=1, send=service)
+
+        assert "TF401320" in results[0]["error"]
+        assert results[1]["id"] is None and "序号 0" in results[1]["error"]
+        assert results[2]["id"] is not None
+        assert len(service.calls) == 2
+
+    def test_invalid_parent(self):
+        """测试无效或循环的parent引用直接返回错误"""
+        service = FakeBatchService()
+        items = [{"summary": "A", "parent": 1}, {"summary": "B", "parent": 0}, {"summary": "C", "parent": 9}]
+
+        results = bulk_create_work_items(Mock(), items, "Proj", ORG_URL, send=service)
+
+        assert results[0]["error"] == results[1]["error"] == "父子关系存在循环"
+        assert "无效的parent序号" in results[2]["error"]
+        assert service.calls == []
+
+    def test_batch_request_failure(self):
+        """测试整个 $batch 请求失败时该批次的工作项都记录错误"""
+        send = Mock(side_effect=Exception("HTTP 503"))
+
+        results = bulk_create_work_items(Mock(), [{"summary": "A"}, {"summary": "B"}], "Proj", ORG_URL, send=send)
+
+        assert [result["error"] for result in results] == ["HTTP 503", "HTTP 503"]
+
+
+    def test_existing_items_skipped(self):
+        """测试已创建的工作项不再提交，子工作项链接到已有ID"""
+        service = FakeBatchService()
+        items = [{"summary": "父"}, {"summary": "子", "parent": 0}]
+
+        results = bulk_create_work_items(Mock(), items, "Proj", ORG_URL, send=service, existing={0: 55})
+
+        assert [result["id"] for result in results] == [55, 100]
+        assert len(service.calls[0]) == 1
+        assert service.links == {100: 55}
+
+
+class TestBulkCreateTool:
+    """测试批量创建工具"""
+
+    @patch.dict("os.environ", {"ADO_ORG_URL": ORG_URL, "ADO_PAT": "pat"})
+    @patch("src.requirement_tracker.tools.get_ado_connection")
+    def test_tool(self, mock_get_ado_connection):
+        """测试工具使用ADO连接发送 $batch 请求并返回结果"""
+        pytest.importorskip("azure.devops")
+        from src.requirement_tracker.tools import bulk_create_ado_work_items
+
+        wit_client = mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value
+        wit_client.config.base_url = ORG_URL
+        wit_client._send_request.return_value.json.return_value = {
+            "count": 1, "value": [{"code": 200, "body": "{\"id\": 7}"}]
+        }
+
+        result = bulk_create_ado_work_items.run(items=[{"summary": "Feature"}], project_name="Proj")
+
+        assert result == [{"index": 0, "id": 7, "error": None}]
+
+    @patch.dict("os.environ", {"ADO_ORG_URL": ORG_URL, "ADO_PAT": "pat"})
+    @patch("src.requirement_tracker.tools.get_ado_connection")
+    def test_retry_only_submits_missing_items(self, mock_get_ado_connection):
+        """测试重试时已创建的工作项从幂等台账返回，只提交上次失败的工作项"""
+        pytest.importorskip("azure.devops")
+        from src.requirement_tracker.tools import bulk_create_ado_work_items
+
+        wit_client = mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value
+        wit_client.config.base_url = ORG_URL
+        service = FakeBatchService(fail_titles={"B"})
+        items = [{"summary": "A"}, {"summary": "B"}]
+
+        with patch("src.requirement_tracker.tools.bulk_create_work_items",
+                   side_effect=lambda *args, **kwargs: bulk_create_work_items(*args, send=service, **kwargs)):
+            first = bulk_create_ado_work_items.run(items=items, project_name="Proj")
+            service.fail_titles.clear()
+            second = bulk_create_ado_work_items.run(items=items, project_name="Proj")
+            third = bulk_create_ado_work_items.run(items=items, project_name="Proj")
+
+        assert [result["id"] for result in first] == [100, None]
+        assert [result["id"] for result in second] == [100, 101]
+        assert [result["id"] for result in third] == [100, 101]
+        assert [len(call) for call in service.calls] == [2, 1]
@@ -0,0 +1,179 @@
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.ado_fetch import (
+    fetch_work_items,
+    fetch_work_item_description,
+    get_list_fields,
+    work_item_to_dict
+)
+
+
+def make_item(item_id):
+    """创建模拟工作项"""
+    item = Mock()
+    item.id = item_id
+    item.fields = {'System.Title': f'Item {item_id}'}
+    return item
+
+
+class FakeWitClient:
+    """模拟Work Item Tracking客户端，记录并发中的请求数"""
+
+    def __init__(self, delay=0.0, fail_batches=()):
+        self.delay = delay
+        self.fail_batches = set(fail_batches)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = []
+
+    def get_work_items(self, ids, fields=None, error_policy=None):
+        with self.lock:
+            self.calls.append(list(ids))
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            # 让靠前的批次更慢完成，验证输出顺序不依赖完成顺序
+            time.sleep(self.delay * (1 if ids[0] > 500 else 3))
+            if ids[0] in self.fail_batches:
+                raise Exception(f"batch {ids[0]} failed")
+            return [make_item(item_id) for item_id in ids]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestFetchWorkItems:
+    """测试并发分批获取工作项"""
+
+    def test_preserves_input_order(self):
+        """测试输出顺序与输入ID顺序一致"""
+        wit_client = FakeWitClient(delay=0.01)
+        ids = list(range(1000, 0, -1))
+
+        items, failures = fetch_work_items(wit_client, ids, batch_size=100, max_in_flight=4)
+
+        assert [item.id for item in items] == ids
+        assert failures == []
+        assert len(wit_client.calls) == 10
+
+    def test_respects_in_flight_limit(self):
+        """测试同时进行中的批次不超过上限"""
+        wit_client = FakeWitClient(delay=0.01)
+
+        fetch_work_items(wit_client, list(range(1, 1001)), batch_size=50, max_in_flight=3)
+
+        assert 1 < wit_client.peak_in_flight <= 3
+
+    def test_failed_batch_is_isolated(self):
+        """测试单个批次失败不影响其他批次"""
+        wit_client = FakeWitClient(fail_batches={201})
+        callbacks = []
+
+        items, failures = fetch_work_items(
+            wit_client, list(range(1, 501)), batch_size=200,
+            on_batch=lambda number, batch_ids, error: callbacks.append((number, error is None))
+        )
+
+        assert len(items) == 300
+        assert len(failures) == 1
+        assert failures[0]['batch'] == 2
+        assert failures[0]['ids'] == list(range(201, 401))
+        assert "batch 201 failed" in failures[0]['error']
+        assert sorted(callbacks) == [(1, True), (2, False), (3, True)]
+
+    def test_all_batches_failed_raises(self):
+        """测试全部批次失败时抛出异常"""
+        wit_client = FakeWitClient(fail_batches={1, 3})
+
+        with pytest.raises(Exception, match="batch 1 failed"):
+            fetch_work_items(wit_client, [1, 2, 3, 4], batch_size=2)
+
+    def test_omitted_items_are_skipped(self):
+        """测试已删除（返回None）的工作项被跳过"""
+        wit_client = Mock()
+        wit_client.get_work_items.return_value = [make_item(1), None, make_item(3)]
+
+        items, failures = fetch_work_items(wit_client, [1, 2, 3])
+
+        assert [item.id for item in items] == [1, 3]
+        wit_client.get_work_items.assert_called_once_with(ids=[1, 2, 3], fields=None, error_policy='omit')
+
+    def test_empty_ids(self):
+        """测试空ID列表不发出请求"""
+        wit_client = Mock()
+
+        assert fetch_work_items(wit_client, []) == ([], [])
+        wit_client.get_work_items.assert_not_called()
+
+
+class TestFieldProjection:
+    """测试字段投影"""
+
+    def test_fields_passed_to_batch_read(self):
+        """测试批量读取只请求指定字段"""
+        wit_client = Mock()
+        wit_client.get_work_items.return_value = [make_item(1)]
+        fields = get_list_fields(include_description=False)
+
+        fetch_work_items(wit_client, [1], fields=fields)
+
+        requested = wit_client.get_work_items.call_args[1]['fields']
+        assert 'System.Description' not in requested
+        assert 'System.Title' in requested
+        assert 'System.AreaPath' in requested
+
+    def test_get_list_fields_options(self):
+        """测试字段列表选项"""
+        fields = get_list_fields(include_area_path=False, include_description=True)
+
+        assert 'System.AreaPath' not in fields
+        assert fields[-1] == 'System.Description'
+
+    def test_work_item_to_dict_lazy_description(self):
+        """测试延迟加载描述时description为None"""
+        item = Mock()
+        item.id = 7
+        item.fields = {
+            'System.Title': 'Title',
+            'System.WorkItemType': 'Feature',
+            'System.State': 'New',
+            'System.AreaPath': 'Proj\\Team',
+            'System.AssignedTo': {'displayName': 'Alice'}
+        }
+
+        result = work_item_to_dict(item, include_description=False)
+
+        assert result == {
+            'id': 7,
+            'title': 'Title',
+            'type': 'Feature',
+            'state': 'New',
+            'area_path': 'Proj\\Team',
+            'assigned_to': 'Alice',
+            'description': None
+        }
+
+    def test_work_item_to_dict_defaults(self):
+        """测试缺失字段使用默认值"""
+        item = Mock()
+        item.id = 8
+        item.fields = {}
+
+        result = work_item_to_dict(item, include_area_path=False)
+
+        assert 'area_path' not in result
+        assert result['title'] == 'No Title'
+        assert result['assigned_to'] == 'Unassigned'
+        assert result['description'] == 'N/A'
+
+    def test_fetch_work_item_description(self):
+        """测试按需获取单个工作项描述"""
+        wit_client = Mock()
+        wit_client.get_work_item.return_value = Mock(fields={'System.Description': '<p>desc</p>'})
+
+        assert fetch_work_item_description(wit_client, "42") == '<p>desc</p>'
+        wit_client.get_work_item.assert_called_once_with(id=42, fields=['System.Description'])
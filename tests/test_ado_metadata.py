@@ -0,0 +1,271 @@
+import sys
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.ado_metadata import (
+    AdoMetadataService,
+    AreaPathIndex,
+    MetadataCache,
+    flatten_area_tree,
+    get_org_url
+)
+
+
+def make_node(name, children=None, node_id=None):
+    """创建模拟分类节点"""
+    node = Mock()
+    node.name = name
+    node.id = node_id or name
+    node.children = children
+    return node
+
+
+def make_tree():
+    """Proj
+        ├─ Team
+        │   ├─ Backend
+        │   └─ Frontend
+        ├─ TeamB
+        └─ Ops
+    """
+    return make_node('Proj', [
+        make_node('Team', [make_node('Backend'), make_node('Frontend')]),
+        make_node('TeamB'),
+        make_node('Ops'),
+    ])
+
+
+class FakeClock:
+    """可控的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFlattenAreaTree:
+    """测试Area树扁平化"""
+
+    def test_preorder_paths(self):
+        """测试先序展开且路径不含项目根节点"""
+        areas = flatten_area_tree(make_tree())
+
+        assert [area['path'] for area in areas] == [
+            'Team', 'Team\\Backend', 'Team\\Frontend', 'TeamB', 'Ops'
+        ]
+
+    def test_root_without_children(self):
+        """测试根节点没有子节点时返回根节点本身"""
+        assert flatten_area_tree(make_node('Proj')) == [{'name': 'Proj', 'path': 'Proj', 'id': 'Proj'}]
+
+    def test_deep_tree_without_recursion_limit(self):
+        """测试超过递归深度限制的层级"""
+        node = make_node('leaf')
+        depth = sys.getrecursionlimit() + 100
+        for level in range(depth):
+            node = make_node(f'n{level}', [node])
+
+        assert len(flatten_area_tree(make_node('Proj', [node]))) == depth + 1
+
+
+class TestAreaPathIndex:
+    """测试Area路径索引"""
+
+    @pytest.fixture
+    def index(self):
+        return AreaPathIndex(flatten_area_tree(make_tree()))
+
+    def test_descendants_excludes_prefix_siblings(self, index):
+        """测试子树查询不包含同前缀的兄弟Area"""
+        assert index.descendants('Team') == ['Team', 'Team\\Backend', 'Team\\Frontend']
+        assert index.descendants('team', include_self=False) == ['Team\\Backend', 'Team\\Frontend']
+        assert index.descendants('Missing') == []
+
+    def test_search_prefix(self, index):
+        """测试忽略大小写的前缀联想"""
+        assert index.search_prefix('te') == ['Team', 'Team\\Backend', 'Team\\Frontend', 'TeamB']
+        assert index.search_prefix('team\\f') == ['Team\\Frontend']
+        assert index.search_prefix('Team', limit=2) == ['Team', 'Team\\Backend']
+
+    def test_sorted_paths_and_contains(self, index):
+        """测试排序路径和存在性判断"""
+        assert index.sorted_paths == sorted(area['path'] for area in index.areas)
+        assert index.contains('OPS')
+        assert not index.contains('Op')
+        assert len(index) == 5
+
+    def test_returned_lists_are_copies(self, index):
+        """测试修改返回的列表和字典不会破坏共享索引"""
+        areas = index.areas
+        areas.clear()
+        index.sorted_paths.append('Zzz')
+        index.areas[0]['path'] = 'Changed'
+        index.descendants('Team').clear()
+
+        assert [area['path'] for area in index.areas][:1] == ['Team']
+        assert len(index.areas) == 5
+        assert 'Zzz' not in index.sorted_paths
+        assert index.descendants('Team') == ['Team', 'Team\\Backend', 'Team\\Frontend']
+
+    def test_get_areas_by_path(self, index):
+        """测试按路径取回Area字典"""
+        areas = index.get_areas(index.descendants('Team', include_self=False) + ['Missing'])
+
+        assert [area['name'] for area in areas] == ['Backend', 'Frontend']
+
+
+def run_now(func):
+    """同步执行后台任务，便于断言"""
+    func()
+
+
+class TestMetadataCache:
+    """测试stale-while-revalidate缓存"""
+
+    def test_fresh_value_cached(self):
+        """测试TTL内只加载一次"""
+        cache = MetadataCache(ttl=60, clock=FakeClock())
+        loader = Mock(return_value=['a'])
+
+        assert cache.get('key', loader) == ['a']
+        assert cache.get('key', loader) == ['a']
+        loader.assert_called_once()
+
+    def test_stale_value_returned_while_refreshing(self):
+        """测试过期后先返回旧值，后台刷新后返回新值"""
+        clock = FakeClock()
+        pending = []
+        cache = MetadataCache(ttl=60, clock=clock, run_in_background=pending.append)
+        loader = Mock(side_effect=['old', 'new'])
+        cache.get('key', loader)
+        clock.now = 61
+
+        assert cache.get('key', loader) == 'old'
+        # 刷新进行中时不重复调度
+        assert cache.get('key', loader) == 'old'
+        assert len(pending) == 1
+
+        pending[0]()
+        assert cache.get('key', loader) == 'new'
+        assert cache.get_stats()['refreshes'] == 1
+
+    def test_refresh_error_keeps_stale_value(self):
+        """测试后台刷新失败时保留旧值"""
+        clock = FakeClock()
+        cache = MetadataCache(ttl=60, clock=clock, run_in_background=run_now)
+        loader = Mock(side_effect=['old', Exception("boom"), 'new'])
+        cache.get('key', loader)
+        clock.now = 61
+
+        assert cache.get('key', loader) == 'old'
+        assert cache.get_stats()['refresh_errors'] == 1
+        assert cache.get('key', loader) == 'old'
+        assert cache.get('key', loader) == 'new'
+
+    def test_explicit_refresh_and_invalidate(self):
+        """测试强制刷新和清除缓存"""
+        cache = MetadataCache(ttl=60, clock=FakeClock())
+        loader = Mock(side_effect=[1, 2, 3])
+
+        cache.get('key', loader)
+        assert cache.get('key', loader, refresh=True) == 2
+        cache.invalidate()
+        assert cache.get('key', loader) == 3
+
+    def test_load_error_not_cached(self):
+        """测试首次加载失败时抛出异常且不缓存"""
+        cache = MetadataCache(ttl=60)
+        loader = Mock(side_effect=[Exception("boom"), 'ok'])
+
+        with pytest.raises(Exception, match="boom"):
+            cache.get('key', loader)
+        assert cache.get('key', loader) == 'ok'
+
+
+class TestAdoMetadataService:
+    """测试ADO元数据服务"""
+
+    def test_area_index_cached_per_project(self):
+        """测试Area索引按项目缓存"""
+        service = AdoMetadataService(ttl=60, clock=FakeClock())
+        wit_client = Mock()
+        wit_client.get_classification_node.return_value = make_tree()
+
+        first = service.get_area_index(wit_client, 'Proj')
+        second = service.get_area_index(wit_client, 'Proj')
+
+        assert first is second
+        assert len(first) == 5
+        wit_client.get_classification_node.assert_called_once_with(
+            project='Proj', structure_group='areas', depth=100
+        )
+
+    def test_project_names(self):
+        """测试项目列表缓存"""
+        service = AdoMetadataService(ttl=60, clock=FakeClock())
+        core_client = Mock()
+        project = Mock()
+        project.name = 'Proj'
+        core_client.get_projects.return_value = [project]
+
+        assert service.get_project_names(core_client) == ['Proj']
+        assert service.get_project_names(core_client) == ['Proj']
+        core_client.get_projects.assert_called_once()
+
+    def test_work_item_types_common_first(self):
+        """测试工作项类型过滤禁用类型且常用类型在前"""
+        service = AdoMetadataService(ttl=60, clock=FakeClock())
+        wit_client = Mock()
+        types = []
+        for name, disabled in [('Epic', False), ('Bug', False), ('Feature', False), ('Old', True)]:
+            work_item_type = Mock(is_disabled=disabled)
+            work_item_type.name = name
+            types.append(work_item_type)
+        wit_client.get_work_item_types.return_value = types
+
+        assert service.get_work_item_types(wit_client, 'Proj') == ['Feature', 'Bug', 'Epic']
+
+    def test_invalidate_project(self):
+        """测试只清除指定项目的缓存"""
+        service = AdoMetadataService(ttl=60, clock=FakeClock())
+        wit_client = Mock()
+        wit_client.get_classification_node.side_effect = lambda **kwargs: make_tree()
+        core_client = Mock()
+        core_client.get_projects.return_value = []
+
+        service.get_project_names(core_client)
+        service.get_area_index(wit_client, 'Proj')
+        service.invalidate('Proj')
+        service.get_project_names(core_client)
+        service.get_area_index(wit_client, 'Proj')
+
+        core_client.get_projects.assert_called_once()
+        assert wit_client.get_classification_node.call_count == 2
+
+    def test_cache_keyed_by_org(self):
+        """测试不同组织的同名项目分别缓存"""
+        service = AdoMetadataService(ttl=60, clock=FakeClock())
+        first_client = Mock()
+        first_client.config.base_url = 'https://dev.azure.com/first/'
+        first_client.get_classification_node.return_value = make_tree()
+        second_client = Mock()
+        second_client.config.base_url = 'https://dev.azure.com/second'
+        second_client.get_classification_node.return_value = make_node('Proj', [make_node('Other')])
+
+        assert len(service.get_area_index(first_client, 'Proj')) == 5
+        assert service.get_area_index(second_client, 'Proj').sorted_paths == ['Other']
+        assert len(service.get_area_index(first_client, 'Proj')) == 5
+
+        service.invalidate(org_url='https://dev.azure.com/second')
+        service.get_area_index(first_client, 'Proj')
+        service.get_area_index(second_client, 'Proj')
+        first_client.get_classification_node.assert_called_once()
+        assert second_client.get_classification_node.call_count == 2
+
+    def test_org_url_falls_back_to_env(self, monkeypatch):
+        """测试客户端没有base_url时使用ADO_ORG_URL"""
+        monkeypatch.setenv('ADO_ORG_URL', 'https://dev.azure.com/EnvOrg/')
+
+        assert get_org_url(Mock()) == 'https://dev.azure.com/envorg'
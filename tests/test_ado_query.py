@@ -0,0 +1,138 @@
+import re
+import threading
+
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.ado_query import (
+    build_id_query,
+    fetch_partitioned_work_items,
+    iter_work_item_id_partitions,
+    query_id_range,
+    query_work_item_ids,
+)
+
+pytest.importorskip("azure.devops")
+
+
+class CappedWitClient:
+    """模拟ADO客户端：按ID区间过滤，结果超过上限时只返回ID最大的top个"""
+
+    def __init__(self, ids, cap=100):
+        self.ids = sorted(ids, reverse=True)
+        self.cap = cap
+        self.queries = []
+        self.fetched = []
+        self.failing_ids = set()
+        self._lock = threading.Lock()
+
+    def query_by_wiql(self, wiql, time_precision=None, top=None):
+        with self._lock:
+            self.queries.append((wiql.query, time_precision, top))
+        low = re.search(r"\[System.Id\] >= (\d+)", wiql.query)
+        high = re.search(r"\[System.Id\] < (\d+)", wiql.query)
+        ids = [
+            item_id for item_id in self.ids
+            if (low is None or item_id >= int(low.group(1))) and (high is None or item_id < int(high.group(1)))
+        ]
+        if len(ids) > self.cap and top is None:
+            raise Exception("VS402337: The number of work items returned exceeds the size limit of 20000")
+        return Mock(work_items=[Mock(id=item_id) for item_id in ids[:min(top or self.cap, self.cap)]])
+
+    def get_work_items(self, ids, fields=None, error_policy=None):
+        if self.failing_ids & set(ids):
+            raise Exception("batch failed")
+        with self._lock:
+            self.fetched.append(list(ids))
+        return [Mock(id=item_id) for item_id in ids]
+
+
+class TestBuildIdQuery:
+    """测试ID查询语句"""
+
+    def test_range_conditions(self):
+        """测试区间条件和倒序排序"""
+        query = build_id_query("[System.TeamProject] = 'Proj'", 100, 200)
+
+        assert "([System.TeamProject] = 'Proj') AND [System.Id] >= 100 AND [System.Id] < 200" in query
+        assert "ORDER BY [System.Id] DESC" in query
+
+    def test_without_range(self):
+        """测试不限制区间时只有过滤条件"""
+        assert "[System.Id] >=" not in build_id_query("[System.TeamProject] = 'Proj'")
+
+
+class TestPartitionedQuery:
+    """测试超过上限时的分区查询"""
+
+    def test_under_cap_single_query(self):
+        """测试结果未达到上限时只执行一次查询"""
+        wit_client = CappedWitClient(range(1, 51), cap=100)
+
+        assert query_work_item_ids(wit_client, "x", max_results=100) == list(range(50, 0, -1))
+        assert len(wit_client.queries) == 1
+
+    def test_over_cap_returns_all_ids(self):
+        """测试超过上限时分区查询返回全部ID，倒序且不重复"""
+        ids = list(range(1, 1001)) + list(range(5000, 5200))
+        wit_client = CappedWitClient(ids, cap=100)
+
+        result = query_work_item_ids(wit_client, "x", max_results=100)
+
+        assert result == sorted(ids, reverse=True)
+        assert all(top == 100 for _, _, top in wit_client.queries)
+
+    def test_dense_range_continues(self):
+        """测试单个区间仍超过上限时在区间内继续向下查询"""
+        wit_client = CappedWitClient(range(1, 251), cap=100)
+
+        assert query_id_range(wit_client, "x", 1, 251, max_results=100) == list(range(250, 0, -1))
+        assert len(wit_client.queries) == 3
+
+    def test_partitions_in_order(self):
+        """测试分区按ID倒序依次返回，并透传time_precision"""
+        wit_client = CappedWitClient(range(1, 301), cap=100)
+
+        partitions = list(iter_work_item_id_partitions(wit_client, "x", max_results=100, time_precision=True))
+
+        assert partitions[0] == list(range(300, 200, -1))
+        assert [item_id for partition in partitions for item_id in partition] == list(range(300, 0, -1))
+        assert all(time_precision is True for _, time_precision, _ in wit_client.queries)
+
+
+class TestFetchPartitionedWorkItems:
+    """测试分区查询并读取详情"""
+
+    def test_fetch_all_partitions(self):
+        """测试每个分区的详情都被读取，批次序号连续"""
+        wit_client = CappedWitClient(range(1, 451), cap=100)
+        batches = []
+
+        ids, items, failures = fetch_partitioned_work_items(
+            wit_client, "x", on_batch=lambda number, batch_ids, error: batches.append(number), max_results=100
+        )
+
+        assert ids == list(range(450, 0, -1))
+        assert [item.id for item in items] == ids
+        assert failures == []
+        assert sorted(batches) == list(range(1, len(batches) + 1))
+
+    def test_failed_partition_recorded(self):
+        """测试一个分区的批次全部失败时记录失败，其余分区正常返回"""
+        wit_client = CappedWitClient(range(1, 301), cap=100)
+        wit_client.failing_ids = {250}
+
+        ids, items, failures = fetch_partitioned_work_items(wit_client, "x", max_results=100)
+
+        assert len(ids) == 300
+        assert 250 not in {item.id for item in items}
+        assert len(failures) == 1
+        assert 250 in failures[0]['ids']
+
+    def test_all_failed_raises(self):
+        """测试全部批次失败时抛出异常"""
+        wit_client = CappedWitClient(range(1, 11), cap=100)
+        wit_client.failing_ids = set(range(1, 11))
+
+        with pytest.raises(Exception, match="batch failed"):
+            fetch_partitioned_work_items(wit_client, "x", max_results=100)
@@ -0,0 +1,180 @@
+import pytest
+from unittest.mock import Mock
+
+from datetime import datetime, timezone
+
+from src.requirement_tracker.ado_sync import build_sync_wiql, latest_changed_date, parse_changed_date, sync_work_items
+from src.requirement_tracker.work_item_store import WorkItemStore
+
+pytest.importorskip("azure.devops")
+
+
+def make_item(item_id, changed_date, work_item_type='Feature', area_path='Proj', title=None):
+    """创建模拟工作项"""
+    item = Mock()
+    item.id = item_id
+    item.fields = {
+        'System.Title': title or f'Item {item_id}',
+        'System.WorkItemType': work_item_type,
+        'System.State': 'New',
+        'System.AreaPath': area_path,
+        'System.TeamProject': 'Proj',
+        'System.ChangedDate': changed_date
+    }
+    return item
+
+
+class FakeWitClient:
+    """模拟ADO客户端：保存服务端工作项和回收站，记录WIQL查询"""
+
+    def __init__(self, items):
+        self.items = {item.id: item for item in items}
+        self.recycle_bin = []
+        self.queries = []
+
+    def query_by_wiql(self, wiql, time_precision=None, top=None):
+        self.queries.append(wiql.query)
+        since = None
+        if 'ChangedDate' in wiql.query:
+            since = wiql.query.split("[System.ChangedDate] >= '")[1].split("'")[0]
+        ids = [
+            item_id for item_id, item in sorted(self.items.items(), reverse=True)
+            if since is None and item.fields['System.WorkItemType'] == 'Feature'
+            or since is not None and item.fields['System.ChangedDate'] >= since
+        ]
+        return Mock(work_items=[Mock(id=item_id) for item_id in ids])
+
+    def get_work_items(self, ids, fields=None, error_policy=None):
+        return [self.items.get(item_id) for item_id in ids]
+
+    def get_deleted_work_item_shallow_references(self, project):
+        return [Mock(id=item_id) for item_id in self.recycle_bin]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return WorkItemStore(path=str(tmp_path / "work_items.db"))
+
+
+class TestSyncWorkItems:
+    """测试增量同步"""
+
+    def test_first_sync_is_full(self, store):
+        """测试首次同步全量获取并记录水位线"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-01T00:00:00Z'), make_item(2, '2024-01-02T00:00:00Z')])
+
+        summary = sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        assert summary['mode'] == 'full'
+        assert summary['changed'] == 2
+        assert summary['watermark'] == '2024-01-02T00:00:00Z'
+        assert [item['id'] for item in store.get_scope_items('Proj', 'Feature')] == [2, 1]
+
+    def test_incremental_sync_fetches_only_changes(self, store):
+        """测试再次同步只获取水位线之后变化的工作项并合并"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-01T00:00:00Z'), make_item(2, '2024-01-02T00:00:00Z')])
+        sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        wit_client.items[1] = make_item(1, '2024-01-05T00:00:00Z', title='Updated')
+        wit_client.items[3] = make_item(3, '2024-01-06T00:00:00Z')
+        summary = sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        assert summary['mode'] == 'incremental'
+        # 水位线上的工作项2会被重复获取
+        assert summary['changed'] == 3
+        assert "[System.ChangedDate] >= '2024-01-02T00:00:00Z'" in wit_client.queries[-1]
+        items = {item['id']: item for item in store.get_scope_items('Proj', 'Feature')}
+        assert sorted(items) == [1, 2, 3]
+        assert items[1]['title'] == 'Updated'
+        assert summary['watermark'] == '2024-01-06T00:00:00Z'
+
+    def test_item_moved_out_of_scope(self, store):
+        """测试类型被修改的工作项移出范围"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-01T00:00:00Z'), make_item(2, '2024-01-01T00:00:00Z')])
+        sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        wit_client.items[2] = make_item(2, '2024-01-03T00:00:00Z', work_item_type='Bug')
+        sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        assert [item['id'] for item in store.get_scope_items('Proj', 'Feature')] == [1]
+
+    def test_deleted_items_removed_via_recycle_bin(self, store):
+        """测试回收站中的工作项从本地删除"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-01T00:00:00Z'), make_item(2, '2024-01-01T00:00:00Z')])
+        sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        del wit_client.items[2]
+        wit_client.recycle_bin = [2]
+        summary = sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        assert summary['deleted'] == 1
+        assert [item['id'] for item in store.get_scope_items('Proj', 'Feature')] == [1]
+
+    def test_full_sync_removes_missing_items(self, store):
+        """测试强制全量同步时删除服务端已不存在的工作项"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-01T00:00:00Z'), make_item(2, '2024-01-01T00:00:00Z')])
+        sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        del wit_client.items[1]
+        summary = sync_work_items(wit_client, store, 'Proj', 'Feature', full=True)
+
+        assert summary['mode'] == 'full'
+        assert summary['deleted'] == 1
+
+    def test_failed_batch_keeps_watermark(self, store):
+        """测试有批次失败时不推进水位线"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-01T00:00:00Z')])
+        sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        wit_client.items[2] = make_item(2, '2024-02-01T00:00:00Z')
+        wit_client.get_work_items = Mock(side_effect=Exception("boom"))
+        with pytest.raises(Exception, match="boom"):
+            sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        assert store.get_watermark('Proj|Feature|') == '2024-01-01T00:00:00Z'
+
+    def test_watermark_uses_time_order(self, store):
+        """测试小数秒位数不同时水位线按时间而不是字符串顺序取最大值"""
+        wit_client = FakeWitClient([make_item(1, '2024-01-02T00:00:05.12Z'), make_item(2, '2024-01-02T00:00:05.1Z')])
+
+        summary = sync_work_items(wit_client, store, 'Proj', 'Feature')
+
+        assert summary['watermark'] == '2024-01-02T00:00:05.12Z'
+
+
+class TestBuildSyncWiql:
+    """测试同步WIQL"""
+
+    def test_full_query_filters_scope(self):
+        """测试全量查询按类型和Area过滤并转义"""
+        query = build_sync_wiql("O'Proj", 'Feature', "O'Proj\\Team")
+
+        assert "[System.TeamProject] = 'O''Proj'" in query
+        assert "[System.WorkItemType] = 'Feature'" in query
+        assert "[System.AreaPath] = 'O''Proj\\Team'" in query
+
+    def test_incremental_query_filters_by_project_only(self):
+        """测试增量查询只按项目和ChangedDate过滤"""
+        query = build_sync_wiql('Proj', 'Feature', 'Proj\\Team', since='2024-01-01T00:00:00Z')
+
+        assert "[System.ChangedDate] >= '2024-01-01T00:00:00Z'" in query
+        assert 'WorkItemType' not in query
+        assert 'AreaPath' not in query
+
+
+class TestChangedDate:
+    """测试ChangedDate解析"""
+
+    def test_parse_variable_fraction(self):
+        """测试不同小数秒位数和Z时区"""
+        assert parse_changed_date('2024-01-02T00:00:05.1Z') == datetime(2024, 1, 2, 0, 0, 5, 100000, tzinfo=timezone.utc)
+        assert parse_changed_date('2024-01-02T00:00:05.1234567Z') == datetime(2024, 1, 2, 0, 0, 5, 123456,
+                                                                                tzinfo=timezone.utc)
+        assert parse_changed_date('2024-01-02 00:00:05+00:00') == datetime(2024, 1, 2, 0, 0, 5, tzinfo=timezone.utc)
+
+    def test_latest_changed_date_keeps_original_value(self):
+        """测试返回最晚时间对应的原始字符串"""
+        values = ['2024-01-02T00:00:05.1Z', '2024-01-02T00:00:05.12Z', '2024-01-02T00:00:05Z']
+
+        assert latest_changed_date(values) == '2024-01-02T00:00:05.12Z'
+        assert latest_changed_date([]) is None
@@ -449,6 +449,37 @@ class TestGetAreaPaths:
             depth=100
         )
     
+    @patch.dict(os.environ, {
+        "ADO_ORG_URL": "https://dev.azure.com/testorg",
+        "ADO_PAT": "test_pat"
+    })
+    @patch('src.requirement_tracker.tools.get_ado_connection')
+    def test_get_area_paths_under_and_prefix(self, mock_get_ado_connection):
+        """测试按子树和前缀筛选Area"""
+        from src.requirement_tracker.tools import get_area_paths
+
+        def make_node(name, children=None):
+            node = Mock()
+            node.name = name
+            node.id = name
+            node.children = children or []
+            return node
+
+        mock_wit_client = Mock()
+        mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value = mock_wit_client
+        mock_wit_client.get_classification_node.return_value = make_node("Proj", [
+            make_node("Team", [make_node("Backend"), make_node("Frontend")]),
+            make_node("TeamB"),
+        ])
+
+        under = get_area_paths.run(project_name="Filter Project", under="Team")
+        prefix = get_area_paths.run(project_name="Filter Project", prefix="team")
+        both = get_area_paths.run(project_name="Filter Project", under="Team", prefix="team\\f")
+
+        assert [area['path'] for area in under] == ['Team', 'Team\\Backend', 'Team\\Frontend']
+        assert [area['path'] for area in prefix] == ['Team', 'Team\\Backend', 'Team\\Frontend', 'TeamB']
+        assert [area['name'] for area in both] == ['Frontend']
+
     @patch.dict(os.environ, {
         "ADO_ORG_URL": "https://dev.azure.com/testorg",
         "ADO_PAT": "test_pat"
@@ -743,4 +774,42 @@ class TestGetAdoWorkItemsWithArea:
                     project_name="Test Project",
                     work_item_type="Feature",
                     area_path="TestArea"
-                )
\ No newline at end of file
+                )
+
+class TestQueryLocalWorkItems:
+    """测试本地工作项查询工具"""
+
+    @patch.dict(os.environ, {
+        "ADO_ORG_URL": "https://dev.azure.com/testorg",
+        "ADO_PAT": "test_pat"
+    })
+    @patch('src.requirement_tracker.tools.get_ado_connection')
+    def test_read_path_feeds_local_store(self, mock_get_ado_connection):
+        """测试ADO读取结果写入本地存储后可直接查询"""
+        from src.requirement_tracker.tools import get_ado_work_items, query_local_work_items
+        mock_wit_client = Mock()
+        mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value = mock_wit_client
+
+        mock_item_detail = Mock()
+        mock_item_detail.id = 101
+        mock_item_detail.fields = {
+            'System.Title': 'Test Title',
+            'System.WorkItemType': 'Feature',
+            'System.State': 'Active',
+            'System.AreaPath': 'Test Project\\Team',
+            'System.TeamProject': 'Test Project',
+            'System.ChangedDate': '2024-01-01T00:00:00Z'
+        }
+        mock_wit_client.query_by_wiql.return_value = Mock(work_items=[Mock(id=101)])
+        mock_wit_client.get_work_items.return_value = [mock_item_detail]
+
+        get_ado_work_items.run(project_name="Test Project", work_item_type="Feature")
+        result = query_local_work_items.run(project_name="Test Project", state="Active")
+        counts = query_local_work_items.run(group_by="state")
+
+        assert result['total'] == 1
+        assert result['items'][0]['title'] == 'Test Title'
+        assert result['items'][0]['area_path'] == 'Test Project\\Team'
+        assert counts['counts'] == {'Active': 1}
+        requested_fields = mock_wit_client.get_work_items.call_args[1]['fields']
+        assert 'System.ChangedDate' in requested_fields
@@ -0,0 +1,171 @@
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.analysis_cache import (
+    AnalysisCache,
+    cosine_similarity,
+    embed_text,
+    get_cached_analysis,
+    get_prompt_version,
+    make_cache_key,
+    normalize_text,
+)
+
+ANALYSIS = {"summary": "用户登录", "goal": "支持邮箱登录"}
+REQUIREMENT = "系统需要支持用户使用邮箱和密码登录，登录失败三次后锁定账户十分钟，并发送通知邮件给用户。"
+
+
+class FakeClock:
+    """每次调用递增的时钟，用于测试LRU淘汰顺序"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(path=str(tmp_path / "analysis.db"), max_entries=10, clock=FakeClock())
+
+
+class TestKeys:
+    """测试文本规范化和缓存键"""
+
+    def test_normalize_text(self):
+        """测试全角、大小写和空白差异被忽略"""
+        assert normalize_text("  Login\n\n ＡＰＩ  需求 ") == "login api 需求"
+
+    def test_cache_key_scope(self):
+        """测试模型和提示词版本不同时缓存键不同"""
+        key = make_cache_key("Login API", "qwen", "v1")
+        assert key == make_cache_key(" login   api ", "qwen", "v1")
+        assert key != make_cache_key("Login API", "grok", "v1")
+        assert key != make_cache_key("Login API", "qwen", "v2")
+
+    def test_prompt_version_is_stable(self):
+        """测试提示词版本由分析任务提示词计算且稳定"""
+        assert get_prompt_version() == get_prompt_version()
+        assert len(get_prompt_version()) == 12
+
+    def test_embedding_similarity(self):
+        """测试小改动的需求相似度高，无关需求相似度低"""
+        edited = REQUIREMENT.replace("十分钟", "十五分钟")
+        unrelated = "导出月度销售报表为Excel文件，按区域汇总金额。"
+
+        assert cosine_similarity(embed_text(REQUIREMENT), embed_text(edited)) > 0.9
+        assert cosine_similarity(embed_text(REQUIREMENT), embed_text(unrelated)) < 0.5
+        assert cosine_similarity(embed_text(""), embed_text(REQUIREMENT)) == 0.0
+
+
+class TestAnalysisCache:
+    """测试分析结果缓存"""
+
+    def test_exact_hit(self, cache):
+        """测试规范化后相同的文本命中"""
+        cache.put(REQUIREMENT, "qwen", "v1", ANALYSIS)
+
+        assert cache.get(" " + REQUIREMENT + "\n", "qwen", "v1") == ANALYSIS
+        assert cache.get(REQUIREMENT, "grok", "v1") is None
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_find_similar(self, cache):
+        """测试近似匹配只在同一模型和提示词版本中查找"""
+        cache.put(REQUIREMENT, "qwen", "v1", ANALYSIS)
+        edited = REQUIREMENT.replace("三次", "五次")
+
+        score, result = cache.find_similar(edited, "qwen", "v1")
+
+        assert score > 0.9
+        assert result == ANALYSIS
+        assert cache.find_similar(edited, "qwen", "v2") is None
+        assert cache.find_similar("完全无关的报表需求", "qwen", "v1") is None
+        assert cache.get_stats()['near_hits'] == 1
+
+    def test_lru_eviction(self, tmp_path):
+        """测试超出条目上限时淘汰最久未访问的条目"""
+        cache = AnalysisCache(path=str(tmp_path / "analysis.db"), max_entries=2, clock=FakeClock())
+        cache.put("需求一", "qwen", "v1", {"summary": "1"})
+        cache.put("需求二", "qwen", "v1", {"summary": "2"})
+        cache.get("需求一", "qwen", "v1")
+        cache.put("需求三", "qwen", "v1", {"summary": "3"})
+
+        assert cache.get("需求二", "qwen", "v1") is None
+        assert cache.get("需求一", "qwen", "v1") == {"summary": "1"}
+        stats = cache.get_stats()
+        assert stats['entries'] == 2
+        assert stats['evictions'] == 1
+
+    def test_clear(self, cache):
+        """测试清空缓存"""
+        cache.put(REQUIREMENT, "qwen", "v1", ANALYSIS)
+        cache.clear()
+        assert cache.get_stats()['entries'] == 0
+
+
+class TestGetCachedAnalysis:
+    """测试带缓存的需求分析"""
+
+    def test_miss_then_hit(self, cache):
+        """测试首次调用分析并写入缓存，再次提交时不调用分析"""
+        analyze = Mock(return_value=ANALYSIS)
+
+        assert get_cached_analysis(cache, REQUIREMENT, "qwen", analyze, "v1") == ANALYSIS
+        assert get_cached_analysis(cache, REQUIREMENT + " ", "qwen", analyze, "v1") == ANALYSIS
+
+        analyze.assert_called_once_with(REQUIREMENT)
+
+    def test_near_duplicate_seed(self, cache):
+        """测试seed模式把相似需求的结果作为参考交给分析师"""
+        cache.put(REQUIREMENT, "qwen", "v1", ANALYSIS)
+        edited = REQUIREMENT.replace("三次", "五次")
+        analyze = Mock(return_value={"summary": "用户登录（五次锁定）"})
+
+        result = get_cached_analysis(cache, edited, "qwen", analyze, "v1", near_mode="seed")
+
+        assert result == {"summary": "用户登录（五次锁定）"}
+        seeded_input = analyze.call_args.args[0]
+        assert seeded_input.startswith(edited)
+        assert '"summary": "用户登录"' in seeded_input
+        assert cache.get(edited, "qwen", "v1") == result
+
+    def test_near_duplicate_return(self, cache):
+        """测试return模式直接复用相似需求的结果"""
+        cache.put(REQUIREMENT, "qwen", "v1", ANALYSIS)
+        analyze = Mock()
+
+        result = get_cached_analysis(cache, REQUIREMENT.replace("三次", "五次"), "qwen", analyze, "v1",
+                                     near_mode="return")
+
+        assert result == ANALYSIS
+        analyze.assert_not_called()
+
+    def test_near_duplicate_off(self, cache):
+        """测试关闭近似匹配时按原文分析"""
+        cache.put(REQUIREMENT, "qwen", "v1", ANALYSIS)
+        edited = REQUIREMENT.replace("三次", "五次")
+        analyze = Mock(return_value=ANALYSIS)
+
+        get_cached_analysis(cache, edited, "qwen", analyze, "v1", near_mode="off")
+
+        analyze.assert_called_once_with(edited)
+
+    def test_without_cache(self):
+        """测试缓存不可用时直接分析"""
+        analyze = Mock(return_value=ANALYSIS)
+        assert get_cached_analysis(None, REQUIREMENT, "qwen", analyze) == ANALYSIS
+        analyze.assert_called_once_with(REQUIREMENT)
+
+    def test_analyze_error_not_cached(self, cache):
+        """测试分析失败时不写入缓存"""
+        analyze = Mock(side_effect=ValueError("分析结果不是有效的JSON"))
+
+        with pytest.raises(ValueError):
+            get_cached_analysis(cache, REQUIREMENT, "qwen", analyze, "v1")
+
+        assert cache.get_stats()['entries'] == 0
@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from src.requirement_tracker import async_tools
+from src.requirement_tracker.async_tools import (
+    call_tool,
+    create_ado_feature_async,
+    gather_tool_calls,
+    get_confluence_page_content_async,
+    run_tool_calls
+)
+
+
+class FakeTool:
+    """模拟@tool对象，func为同步函数"""
+
+    def __init__(self, func):
+        self.func = func
+
+
+class TestCallTool:
+    """测试异步工具调用"""
+
+    def test_runs_off_event_loop_thread(self):
+        """测试工具函数在线程池中执行"""
+        tool = FakeTool(lambda value: (value, threading.current_thread().name))
+
+        value, thread_name = asyncio.run(call_tool(tool, value=1))
+
+        assert value == 1
+        assert thread_name.startswith("req-agent-io")
+
+    def test_calls_run_concurrently(self):
+        """测试多个阻塞调用并发执行"""
+        tool = FakeTool(lambda delay: time.sleep(delay) or delay)
+        calls = [(tool, {'delay': 0.2}) for _ in range(4)]
+
+        start = time.perf_counter()
+        results = run_tool_calls(calls)
+        elapsed = time.perf_counter() - start
+
+        assert results == [0.2] * 4
+        assert elapsed < 0.6
+
+    def test_failed_call_returns_exception(self):
+        """测试单个调用失败不影响其他调用"""
+        def fail():
+            raise Exception("boom")
+
+        results = asyncio.run(gather_tool_calls([(FakeTool(fail), {}), (FakeTool(lambda: 'ok'), {})]))
+
+        assert isinstance(results[0], Exception)
+        assert results[1] == 'ok'
+
+    def test_failed_call_raises_without_return_exceptions(self):
+        """测试return_exceptions为False时抛出异常"""
+        def fail():
+            raise Exception("boom")
+
+        with pytest.raises(Exception, match="boom"):
+            run_tool_calls([(FakeTool(fail), {})], return_exceptions=False)
+
+    def test_context_passed_to_worker_thread(self):
+        """测试工具函数能读取调用方设置的contextvars（如幂等键）"""
+        var = contextvars.ContextVar("test_scope", default=None)
+        tool = FakeTool(lambda: var.get())
+
+        token = var.set("run-key")
+        try:
+            results = run_tool_calls([(tool, {}), (tool, {})])
+        finally:
+            var.reset(token)
+
+        assert results == ["run-key", "run-key"]
+
+    def test_run_tool_calls_inside_running_loop(self):
+        """测试在已有运行中的事件循环的线程里调用（如Jupyter）"""
+        tool = FakeTool(lambda value: value * 2)
+
+        async def host():
+            return run_tool_calls([(tool, {'value': 1}), (tool, {'value': 2})])
+
+        assert asyncio.run(host()) == [2, 4]
+
+
+class TestAsyncWrappers:
+    """测试各工具的异步包装"""
+
+    def test_wrapper_passes_arguments(self):
+        """测试异步包装把参数传给对应工具"""
+        async def fake_call_tool(tool, **kwargs):
+            return tool, kwargs
+
+        with patch.object(async_tools, 'call_tool', fake_call_tool):
+            tool, kwargs = asyncio.run(create_ado_feature_async("Summary", "Desc"))
+            page_tool, page_kwargs = asyncio.run(get_confluence_page_content_async("123"))
+
+        assert tool is async_tools.create_ado_feature
+        assert kwargs == {'summary': 'Summary', 'description': 'Desc',
+                          'problem_statement': '', 'acceptance_criteria': ''}
+        assert page_tool is async_tools.get_confluence_page_content
+        assert page_kwargs == {'page_id': '123'}
+
+    def test_real_tool_func_is_called(self):
+        """测试调用真实工具对象的func"""
+        with patch('src.requirement_tracker.tools.get_ado_connection', side_effect=Exception("no connection")):
+            with pytest.raises(Exception, match="no connection"):
+                asyncio.run(async_tools.get_ado_projects_async())
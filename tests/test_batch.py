@@ -0,0 +1,212 @@
+import json
+import threading
+import pytest
+
+from src.requirement_tracker.batch import (
+    RateLimiter,
+    collect_artifacts,
+    load_completed_ids,
+    load_requirements,
+    parse_rate_limits,
+    process_requirement,
+    run_batch,
+)
+from src.requirement_tracker.idempotency import (
+    KIND_ADO_FEATURE,
+    KIND_CONFLUENCE_PAGE,
+    create_once,
+    get_idempotency_scope,
+    idempotency_scope,
+)
+
+
+class FakeClock:
+    """可控的时钟，sleep会推进时间"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def write_jsonl(path, rows):
+    path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n", encoding="utf-8")
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def publish(text, work_item_id, page_id=None):
+    """在当前幂等范围内记录创建的工作项和页面，模拟一次发布"""
+    create_once(KIND_ADO_FEATURE, text, lambda: work_item_id)
+    if page_id is not None:
+        create_once(KIND_CONFLUENCE_PAGE, text, lambda: page_id)
+
+
+class TestLoadRequirements:
+    """测试读取需求记录"""
+
+    def test_request_records(self, tmp_path):
+        """测试 request_id + title/body 格式（与requests.jsonl一致）"""
+        path = tmp_path / "requests.jsonl"
+        write_jsonl(path, [
+            {"request_id": "user-001", "title": "标题", "body": "正文"},
+            {"id": 7, "input_text": "直接输入"},
+        ])
+        path.write_text(path.read_text(encoding="utf-8") + "\n{\"text\": \"无ID\"}\n", encoding="utf-8")
+
+        records = load_requirements(str(path))
+
+        assert records == [
+            {"id": "user-001", "input_text": "标题\n\n正文"},
+            {"id": "7", "input_text": "直接输入"},
+            {"id": "4", "input_text": "无ID"},
+        ]
+
+    def test_invalid_line(self, tmp_path):
+        """测试无效JSON和缺少文本时报告行号"""
+        path = tmp_path / "bad.jsonl"
+        path.write_text("{\"id\": 1, \"input_text\": \"a\"}\nnot json\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="第 2 行"):
+            load_requirements(str(path))
+
+        write_jsonl(path, [{"id": 1}])
+        with pytest.raises(ValueError, match="缺少需求文本"):
+            load_requirements(str(path))
+
+
+class TestCollectArtifacts:
+    """测试从幂等台账读取运行创建的工作项和页面"""
+
+    def test_collect_from_ledger(self, monkeypatch):
+        """测试按幂等范围读取工作项ID和页面链接"""
+        monkeypatch.setenv("CONFLUENCE_URL", "https://wiki.local")
+        with idempotency_scope("run-1"):
+            publish("需求", "12345", "98765")
+        with idempotency_scope("run-2"):
+            publish("其他需求", "1")
+
+        assert collect_artifacts("run-1") == {
+            "work_item_ids": [12345],
+            "page_ids": ["98765"],
+            "page_links": ["https://wiki.local/pages/viewpage.action?pageId=98765"],
+        }
+
+    def test_no_artifacts(self):
+        """测试没有产物时返回空列表"""
+        assert collect_artifacts("missing") == {"work_item_ids": [], "page_ids": [], "page_links": []}
+
+
+class TestRateLimiter:
+    """测试按模型的速率限制"""
+
+    def test_spacing_per_key(self):
+        """测试同一模型的请求按间隔排队，不同模型互不影响"""
+        clock = FakeClock()
+        limiter = RateLimiter(default_rpm=60, limits={"grok": 30}, clock=clock, sleep=clock.sleep)
+
+        assert limiter.acquire("qwen") == 0
+        assert limiter.acquire("qwen") == pytest.approx(1.0)
+        assert limiter.acquire("grok") == 0
+        assert limiter.acquire("grok") == pytest.approx(2.0)  # 每分钟30次，间隔2秒
+
+    def test_unlimited(self):
+        """测试rpm为0时不限制"""
+        clock = FakeClock()
+        limiter = RateLimiter(default_rpm=0, clock=clock, sleep=clock.sleep)
+        for _ in range(5):
+            assert limiter.acquire("qwen") == 0
+        assert clock.sleeps == []
+
+    def test_parse_rate_limits(self):
+        """测试解析按模型的速率配置"""
+        assert parse_rate_limits('{"qwen": 60, "grok": "10"}') == {"qwen": 60.0, "grok": 10.0}
+        assert parse_rate_limits("") == {}
+        assert parse_rate_limits("not json") == {}
+
+
+class TestRunBatch:
+    """测试批处理"""
+
+    def test_process_requirement_error(self):
+        """测试run_crew返回错误或抛出异常时记录失败"""
+        result = process_requirement({"id": "1", "input_text": "x"}, runner=lambda text, model: "Error: 超时")
+        assert result["status"] == "error"
+        assert result["error"] == "超时"
+
+        def raise_error(text, model):
+            raise RuntimeError("崩溃")
+
+        result = process_requirement({"id": "2", "input_text": "x"}, runner=raise_error)
+        assert result["status"] == "error"
+        assert result["error"] == "崩溃"
+
+    def test_output_text_not_parsed(self):
+        """测试输出中提到的编号不当作工作项，没有创建任何产物时记录失败"""
+        result = process_requirement({"id": "1", "input_text": "x"},
+                                     runner=lambda text, model: "Feature 3 对应 work item #12")
+
+        assert result["status"] == "error"
+        assert result["work_item_ids"] == [] and result["page_ids"] == []
+        assert "没有创建工作项或页面" in result["error"]
+
+    def test_runs_in_own_scope(self):
+        """测试每条需求在自己的幂等范围内运行，结果只包含本条创建的产物"""
+        scopes = []
+
+        def runner(text, model):
+            scopes.append(get_idempotency_scope())
+            publish(text, "7", "70")
+            return "完成"
+
+        first = process_requirement({"id": "1", "input_text": "需求一"}, runner=runner)
+        second = process_requirement({"id": "2", "input_text": "需求二"}, runner=runner)
+
+        assert scopes[0] != scopes[1]
+        assert first["status"] == "ok" and first["work_item_ids"] == [7] and first["page_ids"] == ["70"]
+        assert second["work_item_ids"] == [7]
+
+    def test_results_and_resume(self, tmp_path):
+        """测试写入结果，重新运行时跳过已成功的记录、重试失败的记录"""
+        output_path = tmp_path / "out" / "results.jsonl"
+        records = [{"id": str(i), "input_text": f"需求{i}"} for i in range(4)]
+        calls = []
+        lock = threading.Lock()
+
+        def runner(text, model):
+            with lock:
+                calls.append(text)
+            if text == "需求2" and len(calls) <= 4:
+                return "Error: 发布失败"
+            publish(text, str(100 + int(text[-1])))
+            return "完成"
+
+        limiter = RateLimiter(default_rpm=0)
+        summary = run_batch(records, str(output_path), workers=3, rate_limiter=limiter, runner=runner)
+
+        assert summary == {"total": 4, "skipped": 0, "succeeded": 3, "failed": 1}
+        results = {row["id"]: row for row in read_jsonl(output_path)}
+        assert results["0"]["work_item_ids"] == [100]
+        assert results["2"]["status"] == "error"
+        assert load_completed_ids(str(output_path)) == {"0", "1", "3"}
+
+        summary = run_batch(records, str(output_path), workers=3, rate_limiter=limiter, runner=runner)
+
+        assert summary == {"total": 4, "skipped": 3, "succeeded": 1, "failed": 0}
+        assert calls.count("需求2") == 2
+        assert len(calls) == 5
+        assert load_completed_ids(str(output_path)) == {"0", "1", "2", "3"}
+
+    def test_truncated_checkpoint_line(self, tmp_path):
+        """测试中断留下的不完整行不影响续跑"""
+        output_path = tmp_path / "results.jsonl"
+        output_path.write_text('{"id": "0", "status": "ok"}\n{"id": "1", "sta', encoding="utf-8")
+
+        assert load_completed_ids(str(output_path)) == {"0"}
@@ -0,0 +1,216 @@
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.confluence_pages import (
+    LazyPageTree,
+    build_page_tree,
+    get_child_pages,
+    get_root_pages,
+    iter_space_page_chunks,
+    iter_space_pages
+)
+
+
+class CursorConfluence:
+    """模拟支持 _links.next 游标的Confluence客户端，服务端单次最多返回server_cap个页面"""
+
+    def __init__(self, total, server_cap=25):
+        self.pages = [{'id': str(i), 'title': f'Page {i}'} for i in range(total)]
+        self.server_cap = server_cap
+        self.calls = []
+
+    def get_all_pages_from_space_raw(self, space, start=0, limit=50, expand=None):
+        self.calls.append((start, limit))
+        size = min(limit, self.server_cap)
+        results = self.pages[start:start + size]
+        links = {}
+        if start + size < len(self.pages):
+            links['next'] = f'/rest/api/content?spaceKey={space}&limit={limit}&start={start + size}'
+        return {'results': results, 'start': start, 'limit': size, 'size': len(results), '_links': links}
+
+
+class TestIterSpacePageChunks:
+    """测试Confluence页面分页生成器"""
+
+    def test_follows_next_cursor_beyond_server_cap(self):
+        """测试跟随_links.next获取全部页面，不会被服务端单次上限截断"""
+        confluence = CursorConfluence(total=120, server_cap=25)
+
+        chunks = list(iter_space_page_chunks(confluence, 'TEST', chunk_size=50))
+
+        assert sum(len(chunk) for chunk in chunks) == 120
+        assert [start for start, _ in confluence.calls] == [0, 25, 50, 75, 100]
+
+    def test_max_results_stops_early(self):
+        """测试max_results提前终止且不多发请求"""
+        confluence = CursorConfluence(total=1000, server_cap=100)
+
+        pages = list(iter_space_pages(confluence, 'TEST', chunk_size=40, max_results=90))
+
+        assert len(pages) == 90
+        assert confluence.calls == [(0, 40), (40, 40), (80, 10)]
+
+    def test_consumer_can_stop_iteration(self):
+        """测试调用方中途停止迭代时不再请求后续块"""
+        confluence = CursorConfluence(total=500, server_cap=100)
+
+        generator = iter_space_page_chunks(confluence, 'TEST', chunk_size=100)
+        first = next(generator)
+        generator.close()
+
+        assert len(first) == 100
+        assert len(confluence.calls) == 1
+
+    def test_list_response_without_cursor(self):
+        """测试旧版客户端返回列表时按返回数量判断结束"""
+        confluence = Mock()
+        confluence.get_all_pages_from_space.side_effect = [
+            [{'id': str(i)} for i in range(10)],
+            [{'id': str(i)} for i in range(10, 13)],
+        ]
+
+        pages = list(iter_space_pages(confluence, 'TEST', chunk_size=10))
+
+        assert [page['id'] for page in pages] == [str(i) for i in range(13)]
+        assert confluence.get_all_pages_from_space.call_count == 2
+
+    @pytest.mark.parametrize("response", [{}, [], None, {'results': []}])
+    def test_empty_response(self, response):
+        """测试空响应"""
+        confluence = Mock()
+        confluence.get_all_pages_from_space.return_value = response
+
+        assert list(iter_space_pages(confluence, 'TEST')) == []
+
+
+def make_page(page_id, title, parent_id=None):
+    """创建规范化后的页面数据"""
+    return {'id': page_id, 'title': title, 'parent_id': parent_id}
+
+
+class TestBuildPageTree:
+    """测试页面树构建"""
+
+    def test_nested_tree_with_sorted_siblings(self):
+        """测试构建嵌套树且兄弟节点按标题排序"""
+        pages = [
+            make_page('3', 'beta', '1'),
+            make_page('2', 'Alpha', '1'),
+            make_page('1', 'Root'),
+            make_page('4', 'Leaf', '3'),
+        ]
+
+        tree = build_page_tree(pages)
+
+        assert tree == [{
+            'label': 'Root', 'value': '1',
+            'children': [
+                {'label': 'Alpha', 'value': '2'},
+                {'label': 'beta', 'value': '3', 'children': [{'label': 'Leaf', 'value': '4'}]},
+            ]
+        }]
+
+    def test_order_independent_of_input_order(self):
+        """测试输出与输入顺序无关"""
+        pages = [make_page(str(i), f'Page {i % 3}', '0' if i else None) for i in range(10)]
+
+        assert build_page_tree(pages) == build_page_tree(list(reversed(pages)))
+
+    def test_missing_parent_becomes_root(self):
+        """测试父页面不在列表中的页面作为根节点"""
+        pages = [make_page('2', 'B', 'missing'), make_page('1', 'A')]
+
+        assert [node['value'] for node in build_page_tree(pages)] == ['1', '2']
+
+    def test_deep_hierarchy_without_recursion_limit(self):
+        """测试超过递归深度限制的层级"""
+        depth = 5000
+        pages = [make_page(str(i), f'Page {i}', str(i - 1) if i else None) for i in range(depth)]
+
+        node = build_page_tree(pages)[0]
+        levels = 1
+        while 'children' in node:
+            node = node['children'][0]
+            levels += 1
+
+        assert levels == depth
+
+    def test_cycle_is_broken(self):
+        """测试父子关系成环时不丢失页面"""
+        pages = [make_page('1', 'A', '2'), make_page('2', 'B', '1'), make_page('3', 'C')]
+
+        tree = build_page_tree(pages)
+
+        assert [node['value'] for node in tree] == ['3', '1']
+        assert tree[1]['children'] == [{'label': 'B', 'value': '2'}]
+
+    def test_empty(self):
+        """测试空页面列表"""
+        assert build_page_tree([]) == []
+
+
+class TestLazyPageLoading:
+    """测试按需加载页面树"""
+
+    def test_get_root_pages_uses_root_depth(self):
+        """测试只请求根页面"""
+        confluence = Mock()
+        confluence.get_space_content.return_value = {'results': [{'id': '1', 'title': 'Home'}], '_links': {}}
+
+        pages = get_root_pages(confluence, 'TEST')
+
+        assert pages == [{'id': '1', 'title': 'Home'}]
+        call_kwargs = confluence.get_space_content.call_args[1]
+        assert call_kwargs['depth'] == 'root'
+        assert call_kwargs['content_type'] == 'page'
+
+    def test_get_child_pages_paginates(self):
+        """测试子页面分块获取"""
+        confluence = Mock()
+        confluence.get_page_child_by_type.side_effect = [
+            [{'id': str(i)} for i in range(5)],
+            [{'id': '5'}],
+        ]
+
+        pages = get_child_pages(confluence, '1', chunk_size=5)
+
+        assert len(pages) == 6
+        assert confluence.get_page_child_by_type.call_args_list[1][1]['start'] == 5
+
+    def test_initial_nodes_only_load_roots(self):
+        """测试初始只加载根页面，未加载节点带占位子节点"""
+        load_children = Mock(return_value=[])
+        tree = LazyPageTree(lambda: [{'id': '2', 'title': 'B'}, {'id': '1', 'title': 'A'}], load_children)
+
+        nodes = tree.to_nodes()
+
+        assert [node['value'] for node in nodes] == ['1', '2']
+        assert LazyPageTree.is_placeholder(nodes[0]['children'][0]['value'])
+        load_children.assert_not_called()
+
+    def test_expand_loads_and_caches_children(self):
+        """测试展开节点时加载子页面且只加载一次"""
+        children = {'1': [{'id': '11', 'title': 'Child'}], '11': []}
+        load_children = Mock(side_effect=lambda page_id: children[page_id])
+        tree = LazyPageTree(lambda: [{'id': '1', 'title': 'A'}], load_children)
+        tree.to_nodes()
+
+        assert tree.expand(['1', '1::loading']) == ['1']
+        assert tree.expand(['1']) == []
+        assert tree.expand(['1', '11']) == ['11']
+
+        nodes = tree.to_nodes()
+        assert nodes == [{'label': 'A', 'value': '1', 'children': [{'label': 'Child', 'value': '11'}]}]
+        assert load_children.call_count == 2
+
+    def test_invalidate_reloads_roots(self):
+        """测试刷新后重新加载根页面"""
+        load_roots = Mock(return_value=[{'id': '1', 'title': 'A'}])
+        tree = LazyPageTree(load_roots, Mock(return_value=[]))
+        tree.to_nodes()
+        tree.to_nodes()
+
+        tree.invalidate()
+        tree.to_nodes()
+
+        assert load_roots.call_count == 2
@@ -0,0 +1,181 @@
+import threading
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.connection_pool import AdoConnectionRegistry, ConfluenceSessionPool
+
+
+class FakeClock:
+    """可控的时钟，用于测试TTL"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_connection():
+    """创建模拟连接，get_client每次返回新的客户端"""
+    connection = Mock()
+    connection.get_client.side_effect = lambda client_type: Mock(config=Mock(keep_alive=False))
+    return connection
+
+
+class TestAdoConnectionRegistry:
+    """测试ADO连接注册表"""
+
+    def test_connection_reused_for_same_credentials(self):
+        """测试相同凭证复用连接"""
+        registry = AdoConnectionRegistry(ttl=60)
+        factory = Mock(side_effect=make_connection)
+
+        first = registry.get_connection("https://dev.azure.com/org", "pat", factory)
+        second = registry.get_connection("https://dev.azure.com/org", "pat", factory)
+
+        assert first is second
+        factory.assert_called_once()
+        stats = registry.get_stats()
+        assert stats['connection_hits'] == 1
+        assert stats['connection_misses'] == 1
+        assert stats['connections'] == 1
+
+    def test_credential_change_invalidates_old_connection(self):
+        """测试更换PAT后旧连接失效"""
+        registry = AdoConnectionRegistry(ttl=60)
+        factory = Mock(side_effect=make_connection)
+
+        first = registry.get_connection("https://dev.azure.com/org", "old_pat", factory)
+        second = registry.get_connection("https://dev.azure.com/org", "new_pat", factory)
+
+        assert first is not second
+        stats = registry.get_stats()
+        assert stats['connections'] == 1
+        assert stats['invalidations'] == 1
+
+    def test_connection_expires_after_ttl(self):
+        """测试连接超过TTL后重建"""
+        clock = FakeClock()
+        registry = AdoConnectionRegistry(ttl=10, clock=clock)
+        factory = Mock(side_effect=make_connection)
+
+        first = registry.get_connection("https://dev.azure.com/org", "pat", factory)
+        clock.now = 11
+        second = registry.get_connection("https://dev.azure.com/org", "pat", factory)
+
+        assert first is not second
+        assert factory.call_count == 2
+
+    def test_client_resolved_once(self):
+        """测试客户端只解析一次并开启keep-alive"""
+        registry = AdoConnectionRegistry(ttl=60)
+        connection = make_connection()
+        resolve = connection.get_client
+        registry.get_connection("https://dev.azure.com/org", "pat", lambda: connection)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(connection.get_client("wit")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert resolve.call_count == 1
+        assert all(client is results[0] for client in results)
+        assert results[0].config.keep_alive is True
+        stats = registry.get_stats()
+        assert stats['client_misses'] == 1
+        assert stats['client_hits'] == 7
+
+    def test_invalidate_all(self):
+        """测试手动清空注册表"""
+        registry = AdoConnectionRegistry(ttl=60)
+        registry.get_connection("https://dev.azure.com/a", "pat", make_connection)
+        registry.get_connection("https://dev.azure.com/b", "pat", make_connection)
+
+        registry.invalidate()
+
+        assert registry.get_stats()['connections'] == 0
+
+    def test_factory_error_propagates(self):
+        """测试创建连接失败时抛出异常且不缓存"""
+        registry = AdoConnectionRegistry(ttl=60)
+        factory = Mock(side_effect=Exception("boom"))
+
+        with pytest.raises(Exception, match="boom"):
+            registry.get_connection("https://dev.azure.com/org", "pat", factory)
+
+        assert registry.get_stats()['connections'] == 0
+
+
+class TestConfluenceSessionPool:
+    """测试Confluence会话池"""
+
+    @pytest.fixture(autouse=True)
+    def require_requests(self):
+        pytest.importorskip("requests")
+
+    def test_session_reused_for_same_credentials(self):
+        """测试相同凭证复用会话"""
+        pool = ConfluenceSessionPool(pool_size=4)
+
+        first = pool.get_session("https://test.atlassian.net", "user", "token")
+        second = pool.get_session("https://test.atlassian.net", "user", "token")
+
+        assert first is second
+        stats = pool.get_stats()
+        assert stats['session_hits'] == 1
+        assert stats['session_misses'] == 1
+        assert stats['pool_size'] == 4
+
+    def test_token_change_closes_old_session(self):
+        """测试更换Token后关闭旧会话"""
+        pool = ConfluenceSessionPool()
+
+        first = pool.get_session("https://test.atlassian.net", "user", "old")
+        second = pool.get_session("https://test.atlassian.net", "user", "new")
+
+        assert first is not second
+        assert pool.get_stats()['sessions'] == 1
+        assert pool.get_stats()['invalidations'] == 1
+
+    def test_adapter_configuration(self):
+        """测试适配器的连接池大小和重试策略"""
+        pool = ConfluenceSessionPool(pool_size=3, max_retries=5, backoff_factor=1.0)
+
+        session = pool.get_session("https://test.atlassian.net", "user", "token")
+        adapter = session.get_adapter("https://test.atlassian.net/wiki")
+
+        assert adapter._pool_maxsize == 3
+        assert adapter.max_retries.total == 5
+        assert 429 in adapter.max_retries.status_forcelist
+        assert adapter.max_retries.respect_retry_after_header is True
+
+    def test_get_client_binds_shared_session(self):
+        """测试构建的Confluence客户端使用共享会话"""
+        pool = ConfluenceSessionPool()
+        confluence_class = Mock()
+
+        pool.get_client(confluence_class, "https://test.atlassian.net", "user", "token", cloud=True)
+        pool.get_client(confluence_class, "https://test.atlassian.net", "user", "token", cloud=True)
+
+        first_session = confluence_class.call_args_list[0][1]['session']
+        second_session = confluence_class.call_args_list[1][1]['session']
+        assert first_session is second_session
+        assert confluence_class.call_args[1]['cloud'] is True
+        assert confluence_class.call_args[1]['password'] == "token"
+
+    def test_close_all(self):
+        """测试关闭全部会话"""
+        pool = ConfluenceSessionPool()
+        pool.get_session("https://a.atlassian.net", "user", "token")
+        pool.get_session("https://b.atlassian.net", "user", "token")
+
+        pool.close_all()
+
+        stats = pool.get_stats()
+        assert stats['sessions'] == 0
+        assert stats['utilization'] == 0.0
@@ -213,4 +213,198 @@ def test_load_custom_llms_with_legacy_format(mock_env):
     }):
         result = load_custom_llms()
         assert 'test' in result
-        assert result['test']['model'] == 'test-model'
\ No newline at end of file
+        assert result['test']['model'] == 'test-model'
+
+def make_mock_crew(result="Test result"):
+    """创建kickoff返回固定结果的模拟Crew"""
+    crew = MagicMock()
+    crew.kickoff.return_value = result
+    return crew
+
+@pytest.fixture
+def mock_builders():
+    """模拟LLM、Agent、Task和Crew的创建，记录每次运行创建的对象"""
+    with patch('src.requirement_tracker.crew.get_llm', side_effect=lambda *args: MagicMock()) as mock_get_llm, \
+            patch('src.requirement_tracker.crew.create_analyzer', side_effect=lambda llm: MagicMock(llm=llm)), \
+            patch('src.requirement_tracker.crew.create_publisher', side_effect=lambda llm: MagicMock(llm=llm)), \
+            patch('src.requirement_tracker.crew.create_task1_instance', side_effect=lambda *args: MagicMock()), \
+            patch('src.requirement_tracker.crew.create_task2_instance', side_effect=lambda *args: MagicMock()), \
+            patch('src.requirement_tracker.crew.Crew', side_effect=lambda **kwargs: MagicMock(
+                kickoff=MagicMock(return_value="Test result"), **kwargs)) as mock_crew_class:
+        yield mock_get_llm, mock_crew_class
+
+def test_run_crew_reuses_llm_but_builds_new_crew(mock_env, mock_builders):
+    """测试连续运行复用LLM，Crew、Agent和Task每次重新创建"""
+    from src.requirement_tracker.crew import llm_cache
+    mock_get_llm, mock_crew_class = mock_builders
+
+    assert run_crew("需求一", "qwen", mock_env) == "Test result"
+    assert run_crew("需求二", "qwen", mock_env) == "Test result"
+
+    mock_get_llm.assert_called_once_with("qwen", mock_env)
+    assert mock_crew_class.call_count == 2
+    first, second = (call.kwargs for call in mock_crew_class.call_args_list)
+    assert first['agents'][0] is not second['agents'][0]
+    assert first['tasks'][0] is not second['tasks'][0]
+    assert first['agents'][0].llm is second['agents'][0].llm
+    stats = llm_cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+def test_llm_cache_keyed_by_model_and_credentials(mock_env, mock_builders):
+    """测试不同模型和不同凭据使用不同的LLM，交替使用时不会互相淘汰"""
+    mock_get_llm, _ = mock_builders
+    other_credentials = dict(mock_env, DASHSCOPE_API_KEY='new_key')
+
+    run_crew("需求", "qwen", mock_env)
+    run_crew("需求", "grok", mock_env)
+    run_crew("需求", "qwen", other_credentials)
+    run_crew("需求", "qwen", mock_env)
+    run_crew("需求", "qwen", other_credentials)
+
+    assert mock_get_llm.call_count == 3
+    assert mock_get_llm.call_args_list[2].args == ("qwen", other_credentials)
+
+def test_config_fingerprint_hides_credentials(mock_env):
+    """测试配置指纹随凭据变化，且不包含明文凭据"""
+    from src.requirement_tracker.crew import get_config_fingerprint
+
+    fingerprint = get_config_fingerprint(mock_env)
+
+    assert 'test_qwen_key' not in fingerprint
+    assert fingerprint == get_config_fingerprint(dict(mock_env))
+    assert fingerprint != get_config_fingerprint(dict(mock_env, DASHSCOPE_API_KEY='new_key'))
+
+def test_llm_cache_invalidated_when_env_file_changes(tmp_path, mock_builders):
+    """测试.env文件修改后重新创建LLM"""
+    mock_get_llm, _ = mock_builders
+    env_path = tmp_path / ".env"
+    env_path.write_text('LLM_CONFIG=[]\n', encoding='utf-8')
+
+    with patch('src.requirement_tracker.crew.ENV_PATH', env_path):
+        run_crew("需求", "qwen")
+        run_crew("需求", "qwen")
+        env_path.write_text('LLM_CONFIG=[{"key": "qwen"}]\n', encoding='utf-8')
+        run_crew("需求", "qwen")
+
+    assert mock_get_llm.call_count == 2
+
+def test_llm_cache_evicts_least_recently_used(mock_env):
+    """测试超过上限时淘汰最近最少使用的LLM"""
+    from src.requirement_tracker.crew import LLMCache
+    cache = LLMCache(max_entries=2)
+    with patch('src.requirement_tracker.crew.get_llm', side_effect=lambda *args: MagicMock()) as mock_get_llm:
+        qwen = cache.get("qwen", mock_env)
+        cache.get("grok", mock_env)
+        assert cache.get("qwen", mock_env) is qwen
+        cache.get("custom", mock_env)
+        cache.get("grok", mock_env)
+
+    assert mock_get_llm.call_count == 4
+    assert cache.get_stats()['entries'] == 2
+
+def test_failed_run_does_not_affect_next_run(mock_env):
+    """测试运行出错后下一次运行使用新的Crew"""
+    failing_crew = make_mock_crew()
+    failing_crew.kickoff.side_effect = Exception("LLM超时")
+    healthy_crew = make_mock_crew()
+    with patch('src.requirement_tracker.crew.create_crew', side_effect=[failing_crew, healthy_crew]):
+        assert run_crew("需求", "qwen", mock_env).startswith("Error: LLM超时")
+        assert run_crew("需求", "qwen", mock_env) == "Test result"
+
+    healthy_crew.kickoff.assert_called_once()
+
+def test_run_crew_direct_publish(mock_env):
+    """测试direct模式只运行分析任务，发布在代码中完成"""
+    analysis_crew = make_mock_crew('{"summary": "登录", "goal": "支持登录"}')
+    publish_result = {"work_item_id": "1", "work_item_link": "ado/1", "page_id": "2",
+                      "page_title": "BR 1 登录", "page_link": "wiki?pageId=2"}
+    with patch('src.requirement_tracker.crew.create_analysis_crew', return_value=analysis_crew) as mock_create_analysis, \
+            patch('src.requirement_tracker.crew.create_crew') as mock_create_crew, \
+            patch('src.requirement_tracker.crew.publish_requirement', return_value=publish_result) as mock_publish:
+        result = run_crew("需求", "qwen", mock_env, publish_mode="direct")
+
+    mock_create_analysis.assert_called_once_with("qwen", mock_env)
+    mock_create_crew.assert_not_called()
+    analysis, formatter = mock_publish.call_args.args
+    assert analysis["summary"] == "登录"
+    assert formatter is None
+    assert "工作项 ID: 1" in result
+    assert "pageId=2" in result
+
+def test_run_crew_direct_publish_invalid_analysis(mock_env):
+    """测试direct模式下分析结果无法解析时返回错误"""
+    with patch('src.requirement_tracker.crew.create_analysis_crew', return_value=make_mock_crew("不是JSON")), \
+            patch('src.requirement_tracker.crew.publish_requirement') as mock_publish:
+        result = run_crew("需求", "qwen", mock_env, publish_mode="direct")
+
+    assert result.startswith("Error:")
+    mock_publish.assert_not_called()
+
+def test_run_crew_direct_publish_reuses_cached_analysis(mock_env):
+    """测试direct模式下重复提交的需求不再调用分析师"""
+    analysis_crew = make_mock_crew('{"summary": "登录", "goal": "支持登录"}')
+    publish_result = {"work_item_id": "1", "work_item_link": "ado/1", "page_id": "2",
+                      "page_title": "BR 1 登录", "page_link": "wiki?pageId=2"}
+    with patch('src.requirement_tracker.crew.create_analysis_crew', return_value=analysis_crew), \
+            patch('src.requirement_tracker.crew.publish_requirement', return_value=publish_result) as mock_publish:
+        run_crew("需要登录功能", "qwen", mock_env, publish_mode="direct")
+        run_crew("需要登录功能 ", "qwen", mock_env, publish_mode="direct")
+
+    analysis_crew.kickoff.assert_called_once()
+    assert mock_publish.call_count == 2
+
+def make_agent_crew(analysis_json, result="工作项 ID: 1", error=None):
+    """创建分析任务已有输出的模拟Crew，error不为None时发布任务失败"""
+    crew = make_mock_crew(result)
+    crew.tasks = [MagicMock(output=MagicMock(raw=analysis_json)), MagicMock()]
+    if error is not None:
+        crew.kickoff.side_effect = error
+    return crew
+
+def test_agent_mode_reuses_cached_analysis(mock_env):
+    """测试默认agent模式下重复的需求只运行发布任务，不再调用分析LLM"""
+    full_crew = make_agent_crew('{"summary": "登录", "goal": "支持登录"}')
+    publish_crew = make_mock_crew("工作项 ID: 2")
+    with patch('src.requirement_tracker.crew.create_crew', return_value=full_crew) as mock_create_crew, \
+            patch('src.requirement_tracker.crew.create_publish_crew', return_value=publish_crew) as mock_publish:
+        assert run_crew("用户需要登录", "qwen", mock_env) == "工作项 ID: 1"
+        assert run_crew("用户需要登录", "qwen", mock_env) == "工作项 ID: 2"
+
+    mock_create_crew.assert_called_once_with("qwen", mock_env)
+    mock_publish.assert_called_once_with("qwen", mock_env)
+    inputs = publish_crew.kickoff.call_args.kwargs['inputs']
+    assert json.loads(inputs['analysis_json'])['summary'] == "登录"
+
+def test_agent_mode_caches_analysis_when_publish_fails(mock_env):
+    """测试发布任务失败时已完成的分析结果仍写入缓存，重试不再重新分析"""
+    failing_crew = make_agent_crew('{"summary": "登录"}', error=Exception("Confluence 503"))
+    publish_crew = make_mock_crew("工作项 ID: 1")
+    with patch('src.requirement_tracker.crew.create_crew', return_value=failing_crew) as mock_create_crew, \
+            patch('src.requirement_tracker.crew.create_publish_crew', return_value=publish_crew):
+        assert run_crew("用户需要登录", "qwen", mock_env).startswith("Error: Confluence 503")
+        assert run_crew("用户需要登录", "qwen", mock_env) == "工作项 ID: 1"
+
+    mock_create_crew.assert_called_once()
+
+def test_agent_mode_unparseable_analysis_not_cached(mock_env):
+    """测试分析输出不是有效的JSON时不写入缓存"""
+    crews = [make_agent_crew("不是JSON"), make_agent_crew("不是JSON")]
+    with patch('src.requirement_tracker.crew.create_crew', side_effect=crews) as mock_create_crew, \
+            patch('src.requirement_tracker.crew.create_publish_crew') as mock_publish:
+        run_crew("用户需要登录", "qwen", mock_env)
+        run_crew("用户需要登录", "qwen", mock_env)
+
+    assert mock_create_crew.call_count == 2
+    mock_publish.assert_not_called()
+
+def test_create_publish_crew(mock_env):
+    """测试只包含发布任务的Crew把分析JSON放在任务描述中"""
+    from src.requirement_tracker.crew import create_publish_crew
+
+    with patch('src.requirement_tracker.crew.load_custom_llms', return_value={}):
+        crew = create_publish_crew("qwen", mock_env)
+
+    assert len(crew.agents) == 1 and len(crew.tasks) == 1
+    assert "{analysis_json}" in crew.tasks[0].description
+    assert crew.tasks[0].agent is crew.agents[0]
@@ -0,0 +1,382 @@
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+
+from src.requirement_tracker.idempotency import (
+    KIND_ADO_FEATURE,
+    KIND_ADO_WORK_ITEM,
+    KIND_CONFLUENCE_PAGE,
+    IdempotencyLedger,
+    get_idempotency_scope,
+    idempotency_scope,
+    make_artifact_key,
+    make_idempotency_key,
+    submitter_scope,
+)
+
+
+def create_feature_in_process(path, counter_path, results):
+    """在独立进程中用各自的台账实例创建同一个Feature，创建时在计数文件中追加一行"""
+    def create():
+        with open(counter_path, "a", encoding="utf-8") as f:
+            f.write("created\n")
+        time.sleep(0.3)
+        return "101"
+
+    ledger = IdempotencyLedger(path=path, poll_interval=0.01)
+    with idempotency_scope("run-1"):
+        results.put(ledger.create_once(KIND_ADO_FEATURE, "Feature", create))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return IdempotencyLedger(path=str(tmp_path / "ledger.db"))
+
+
+class TestKeys:
+    """测试幂等键"""
+
+    def test_run_key(self):
+        """测试调用方提供的键优先，否则由规范化的需求文本生成"""
+        assert make_idempotency_key("需求", "REQ-1") == "REQ-1"
+        assert make_idempotency_key(" 用户  登录 ") == make_idempotency_key("用户 登录")
+        assert make_idempotency_key("用户登录") != make_idempotency_key("用户注册")
+
+    def test_run_key_namespaced(self, monkeypatch):
+        """测试由需求文本生成的幂等键按项目和提交人区分"""
+        monkeypatch.setenv("ADO_PROJECT", "A")
+        key = make_idempotency_key("用户登录")
+        assert make_idempotency_key("用户登录", submitter="session-1") != key
+        with submitter_scope("session-1"):
+            assert make_idempotency_key("用户登录") == make_idempotency_key("用户登录", submitter="session-1")
+        monkeypatch.setenv("ADO_PROJECT", "B")
+        assert make_idempotency_key("用户登录") != key
+
+    def test_artifact_key_uses_scope(self):
+        """测试有幂等范围时产物键与写入内容无关"""
+        assert make_artifact_key(KIND_ADO_FEATURE, "A") != make_artifact_key(KIND_ADO_FEATURE, "B")
+        with idempotency_scope("run-1"):
+            assert get_idempotency_scope() == "run-1"
+            assert make_artifact_key(KIND_ADO_FEATURE, "A") == make_artifact_key(KIND_ADO_FEATURE, "B")
+        assert get_idempotency_scope() is None
+
+
+class TestIdempotencyLedger:
+    """测试台账"""
+
+    def test_create_many(self, ledger):
+        """测试批量创建时每一项单独记录，同一范围内不同内容不会合并"""
+        calls = []
+
+        def create(existing):
+            calls.append(dict(existing))
+            return [existing.get(index, f"new-{len(calls)}-{index}") if index != 2 or len(calls) > 1 else None
+                    for index in range(3)]
+
+        with idempotency_scope("run-1"):
+            first = ledger.create_many(KIND_ADO_WORK_ITEM, ["A", "B", "C"], create)
+            second = ledger.create_many(KIND_ADO_WORK_ITEM, ["A", "B", "C"], create)
+
+        assert first == ["new-1-0", "new-1-1", None]
+        assert calls[1] == {0: "new-1-0", 1: "new-1-1"}
+        assert second == ["new-1-0", "new-1-1", "new-2-2"]
+
+    def test_create_once(self, ledger):
+        """测试相同幂等键只创建一次"""
+        create = Mock(side_effect=["101", "102"])
+
+        with idempotency_scope("run-1"):
+            assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create) == "101"
+            assert ledger.create_once(KIND_ADO_FEATURE, "Feature again", create) == "101"
+
+        create.assert_called_once()
+        assert ledger.get_stats() == {'created': 1, 'reused': 1, 'entries': 1}
+
+    def test_failed_create_not_recorded(self, ledger):
+        """测试创建失败时不记录，重试会再次创建"""
+        create = Mock(side_effect=[Exception("HTTP 503"), "101"])
+
+        with pytest.raises(Exception, match="HTTP 503"):
+            ledger.create_once(KIND_ADO_FEATURE, "Feature", create)
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create) == "101"
+
+    def test_forget(self, ledger):
+        """测试产物删除后同一幂等键重新创建"""
+        create = Mock(side_effect=["101", "102"])
+        ledger.create_once(KIND_ADO_FEATURE, "Feature", create)
+        ledger.forget(KIND_ADO_FEATURE, "101")
+
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create) == "102"
+
+    def test_ttl(self, tmp_path):
+        """测试过期记录不再复用"""
+        now = [1000.0]
+        ledger = IdempotencyLedger(path=str(tmp_path / "ledger.db"), ttl=60, clock=lambda: now[0])
+        create = Mock(side_effect=["101", "102"])
+        ledger.create_once(KIND_ADO_FEATURE, "Feature", create)
+        now[0] += 61
+
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create) == "102"
+
+    def test_concurrent_creates(self, ledger):
+        """测试同一幂等键的并发创建只执行一次"""
+        create = Mock(return_value="101")
+        results = []
+
+        def worker():
+            results.append(ledger.create_once(KIND_ADO_FEATURE, "Feature", create))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["101"] * 5
+        create.assert_called_once()
+
+    def test_concurrent_creates_across_ledgers(self, tmp_path):
+        """测试不同的台账实例（如不同工作进程）并发创建同一幂等键时只创建一次"""
+        path = str(tmp_path / "ledger.db")
+        create = Mock(side_effect=lambda: time.sleep(0.2) or "101")
+        results = []
+
+        def worker():
+            ledger = IdempotencyLedger(path=path, poll_interval=0.01)
+            with idempotency_scope("run-1"):
+                results.append(ledger.create_once(KIND_ADO_FEATURE, "Feature", create))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["101"] * 4
+        create.assert_called_once()
+
+    def test_concurrent_creates_across_processes(self, tmp_path):
+        """测试两个工作进程同时处理相同需求时只创建一个Feature"""
+        path, counter_path = str(tmp_path / "ledger.db"), str(tmp_path / "created.txt")
+        IdempotencyLedger(path=path)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [context.Process(target=create_feature_in_process, args=(path, counter_path, results))
+                     for _ in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+
+        assert [results.get(timeout=5) for _ in processes] == ["101", "101"]
+        with open(counter_path, encoding="utf-8") as f:
+            assert f.read().count("created") == 1
+
+    def test_failed_create_releases_key(self, tmp_path):
+        """测试创建失败后释放预留，其他调用不必等待超时"""
+        ledger = IdempotencyLedger(path=str(tmp_path / "ledger.db"), pending_timeout=3600)
+        create = Mock(side_effect=[Exception("HTTP 503"), "101"])
+
+        with pytest.raises(Exception, match="HTTP 503"):
+            ledger.create_once(KIND_ADO_FEATURE, "Feature", create)
+        assert IdempotencyLedger(path=ledger.path).create_once(KIND_ADO_FEATURE, "Feature", create) == "101"
+
+    def test_stale_reservation_taken_over(self, tmp_path):
+        """测试创建方退出后遗留的预留超时，其他调用重新创建"""
+        now = [1000.0]
+        ledger = IdempotencyLedger(path=str(tmp_path / "ledger.db"), pending_timeout=60, clock=lambda: now[0])
+        key = make_artifact_key(KIND_ADO_FEATURE, "Feature")
+        ledger._reserve([key], KIND_ADO_FEATURE, "crashed-worker")
+        now[0] += 61
+
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", Mock(return_value="101")) == "101"
+
+    def test_deleted_artifact_recreated(self, ledger):
+        """测试已记录的产物被手动删除后重新创建，无法确认时按存在处理"""
+        create = Mock(side_effect=["101", "102"])
+        ledger.create_once(KIND_ADO_FEATURE, "Feature", create)
+
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create,
+                                  exists=Mock(side_effect=Exception("HTTP 503"))) == "101"
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create, exists=lambda _: False) == "102"
+        assert ledger.create_once(KIND_ADO_FEATURE, "Feature", create, exists=lambda _: True) == "102"
+        assert create.call_count == 2
+
+    def test_scope_artifacts(self, ledger):
+        """测试按幂等范围列出已创建的产物，未完成的预留不计入"""
+        with idempotency_scope("run-1"):
+            ledger.create_once(KIND_ADO_FEATURE, "Feature", Mock(return_value="101"))
+            ledger.create_once(KIND_CONFLUENCE_PAGE, "Page", Mock(return_value="201"))
+        with idempotency_scope("run-2"):
+            ledger.create_once(KIND_ADO_FEATURE, "Feature", Mock(return_value="102"))
+
+        assert ledger.get_scope_artifacts("run-1") == {KIND_ADO_FEATURE: ["101"], KIND_CONFLUENCE_PAGE: ["201"]}
+        assert ledger.get_scope_artifacts("missing") == {}
+
+    def test_migrates_old_ledger_file(self, tmp_path):
+        """测试旧版本的台账文件补上状态列，已有记录按已创建处理"""
+        path = str(tmp_path / "ledger.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE ledger (idempotency_key TEXT PRIMARY KEY, kind TEXT NOT NULL, "
+                     "artifact_id TEXT NOT NULL, scope TEXT, created_at REAL NOT NULL)")
+        conn.execute("INSERT INTO ledger VALUES ('k1', 'ado_feature', '101', NULL, ?)", (time.time(),))
+        conn.commit()
+        conn.close()
+
+        assert IdempotencyLedger(path=path).lookup("k1") == "101"
+
+
+class TestIdempotentTools:
+    """测试创建和删除工具使用台账"""
+
+    @patch.dict("os.environ", {"ADO_ORG_URL": "https://dev.azure.com/org", "ADO_PAT": "pat"})
+    @patch("src.requirement_tracker.tools.get_ado_connection")
+    def test_feature_content_key_covers_all_fields(self, mock_get_ado_connection):
+        """测试没有幂等范围时按全部字段生成幂等键：标题相同、内容不同的需求分别创建"""
+        pytest.importorskip("azure.devops")
+        from src.requirement_tracker.tools import create_ado_feature
+
+        wit_client = mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value
+        wit_client.create_work_item.side_effect = [Mock(id=101), Mock(id=102)]
+
+        assert create_ado_feature.run(summary="登录", description="邮箱登录") == "101"
+        assert create_ado_feature.run(summary="登录", description="短信登录") == "102"
+        assert create_ado_feature.run(summary="登录", description="邮箱登录") == "101"
+        assert wit_client.create_work_item.call_count == 2
+
+    @patch.dict("os.environ", {"ADO_ORG_URL": "https://dev.azure.com/org", "ADO_PAT": "pat"})
+    @patch("src.requirement_tracker.tools.get_ado_connection")
+    def test_feature_deleted_in_ado_recreated(self, mock_get_ado_connection):
+        """测试台账中的Feature在ADO中被删除或标记为Removed后重新创建"""
+        pytest.importorskip("azure.devops")
+        from src.requirement_tracker.tools import create_ado_feature
+
+        wit_client = mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value
+        wit_client.create_work_item.side_effect = [Mock(id=101), Mock(id=102), Mock(id=103)]
+
+        with idempotency_scope("run-1"):
+            assert create_ado_feature.run(summary="登录", description="描述") == "101"
+            wit_client.get_work_items.return_value = [Mock(fields={"System.State": "New"})]
+            assert create_ado_feature.run(summary="登录", description="描述") == "101"
+            wit_client.get_work_items.return_value = [None]
+            assert create_ado_feature.run(summary="登录", description="描述") == "102"
+            wit_client.get_work_items.return_value = [Mock(fields={"System.State": "Removed"})]
+            assert create_ado_feature.run(summary="登录", description="描述") == "103"
+
+        wit_client.get_work_items.assert_called_with(ids=[102], fields=["System.State"], error_policy="omit")
+
+    @patch.dict("os.environ", {"ADO_ORG_URL": "https://dev.azure.com/org", "ADO_PAT": "pat"})
+    @patch("src.requirement_tracker.tools.get_ado_connection")
+    def test_feature_created_once_per_scope(self, mock_get_ado_connection):
+        """测试同一幂等范围内重复调用创建工具只创建一个Feature，删除后重新创建"""
+        pytest.importorskip("azure.devops")
+        from src.requirement_tracker.tools import create_ado_feature, delete_ado_workitem
+
+        wit_client = mock_get_ado_connection.return_value.clients.get_work_item_tracking_client.return_value
+        wit_client.create_work_item.side_effect = [Mock(id=101), Mock(id=102)]
+
+        with idempotency_scope("run-1"):
+            assert create_ado_feature.run(summary="登录", description="描述") == "101"
+            assert create_ado_feature.run(summary="登录功能", description="描述") == "101"
+            assert wit_client.create_work_item.call_count == 1
+
+            delete_ado_workitem.run(workitem_id="101")
+            assert create_ado_feature.run(summary="登录", description="描述") == "102"
+
+    def test_publish_retry_reuses_artifacts(self):
+        """测试run_crew重试时复用已创建的工作项和页面"""
+        from src.requirement_tracker.crew import run_crew
+
+        created = {"features": 0, "pages": 0}
+
+        def create_feature(**kwargs):
+            from src.requirement_tracker.idempotency import create_once
+
+            def create():
+                created["features"] += 1
+                return "123"
+            return create_once(KIND_ADO_FEATURE, kwargs["summary"], create)
+
+        def create_page(**kwargs):
+            from src.requirement_tracker.idempotency import KIND_CONFLUENCE_PAGE, create_once
+
+            def create():
+                created["pages"] += 1
+                return "456"
+            return create_once(KIND_CONFLUENCE_PAGE, kwargs["title"], create)
+
+        update_title = Mock()
+        update_title.func.side_effect = [Exception("HTTP 502"), "ok"]
+        analysis = {"summary": "用户登录", "problem": "p", "goal": "g", "artifacts": "a", "criteria": "c",
+                    "risks": "r"}
+        with patch("src.requirement_tracker.tools.create_ado_feature", Mock(func=create_feature)), \
+                patch("src.requirement_tracker.tools.create_confluence_page", Mock(func=create_page)), \
+                patch("src.requirement_tracker.tools.update_confluence_title", update_title), \
+                patch("src.requirement_tracker.publisher._compensate"), \
+                patch("src.requirement_tracker.crew.get_cached_analysis", return_value=analysis), \
+                patch("src.requirement_tracker.crew.create_analysis_crew"):
+            first = run_crew("用户需要登录", "qwen", {"DASHSCOPE_API_KEY": "key"}, publish_mode="direct")
+            second = run_crew("用户需要登录", "qwen", {"DASHSCOPE_API_KEY": "key"}, publish_mode="direct")
+
+        assert first.startswith("Error:")
+        assert "工作项 ID: 123" in second
+        assert created == {"features": 1, "pages": 1}
+
+
+class TestStreamingScope:
+    """测试流式kickoff时工具能读取到幂等范围"""
+
+    def test_streamed_kickoff_sees_scope(self):
+        """crewai在自己的线程中执行流式kickoff，工具仍应看到run_crew设置的幂等键"""
+        from crewai import Agent, BaseLLM, Crew, Task
+        from crewai.tools import tool
+
+        from src.requirement_tracker.streaming import kickoff_crew, stream_crew_events
+
+        seen = []
+
+        @tool("Probe Scope")
+        def probe_scope() -> str:
+            """记录工具执行时的幂等键"""
+            seen.append((get_idempotency_scope(), threading.current_thread() is threading.main_thread()))
+            return "ok"
+
+        class ScriptedLLM(BaseLLM):
+            """第一次调用工具，第二次给出最终答案"""
+
+            def __init__(self):
+                super().__init__(model="scripted")
+                self.calls = 0
+
+            def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None,
+                     from_agent=None, **kwargs):
+                self.calls += 1
+                if self.calls == 1:
+                    return "Thought: 检查幂等键\nAction: Probe Scope\nAction Input: {}"
+                return "Thought: 完成\nFinal Answer: done"
+
+            def supports_function_calling(self):
+                return False
+
+            def supports_stop_words(self):
+                return False
+
+            def get_context_window_size(self):
+                return 8000
+
+        agent = Agent(role="Publisher", goal="发布", backstory="测试", llm=ScriptedLLM(), tools=[probe_scope])
+        task = Task(description="处理 {input_text}", expected_output="结果", agent=agent)
+        crew = Crew(agents=[agent], tasks=[task])
+
+        events = []
+        with idempotency_scope("run-key"), stream_crew_events(events.append):
+            result = kickoff_crew(crew, {"input_text": "需求"})
+
+        assert str(result) == "done"
+        # 工具在crewai创建的线程中执行，读取到的是调用方的幂等键
+        assert seen == [("run-key", False)]
+        assert crew.before_kickoff_callbacks == []
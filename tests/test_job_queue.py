@@ -0,0 +1,334 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.requirement_tracker.job_queue import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JobQueue,
+    WorkerPool,
+    keep_alive,
+    process_job,
+    run_worker,
+)
+from src.requirement_tracker.streaming import emit_step
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(path=str(tmp_path / "jobs.db"))
+
+
+class TestJobQueue:
+    """测试任务队列"""
+
+    def test_submit_and_claim_in_order(self, queue):
+        """测试按提交顺序领取任务"""
+        first = queue.submit("需求一", "qwen")
+        second = queue.submit("需求二", "grok", publish_mode="direct")
+
+        job = queue.claim("w1")
+        assert job["job_id"] == first
+        assert job["status"] == JOB_RUNNING
+        assert job["attempts"] == 1
+        assert queue.claim("w2")["publish_mode"] == "direct"
+        assert queue.claim("w3") is None
+        assert queue.get_stats() == {JOB_QUEUED: 0, JOB_RUNNING: 2, JOB_DONE: 0, JOB_FAILED: 0}
+        assert [job["job_id"] for job in queue.get_jobs([second, "missing", first])] == [second, first]
+
+    def test_concurrent_claims(self, queue):
+        """测试多个工作线程同时领取时每个任务只被领取一次"""
+        job_ids = {queue.submit(f"需求{i}", "qwen") for i in range(20)}
+        claimed, lock = [], threading.Lock()
+
+        def worker(name):
+            while True:
+                job = JobQueue(queue.path).claim(name)
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job["job_id"])
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(claimed) == sorted(job_ids)
+
+    def test_requeue_stale(self, tmp_path):
+        """测试心跳超时的任务重新排队"""
+        now = [1000.0]
+        queue = JobQueue(path=str(tmp_path / "jobs.db"), clock=lambda: now[0])
+        job_id = queue.submit("需求", "qwen")
+        queue.claim("w1")
+        now[0] += 100
+
+        assert queue.requeue_stale(timeout=200) == 0
+        assert queue.requeue_stale(timeout=50) == 1
+        assert queue.claim("w2")["attempts"] == 2
+        assert queue.get_job(job_id)["worker"] == "w2"
+
+    def test_heartbeat_keeps_long_job(self, tmp_path):
+        """测试运行时间超过超时时长但仍有心跳的任务不会被重新排队"""
+        now = [1000.0]
+        queue = JobQueue(path=str(tmp_path / "jobs.db"), clock=lambda: now[0])
+        job_id = queue.submit("需求", "qwen")
+        queue.claim("w1")
+
+        for _ in range(10):
+            now[0] += 100
+            assert queue.heartbeat(job_id, "w1")
+            assert queue.requeue_stale(timeout=300) == 0
+
+        now[0] += 301
+        assert queue.requeue_stale(timeout=300) == 1
+        # 被重新排队后原工作进程的心跳不再生效
+        assert not queue.heartbeat(job_id, "w1")
+        assert queue.claim("w2")["attempts"] == 2
+        assert not queue.heartbeat(job_id, "w1")
+        assert queue.heartbeat(job_id, "w2")
+
+    def test_max_attempts(self, tmp_path):
+        """测试反复超时的任务达到领取次数上限后标记为失败，不再重新排队"""
+        now = [1000.0]
+        queue = JobQueue(path=str(tmp_path / "jobs.db"), clock=lambda: now[0])
+        job_id = queue.submit("需求", "qwen")
+
+        for attempt in range(1, 3):
+            assert queue.claim(f"w{attempt}")["attempts"] == attempt
+            now[0] += 400
+            assert queue.requeue_stale(timeout=300, max_attempts=3) == 1
+        queue.claim("w3")
+        now[0] += 400
+
+        assert queue.requeue_stale(timeout=300, max_attempts=3) == 0
+        job = queue.get_job(job_id)
+        assert job["status"] == JOB_FAILED
+        assert job["error"] == "工作进程异常退出，已重试 3 次"
+        assert queue.claim("w4") is None
+
+    def test_requeued_worker_cannot_finish(self, tmp_path):
+        """测试被重新排队后原工作进程的结果不覆盖新工作进程的结果"""
+        now = [1000.0]
+        queue = JobQueue(path=str(tmp_path / "jobs.db"), clock=lambda: now[0])
+        job_id = queue.submit("需求", "qwen")
+        queue.claim("w1")
+        now[0] += 400
+        queue.requeue_stale(timeout=300)
+        queue.claim("w2")
+
+        assert not queue.fail(job_id, "Error: 超时", "w1")
+        assert queue.get_job(job_id)["status"] == JOB_RUNNING
+        assert queue.complete(job_id, "工作项 ID: 1", "w2")
+        assert not queue.fail(job_id, "Error: 超时", "w1")
+        job = queue.get_job(job_id)
+        assert job["status"] == JOB_DONE and job["result"] == "工作项 ID: 1"
+
+    def test_migrates_old_queue_file(self, tmp_path):
+        """测试旧版本的队列文件补上心跳列，运行中的任务按开始时间判断超时"""
+        path = str(tmp_path / "jobs.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, input_text TEXT NOT NULL, model_type TEXT NOT NULL, "
+            "publish_mode TEXT, status TEXT NOT NULL, progress TEXT, result TEXT, error TEXT, worker TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        conn.execute("INSERT INTO jobs (job_id, input_text, model_type, status, worker, attempts, created_at, "
+                     "started_at) VALUES ('old', '需求', 'qwen', 'running', 'w1', 1, 0, 0)")
+        conn.commit()
+        conn.close()
+
+        queue = JobQueue(path=path, clock=lambda: 1000.0)
+        assert queue.get_job("old")["heartbeat_at"] is None
+        assert queue.requeue_stale(timeout=300) == 1
+
+
+class TestWorker:
+    """测试工作进程的任务处理"""
+
+    def test_process_job_success(self, queue):
+        """测试执行成功时保存结果，代码步骤写入progress"""
+        progress = []
+
+        def runner(input_text, model_type, publish_mode=None):
+            emit_step("创建页面")
+            progress.append(queue.get_job(job["job_id"])["progress"])
+            return f"工作项 ID: 1（{input_text}，{model_type}）"
+
+        queue.submit("需求", "qwen")
+        job = queue.claim("w1")
+        process_job(queue, job, runner)
+
+        saved = queue.get_job(job["job_id"])
+        assert saved["status"] == JOB_DONE
+        assert saved["result"] == "工作项 ID: 1（需求，qwen）"
+        assert progress == ["创建页面"]
+
+    def test_process_job_uses_submitter(self, queue):
+        """测试任务按提交人生成幂等键"""
+        from src.requirement_tracker.idempotency import get_submitter
+
+        seen = []
+        queue.submit("需求", "qwen", submitter="session-1")
+        process_job(queue, queue.claim("w1"), lambda *args, **kwargs: seen.append(get_submitter()) or "ok")
+
+        assert seen == ["session-1"]
+
+    def test_process_job_error_result(self, queue):
+        """测试run_crew返回错误时任务失败"""
+        queue.submit("需求", "qwen")
+        job = queue.claim("w1")
+        process_job(queue, job, MagicMock(return_value="Error: HTTP 502"))
+
+        saved = queue.get_job(job["job_id"])
+        assert saved["status"] == JOB_FAILED
+        assert saved["error"] == "Error: HTTP 502"
+
+    def test_process_job_exception(self, queue):
+        """测试执行抛出异常时任务失败"""
+        queue.submit("需求", "qwen")
+        job = queue.claim("w1")
+        process_job(queue, job, MagicMock(side_effect=RuntimeError("boom")))
+
+        assert queue.get_job(job["job_id"])["error"] == "boom"
+
+    def test_process_job_heartbeat(self, queue):
+        """测试执行期间后台线程定期更新心跳，结束后停止"""
+        queue.submit("需求", "qwen")
+        job = queue.claim("w1")
+        claimed_at = job["heartbeat_at"]
+        beats = []
+
+        def runner(input_text, model_type, publish_mode=None):
+            deadline = time.monotonic() + 5
+            while len(beats) < 2 and time.monotonic() < deadline:
+                heartbeat_at = queue.get_job(job["job_id"])["heartbeat_at"]
+                if heartbeat_at > (beats[-1] if beats else claimed_at):
+                    beats.append(heartbeat_at)
+            return "ok"
+
+        process_job(queue, job, runner, heartbeat_interval=0.01)
+
+        assert queue.get_job(job["job_id"])["status"] == JOB_DONE
+        assert len(beats) == 2
+        assert not any(thread.name.startswith("req-agent-heartbeat") for thread in threading.enumerate())
+
+    def test_keep_alive_survives_database_errors(self, queue):
+        """测试心跳写入失败时只记录日志，不影响任务执行"""
+        job = {"job_id": "j1", "worker": "w1"}
+        with patch.object(queue, "heartbeat", side_effect=sqlite3.OperationalError("locked")) as mock_heartbeat:
+            with keep_alive(queue, job, interval=0.01):
+                deadline = time.monotonic() + 5
+                while mock_heartbeat.call_count < 2 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+
+        assert mock_heartbeat.call_count >= 2
+
+    def test_run_worker(self, queue):
+        """测试工作循环依次处理排队的任务"""
+        runner = MagicMock(return_value="ok")
+        for i in range(3):
+            queue.submit(f"需求{i}", "qwen")
+
+        assert run_worker(queue.path, poll_interval=0.01, runner=runner, max_jobs=3) == 3
+        assert queue.get_stats()[JOB_DONE] == 3
+        runner.assert_any_call("需求0", "qwen", publish_mode=None)
+
+    def test_run_worker_stops(self, queue):
+        """测试设置停止事件后空闲的工作循环退出"""
+        stop_event = threading.Event()
+        stop_event.set()
+        assert run_worker(queue.path, poll_interval=0.01, stop_event=stop_event, runner=MagicMock()) == 0
+
+    def test_worker_pool_processes(self, queue):
+        """测试进程池启动和停止工作进程"""
+        pool = WorkerPool(size=1, path=queue.path, poll_interval=0.1)
+        pool.start()
+        try:
+            assert pool.alive_count() == 1
+        finally:
+            pool.stop(timeout=30)
+        assert pool.alive_count() == 0
+
+
+class SessionState(dict):
+    """模拟st.session_state：同时支持属性和键访问"""
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+class TestWebJobs:
+    """测试页面提交后台任务"""
+
+    @pytest.fixture
+    def mock_st(self):
+        from src.requirement_tracker import webapp
+        with patch.object(webapp, "st") as mock_st:
+            mock_st.session_state = SessionState()
+            mock_st.query_params = {}
+            yield mock_st
+
+    def test_active_jobs_poll(self, mock_st):
+        """测试有未完成的任务时用定时刷新的fragment显示"""
+        from src.requirement_tracker import webapp
+
+        job_id = webapp.submit_job("需求", "qwen")
+        webapp.remember_job(job_id)
+        webapp.show_jobs()
+
+        assert mock_st.query_params["jobs"] == job_id
+        mock_st.fragment.assert_called_once_with(webapp.render_jobs, run_every=webapp.JOB_POLL_INTERVAL)
+
+    def test_main_page_submits_job_by_default(self, mock_st, monkeypatch):
+        """测试默认启用后台任务时页面只提交任务，由工作进程处理后显示结果"""
+        from src.requirement_tracker import webapp
+
+        monkeypatch.setattr(webapp, "WEB_JOB_QUEUE", True)
+        mock_st.radio.return_value = "qwen"
+        mock_st.text_area.return_value = "用户需要登录"
+        mock_st.checkbox.side_effect = lambda label, value, help: value
+        mock_st.button.side_effect = lambda label, **kwargs: label == "🚀 处理需求"
+        mock_st.columns.return_value = (MagicMock(), MagicMock())
+        runner = MagicMock(return_value="工作项 ID: 1")
+        with patch.object(webapp, "load_env_vars", return_value={"SELECTED_MODEL": "qwen"}), \
+                patch.object(webapp, "load_custom_llms", return_value={"qwen": {"name": "通义千问(Qwen)"}}), \
+                patch.object(webapp, "get_run_store", return_value=None), \
+                patch.object(webapp, "run_crew") as mock_run_crew, \
+                patch.dict("os.environ", {"DASHSCOPE_API_KEY": "key"}):
+            webapp.show_main_page()
+
+            mock_run_crew.assert_not_called()
+            job_id = mock_st.session_state.job_ids[0]
+            assert mock_st.query_params["jobs"] == job_id
+            mock_st.success.assert_called_once_with(f"✅ 已提交任务 {job_id}，处理结果会显示在下方")
+            mock_st.fragment.assert_called_once_with(webapp.render_jobs, run_every=webapp.JOB_POLL_INTERVAL)
+
+            from src.requirement_tracker.job_queue import get_job_queue
+            assert run_worker(get_job_queue().path, poll_interval=0.01, runner=runner, max_jobs=1) == 1
+            runner.assert_called_once_with("用户需要登录", "qwen", publish_mode=None)
+
+            mock_st.text_area.reset_mock()
+            webapp.show_jobs()
+            assert mock_st.text_area.call_args.kwargs["value"] == "工作项 ID: 1"
+
+    def test_finished_jobs_render(self, mock_st):
+        """测试刷新页面后从URL参数恢复任务并显示结果"""
+        from src.requirement_tracker import webapp
+        from src.requirement_tracker.job_queue import get_job_queue
+
+        queue = get_job_queue()
+        job_id = queue.submit("需求", "qwen")
+        queue.complete(queue.claim("w1")["job_id"], "工作项 ID: 1", "w1")
+        mock_st.query_params = {"jobs": job_id}
+
+        webapp.show_jobs()
+
+        mock_st.fragment.assert_not_called()
+        assert mock_st.text_area.call_args.kwargs["value"] == "工作项 ID: 1"
@@ -103,6 +103,49 @@ class TestMainModule(unittest.TestCase):
         # Check that error message was printed
         mock_print.assert_any_call("\n程序退出。")
 
+    @patch('builtins.print')
+    @patch('builtins.input')
+    @patch('src.main.run_batch', return_value={'total': 2, 'skipped': 0, 'succeeded': 2, 'failed': 0})
+    @patch('src.main.load_requirements', return_value=[{'id': '1', 'input_text': 'a'}, {'id': '2', 'input_text': 'b'}])
+    @patch('src.main.load_custom_llms', return_value={'qwen': {}})
+    @patch('src.main.os.getenv', return_value='test')
+    @patch('sys.argv', ['main.py', '--batch', 'reqs.jsonl', '--workers', '2'])
+    def test_main_batch_mode(self, mock_getenv, mock_load_llms, mock_load_requirements, mock_run_batch,
+                             mock_input, mock_print):
+        """Test batch mode processes the file instead of starting the REPL"""
+        main()
+        mock_load_requirements.assert_called_once_with('reqs.jsonl')
+        args, kwargs = mock_run_batch.call_args
+        self.assertEqual(args[1], 'reqs.results.jsonl')
+        self.assertEqual(args[2], 'qwen')
+        self.assertEqual(kwargs['workers'], 2)
+        mock_input.assert_not_called()
+
+    @patch('builtins.print')
+    @patch('builtins.input')
+    @patch('src.main.resume_run', return_value='工作项 ID: 123')
+    @patch('src.main.os.getenv', return_value='test')
+    @patch('sys.argv', ['main.py', '--resume', 'abc123', '--no-stream'])
+    def test_main_resume_mode(self, mock_getenv, mock_resume_run, mock_input, mock_print):
+        """Test --resume continues the saved run instead of starting the REPL"""
+        main()
+        mock_resume_run.assert_called_once_with('abc123')
+        mock_print.assert_any_call('工作项 ID: 123')
+        mock_input.assert_not_called()
+
+
+    @patch('builtins.print')
+    @patch('builtins.input')
+    @patch('src.main.discard_run', return_value='运行 abc123 已放弃，已删除工作项 123')
+    @patch('src.main.os.getenv', return_value='test')
+    @patch('sys.argv', ['main.py', '--discard', 'abc123'])
+    def test_main_discard_mode(self, mock_getenv, mock_discard_run, mock_input, mock_print):
+        """Test --discard deletes the run's artifacts instead of starting the REPL"""
+        main()
+        mock_discard_run.assert_called_once_with('abc123')
+        mock_print.assert_any_call('🗑️ 运行 abc123 已放弃，已删除工作项 123')
+        mock_input.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
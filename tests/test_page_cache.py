@@ -0,0 +1,127 @@
+import os
+import pytest
+from unittest.mock import Mock
+
+from src.requirement_tracker.page_cache import PageContentCache, get_cached_page
+
+
+class FakeClock:
+    """可控的时钟，用于测试LRU淘汰顺序"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageContentCache(path=str(tmp_path / "pages.db"), max_bytes=10 * 1024 * 1024, clock=FakeClock())
+
+
+def make_confluence(version):
+    """创建只返回版本号的模拟Confluence客户端"""
+    confluence = Mock()
+    confluence.get_page_by_id.return_value = {'id': '1', 'version': {'number': version}}
+    return confluence
+
+
+class TestPageContentCache:
+    """测试页面内容磁盘缓存"""
+
+    def test_put_and_get_same_version(self, cache):
+        """测试相同版本命中缓存"""
+        cache.put('1', 3, {'id': '1', 'title': '页面', 'version': 3})
+
+        assert cache.get('1', 3) == {'id': '1', 'title': '页面', 'version': 3}
+        assert cache.get_stats()['hits'] == 1
+
+    def test_version_mismatch_is_stale(self, cache):
+        """测试版本不一致时不返回缓存"""
+        cache.put('1', 3, {'id': '1'})
+
+        assert cache.get('1', 4) is None
+        assert cache.get('2', 1) is None
+        stats = cache.get_stats()
+        assert stats['stale'] == 1
+        assert stats['misses'] == 1
+
+    def test_new_version_replaces_old(self, cache):
+        """测试写入新版本后只保留一份"""
+        cache.put('1', 1, {'content': 'old'})
+        cache.put('1', 2, {'content': 'new'})
+
+        assert cache.get('1', 2) == {'content': 'new'}
+        assert cache.get_stats()['entries'] == 1
+
+    def test_lru_eviction(self, tmp_path):
+        """测试超出容量时淘汰最久未访问的页面"""
+        cache = PageContentCache(path=str(tmp_path / "pages.db"), max_bytes=250, clock=FakeClock())
+        body = 'x' * 80
+        cache.put('1', 1, {'content': body})
+        cache.put('2', 1, {'content': body})
+        cache.get('1', 1)
+        cache.put('3', 1, {'content': body})
+
+        assert cache.get('2', 1) is None
+        assert cache.get('1', 1) is not None
+        assert cache.get('3', 1) is not None
+        stats = cache.get_stats()
+        assert stats['evictions'] == 1
+        assert stats['bytes'] <= 250
+
+    def test_shared_between_instances(self, tmp_path):
+        """测试同一缓存文件在不同实例（会话）间共享"""
+        path = str(tmp_path / "shared" / "pages.db")
+        PageContentCache(path=path).put('1', 5, {'title': 'shared'})
+
+        assert os.path.exists(path)
+        assert PageContentCache(path=path).get('1', 5) == {'title': 'shared'}
+
+    def test_invalidate(self, cache):
+        """测试删除缓存"""
+        cache.put('1', 1, {})
+        cache.put('2', 1, {})
+
+        cache.invalidate('1')
+        assert cache.get_stats()['entries'] == 1
+
+        cache.invalidate()
+        assert cache.get_stats()['entries'] == 0
+
+
+class TestGetCachedPage:
+    """测试带版本校验的页面读取"""
+
+    def test_cache_hit_skips_download(self, cache):
+        """测试版本一致时不下载正文"""
+        cache.put('1', 2, {'id': '1', 'version': 2, 'content': 'cached'})
+        fetch = Mock()
+
+        result = get_cached_page(make_confluence(2), '1', cache, fetch)
+
+        assert result['content'] == 'cached'
+        fetch.assert_not_called()
+
+    def test_version_change_downloads_and_stores(self, cache):
+        """测试版本变化时重新下载并写入缓存"""
+        cache.put('1', 2, {'id': '1', 'version': 2, 'content': 'old'})
+        fetch = Mock(return_value={'id': '1', 'version': 3, 'content': 'new'})
+        confluence = make_confluence(3)
+
+        result = get_cached_page(confluence, '1', cache, fetch)
+
+        assert result['content'] == 'new'
+        fetch.assert_called_once_with('1')
+        assert cache.get('1', 3)['content'] == 'new'
+        confluence.get_page_by_id.assert_called_once_with(page_id='1', expand='version')
+
+    def test_without_cache(self):
+        """测试缓存不可用时直接下载"""
+        fetch = Mock(return_value={'id': '1'})
+        confluence = Mock()
+
+        assert get_cached_page(confluence, '1', None, fetch) == {'id': '1'}
+        confluence.get_page_by_id.assert_not_called()
@@ -0,0 +1,207 @@
+import json
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.requirement_tracker.publisher import (
+    make_llm_formatter,
+    parse_analysis,
+    publish_requirement,
+    render_page_html,
+    render_publish_result,
+)
+
+ANALYSIS = {
+    "summary": "用户登录",
+    "problem": "用户无法登录",
+    "goal": "支持邮箱登录",
+    "artifacts": "登录页面",
+    "criteria": "Given 用户已注册\nWhen 输入正确密码\nThen 登录成功",
+    "risks": "依赖认证服务",
+}
+
+
+class MockTools:
+    """模拟的ADO和Confluence工具"""
+
+    def __init__(self):
+        self.create_feature = MagicMock()
+        self.create_feature.func.return_value = "123"
+        self.create_page = MagicMock()
+        self.create_page.func.return_value = "456"
+        self.update_title = MagicMock()
+        self.delete_page = MagicMock()
+        self.delete_work_item = MagicMock()
+
+
+@pytest.fixture
+def mock_tools():
+    """模拟ADO和Confluence工具"""
+    mocks = MockTools()
+    with patch("src.requirement_tracker.tools.create_ado_feature", mocks.create_feature), \
+            patch("src.requirement_tracker.tools.create_confluence_page", mocks.create_page), \
+            patch("src.requirement_tracker.tools.update_confluence_title", mocks.update_title), \
+            patch("src.requirement_tracker.tools.delete_confluence_page", mocks.delete_page), \
+            patch("src.requirement_tracker.tools.delete_ado_workitem", mocks.delete_work_item), \
+            patch.dict("os.environ", {"CONFLUENCE_URL": "https://wiki.example.com/",
+                                      "ADO_ORG_URL": "https://dev.azure.com/org", "ADO_PROJECT": "Proj"}):
+        yield mocks
+
+
+class TestParseAnalysis:
+    """测试解析分析师输出"""
+
+    def test_plain_json(self):
+        """测试纯JSON"""
+        assert parse_analysis(json.dumps(ANALYSIS, ensure_ascii=False)) == ANALYSIS
+
+    def test_fenced_json_with_text(self):
+        """测试带说明文字的```json代码块"""
+        output = "分析如下：\n```json\n" + json.dumps(ANALYSIS, ensure_ascii=False) + "\n```\n以上。"
+        assert parse_analysis(output) == ANALYSIS
+
+    def test_embedded_json_and_list_values(self):
+        """测试正文中嵌入的JSON，列表值转换为多行文本，缺失字段为空"""
+        output = 'Result: {"summary": "导出报表", "criteria": ["可以导出", "格式为xlsx"]} done'
+
+        analysis = parse_analysis(output)
+
+        assert analysis["summary"] == "导出报表"
+        assert analysis["criteria"] == "可以导出\n格式为xlsx"
+        assert analysis["risks"] == ""
+
+    def test_invalid_output(self):
+        """测试无法解析或缺少summary时报错"""
+        with pytest.raises(ValueError, match="JSON"):
+            parse_analysis("没有JSON")
+        with pytest.raises(ValueError, match="summary"):
+            parse_analysis('{"goal": "x"}')
+
+
+class TestRenderPage:
+    """测试页面正文模板"""
+
+    def test_sections_and_escaping(self):
+        """测试各部分标题、多行列表和HTML转义"""
+        body = render_page_html(dict(ANALYSIS, goal="支持 <email> & 密码"), "123")
+
+        assert body.startswith("<p><strong>ADO Work Item:</strong> 123</p>")
+        assert "<h2>Acceptance Criteria</h2><ul><li>Given 用户已注册</li>" in body
+        assert "支持 &lt;email&gt; &amp; 密码" in body
+
+    def test_empty_sections_skipped(self):
+        """测试空字段不生成标题"""
+        body = render_page_html(dict(ANALYSIS, artifacts="", risks=""))
+        assert "Artifacts" not in body
+        assert "ADO Work Item" not in body
+
+
+class TestPublishRequirement:
+    """测试直接发布"""
+
+    def test_creates_feature_and_page_then_fixes_title(self, mock_tools):
+        """测试用分析结果创建Feature和临时标题的页面，再以工作项ID更新页面标题"""
+        result = publish_requirement(ANALYSIS)
+
+        mock_tools.create_feature.func.assert_called_once_with(
+            summary="用户登录", description="支持邮箱登录", problem_statement="用户无法登录",
+            acceptance_criteria=ANALYSIS["criteria"]
+        )
+        kwargs = mock_tools.create_page.func.call_args.kwargs
+        assert kwargs["title"].startswith("BR (pending ")
+        assert kwargs["title"].endswith(" 用户登录")
+        assert "<h2>Problem Statement</h2>" in kwargs["body_html"]
+        mock_tools.update_title.func.assert_called_once_with(page_id="456", new_title="BR 123 用户登录")
+        mock_tools.delete_page.func.assert_not_called()
+        mock_tools.delete_work_item.func.assert_not_called()
+        assert result == {
+            "work_item_id": "123",
+            "work_item_link": "https://dev.azure.com/org/Proj/_workitems/edit/123",
+            "page_id": "456",
+            "page_title": "BR 123 用户登录",
+            "page_link": "https://wiki.example.com/pages/viewpage.action?pageId=456",
+        }
+
+    def test_llm_formatter(self, mock_tools):
+        """测试指定LLM排版时使用LLM生成正文"""
+        llm = MagicMock()
+        llm.call.return_value = " <h2>排版结果</h2> "
+
+        publish_requirement(ANALYSIS, formatter=make_llm_formatter(llm))
+
+        assert mock_tools.create_page.func.call_args.kwargs["body_html"] == "<h2>排版结果</h2>"
+        assert "用户登录" in llm.call.call_args.args[0][0]["content"]
+
+    def test_render_result(self, mock_tools):
+        """测试Markdown结果包含工作项ID和页面链接"""
+        output = render_publish_result(ANALYSIS, publish_requirement(ANALYSIS))
+
+        assert output.startswith("# 用户登录")
+        assert "工作项 ID: 123" in output
+        assert "pageId=456" in output
+
+    def test_creates_run_concurrently(self, mock_tools):
+        """测试工作项和页面同时创建，而不是先后执行"""
+        both_started = threading.Barrier(2, timeout=5)
+
+        def wait_for_other(result):
+            def side_effect(**kwargs):
+                both_started.wait()
+                return result
+            return side_effect
+
+        mock_tools.create_feature.func.side_effect = wait_for_other("123")
+        mock_tools.create_page.func.side_effect = wait_for_other("456")
+
+        result = publish_requirement(ANALYSIS)
+
+        assert result["page_title"] == "BR 123 用户登录"
+
+
+class TestPublishCompensation:
+    """测试发布失败时的补偿"""
+
+    def test_work_item_failure_deletes_page(self, mock_tools):
+        """测试工作项创建失败时删除已创建的页面"""
+        mock_tools.create_feature.func.side_effect = Exception("ADO不可用")
+
+        with pytest.raises(Exception, match="创建ADO工作项失败: ADO不可用"):
+            publish_requirement(ANALYSIS)
+
+        mock_tools.delete_page.func.assert_called_once_with(page_id="456")
+        mock_tools.delete_work_item.func.assert_not_called()
+        mock_tools.update_title.func.assert_not_called()
+
+    def test_page_failure_deletes_work_item(self, mock_tools):
+        """测试页面创建失败时删除已创建的工作项"""
+        mock_tools.create_page.func.side_effect = Exception("标题重复")
+
+        with pytest.raises(Exception, match="创建Confluence页面失败: 标题重复"):
+            publish_requirement(ANALYSIS)
+
+        mock_tools.delete_work_item.func.assert_called_once_with(workitem_id="123")
+        mock_tools.delete_page.func.assert_not_called()
+
+    def test_both_fail(self, mock_tools):
+        """测试两边都失败时不需要补偿，错误信息包含两边的原因"""
+        mock_tools.create_feature.func.side_effect = Exception("A")
+        mock_tools.create_page.func.side_effect = Exception("B")
+
+        with pytest.raises(Exception) as excinfo:
+            publish_requirement(ANALYSIS)
+
+        assert "创建ADO工作项失败: A" in str(excinfo.value)
+        assert "创建Confluence页面失败: B" in str(excinfo.value)
+        mock_tools.delete_page.func.assert_not_called()
+        mock_tools.delete_work_item.func.assert_not_called()
+
+    def test_title_failure_deletes_both(self, mock_tools):
+        """测试标题更新失败时删除页面和工作项，补偿失败不掩盖原始错误"""
+        mock_tools.update_title.func.side_effect = Exception("版本冲突")
+        mock_tools.delete_work_item.func.side_effect = Exception("无权限")
+
+        with pytest.raises(Exception, match="更新Confluence页面标题失败: 版本冲突"):
+            publish_requirement(ANALYSIS)
+
+        mock_tools.delete_page.func.assert_called_once_with(page_id="456")
+        mock_tools.delete_work_item.func.assert_called_once_with(workitem_id="123")
@@ -0,0 +1,342 @@
+import json
+import sqlite3
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.requirement_tracker.run_store import (
+    STAGE_ANALYSIS,
+    STAGE_PAGE,
+    STAGE_TITLE,
+    STATUS_DISCARDED,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_RUNNING,
+    RunCheckpoint,
+    RunStore,
+    get_pending_stage,
+)
+
+ANALYSIS = {"summary": "用户登录", "problem": "无法登录", "goal": "支持邮箱登录", "artifacts": "登录页",
+            "criteria": "登录成功", "risks": "无"}
+ENV = {"DASHSCOPE_API_KEY": "key"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RunStore(path=str(tmp_path / "runs.db"))
+
+
+@pytest.fixture
+def mock_tools():
+    """模拟ADO和Confluence工具，页面标题更新第一次失败"""
+    tools = MagicMock()
+    tools.create_feature.func.return_value = "123"
+    tools.create_page.func.return_value = "456"
+    tools.update_title.func.side_effect = [Exception("HTTP 502"), "ok"]
+    with patch("src.requirement_tracker.tools.create_ado_feature", tools.create_feature), \
+            patch("src.requirement_tracker.tools.create_confluence_page", tools.create_page), \
+            patch("src.requirement_tracker.tools.update_confluence_title", tools.update_title), \
+            patch("src.requirement_tracker.tools.delete_confluence_page", tools.delete_page), \
+            patch("src.requirement_tracker.tools.delete_ado_workitem", tools.delete_work_item):
+        yield tools
+
+
+class TestRunStore:
+    """测试运行进度存储"""
+
+    def test_checkpoints(self, store):
+        """测试按阶段保存并计算待继续的阶段"""
+        run_id = store.create_run("需求", "qwen", "key-1")
+        assert store.get_run(run_id)["pending_stage"] == STAGE_ANALYSIS
+
+        checkpoint = RunCheckpoint(store, run_id)
+        checkpoint.save(analysis=ANALYSIS, work_item_id="123")
+
+        run = store.get_run(run_id)
+        assert run["analysis"] == ANALYSIS
+        assert run["pending_stage"] == STAGE_PAGE
+        assert run["idempotency_key"] == "key-1"
+        assert RunCheckpoint(store, run_id).get("work_item_id") == "123"
+
+    def test_pending_stage(self):
+        """测试阶段顺序"""
+        assert get_pending_stage({"analysis": ANALYSIS, "work_item_id": "1", "page_id": "2"}) == STAGE_TITLE
+        assert get_pending_stage({"analysis": ANALYSIS, "work_item_id": "1", "page_id": "2",
+                                  "title_updated": True}) is None
+
+    def test_list_runs_by_status(self, store):
+        """测试按状态列出运行"""
+        failed = store.create_run("需求一", "qwen")
+        store.create_run("需求二", "qwen")
+        store.update(failed, status=STATUS_FAILED, error="HTTP 502")
+
+        assert [run["run_id"] for run in store.list_runs(status=STATUS_FAILED)] == [failed]
+        assert len(store.list_runs()) == 2
+
+    def test_claim_failed_run_once(self, store):
+        """测试只有失败的运行可以领取，同一运行只能领取一次"""
+        run_id = store.create_run("需求", "qwen")
+        assert store.claim(run_id) is False
+        store.update(run_id, status=STATUS_FAILED, error="HTTP 502")
+
+        assert store.claim(run_id) is True
+        assert store.claim(run_id) is False
+        run = store.get_run(run_id)
+        assert run["status"] == STATUS_RUNNING and run["error"] is None
+
+    def test_list_runs_by_owner(self, store):
+        """测试按提交人列出运行"""
+        own = store.create_run("需求一", "qwen", owner="session-1")
+        store.create_run("需求二", "qwen", owner="session-2")
+
+        assert [run["run_id"] for run in store.list_runs(owner="session-1")] == [own]
+
+    def test_migrates_old_runs_file(self, tmp_path):
+        """测试旧版本的运行进度文件自动补充发布方式和提交人列"""
+        path = str(tmp_path / "runs.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE runs (run_id TEXT PRIMARY KEY, input_text TEXT NOT NULL, model_type TEXT NOT NULL, "
+                "idempotency_key TEXT, status TEXT NOT NULL, analysis TEXT, work_item_id TEXT, page_id TEXT, "
+                "page_title TEXT, title_updated INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("INSERT INTO runs (run_id, input_text, model_type, status, created_at, updated_at) "
+                         "VALUES ('old', '需求', 'qwen', 'failed', 0, 0)")
+        conn.close()
+
+        store = RunStore(path=path)
+        run = store.get_run("old")
+        assert run["publish_mode"] is None and run["owner"] is None
+        run_id = store.create_run("需求", "qwen", publish_mode="agent", owner="session-1")
+        assert store.get_run(run_id)["publish_mode"] == "agent"
+
+    def test_unknown_field(self, store):
+        """测试拒绝未知的检查点字段"""
+        run_id = store.create_run("需求", "qwen")
+        with pytest.raises(ValueError):
+            store.update(run_id, input_text="x")
+
+
+class TestResumeRun:
+    """测试从失败的阶段继续运行"""
+
+    def test_resume_after_title_failure(self, mock_tools):
+        """测试标题更新失败后继续运行不再分析、不重复创建，也不删除已创建的产物"""
+        from src.requirement_tracker.crew import resume_run, run_crew
+        from src.requirement_tracker.run_store import get_run_store
+
+        analyze = MagicMock(return_value=ANALYSIS)
+        with patch("src.requirement_tracker.crew.get_cached_analysis", analyze):
+            first = run_crew("用户需要登录", "qwen", ENV, publish_mode="direct")
+            run = get_run_store().list_runs(status=STATUS_FAILED)[0]
+            assert run["pending_stage"] == STAGE_TITLE
+            assert run["run_id"] in first
+
+            second = resume_run(run["run_id"], ENV)
+
+        assert first.startswith("Error:")
+        assert "工作项 ID: 123" in second
+        analyze.assert_called_once()
+        mock_tools.create_feature.func.assert_called_once()
+        mock_tools.create_page.func.assert_called_once()
+        mock_tools.delete_page.func.assert_not_called()
+        mock_tools.delete_work_item.func.assert_not_called()
+        mock_tools.update_title.func.assert_called_with(page_id="456", new_title="BR 123 用户登录")
+
+        run = get_run_store().get_run(run["run_id"])
+        assert run["status"] == STATUS_DONE
+        assert resume_run(run["run_id"], ENV) == second
+
+    def test_resume_after_page_failure(self, mock_tools):
+        """测试页面创建失败后继续运行只创建页面"""
+        from src.requirement_tracker.crew import resume_run, run_crew
+        from src.requirement_tracker.run_store import get_run_store
+
+        mock_tools.create_page.func.side_effect = [Exception("HTTP 503"), "789"]
+        mock_tools.update_title.func.side_effect = None
+        with patch("src.requirement_tracker.crew.get_cached_analysis", return_value=ANALYSIS):
+            run_crew("用户需要登录", "qwen", ENV, publish_mode="direct")
+            run_id = get_run_store().list_runs(status=STATUS_FAILED)[0]["run_id"]
+            result = resume_run(run_id, ENV)
+
+        assert "工作项 ID: 123" in result
+        mock_tools.create_feature.func.assert_called_once()
+        assert mock_tools.create_page.func.call_count == 2
+
+    def test_unknown_run(self):
+        """测试运行不存在时返回错误"""
+        from src.requirement_tracker.crew import resume_run
+        assert resume_run("missing") == "Error: 运行 missing 不存在"
+
+    def test_running_run_not_resumed_twice(self, mock_tools):
+        """测试正在继续的运行不能再次继续或放弃"""
+        from src.requirement_tracker.crew import discard_run, resume_run, run_crew
+        from src.requirement_tracker.run_store import get_run_store
+
+        with patch("src.requirement_tracker.crew.get_cached_analysis", return_value=ANALYSIS):
+            run_crew("用户需要登录", "qwen", ENV, publish_mode="direct")
+        run_id = get_run_store().list_runs(status=STATUS_FAILED)[0]["run_id"]
+        assert get_run_store().claim(run_id)
+
+        assert resume_run(run_id, ENV) == f"Error: 运行 {run_id} 正在运行"
+        assert discard_run(run_id) == f"Error: 运行 {run_id} 正在运行"
+        mock_tools.update_title.func.assert_called_once()
+        mock_tools.delete_work_item.func.assert_not_called()
+
+    def test_other_owner_run_not_resumed(self, mock_tools):
+        """测试不能继续或放弃其他提交人的运行"""
+        from src.requirement_tracker.crew import discard_run, resume_run, run_crew
+        from src.requirement_tracker.idempotency import submitter_scope
+        from src.requirement_tracker.run_store import get_run_store
+
+        with patch("src.requirement_tracker.crew.get_cached_analysis", return_value=ANALYSIS), \
+                submitter_scope("session-1"):
+            run_crew("用户需要登录", "qwen", ENV, publish_mode="direct")
+        run = get_run_store().list_runs(status=STATUS_FAILED)[0]
+        assert run["owner"] == "session-1"
+
+        assert resume_run(run["run_id"], ENV, owner="session-2") == f"Error: 运行 {run['run_id']} 不存在"
+        assert discard_run(run["run_id"], owner="session-2") == f"Error: 运行 {run['run_id']} 不存在"
+        assert get_run_store().get_run(run["run_id"])["status"] == STATUS_FAILED
+
+    def test_resume_agent_run(self):
+        """测试agent模式发布失败后继续运行只运行发布任务，使用保存的分析结果"""
+        from src.requirement_tracker.crew import resume_run, run_crew
+        from src.requirement_tracker.run_store import get_run_store
+
+        full_crew = MagicMock()
+        full_crew.tasks = [MagicMock(output=MagicMock(raw=json.dumps(ANALYSIS))), MagicMock()]
+        full_crew.kickoff.side_effect = Exception("Confluence 503")
+        publish_crew = MagicMock()
+        publish_crew.kickoff.return_value = "工作项 ID: 123"
+        with patch("src.requirement_tracker.crew.create_crew", return_value=full_crew) as mock_create_crew, \
+                patch("src.requirement_tracker.crew.create_publish_crew", return_value=publish_crew), \
+                patch("src.requirement_tracker.crew.get_analysis_cache", return_value=None), \
+                patch("src.requirement_tracker.crew.get_scope_artifacts",
+                      return_value={"ado_feature": ["123"]}):
+            first = run_crew("用户需要登录", "qwen", ENV, publish_mode="agent")
+            run = get_run_store().list_runs(status=STATUS_FAILED)[0]
+            assert run["publish_mode"] == "agent"
+            assert run["analysis"] == ANALYSIS and run["work_item_id"] == "123"
+            assert run["run_id"] in first
+
+            result = resume_run(run["run_id"], ENV)
+
+        assert result == "工作项 ID: 123"
+        mock_create_crew.assert_called_once()
+        inputs = publish_crew.kickoff.call_args.kwargs["inputs"]
+        assert json.loads(inputs["analysis_json"]) == ANALYSIS
+        assert get_run_store().get_run(run["run_id"])["status"] == STATUS_DONE
+
+
+class TestDiscardRun:
+    """测试放弃失败的运行"""
+
+    def test_discard_deletes_artifacts(self, mock_tools):
+        """测试放弃运行时删除已创建的工作项和临时标题页面，之后不能再继续"""
+        from src.requirement_tracker.crew import discard_run, resume_run, run_crew
+        from src.requirement_tracker.run_store import get_run_store
+
+        with patch("src.requirement_tracker.crew.get_cached_analysis", return_value=ANALYSIS):
+            run_crew("用户需要登录", "qwen", ENV, publish_mode="direct")
+        run_id = get_run_store().list_runs(status=STATUS_FAILED)[0]["run_id"]
+
+        result = discard_run(run_id)
+
+        assert result == f"运行 {run_id} 已放弃，已删除工作项 123、页面 456"
+        mock_tools.delete_page.func.assert_called_once_with(page_id="456")
+        mock_tools.delete_work_item.func.assert_called_once_with(workitem_id="123")
+        run = get_run_store().get_run(run_id)
+        assert run["status"] == STATUS_DISCARDED
+        assert run["work_item_id"] is None and run["page_id"] is None
+        assert get_run_store().list_runs(status=STATUS_FAILED) == []
+        assert resume_run(run_id, ENV) == f"Error: 运行 {run_id} 已放弃"
+
+    def test_partial_failure_keeps_remaining_artifacts(self, mock_tools):
+        """测试部分删除失败时运行仍为失败，再次放弃只删除剩下的产物"""
+        from src.requirement_tracker.crew import discard_run, run_crew
+        from src.requirement_tracker.run_store import get_run_store
+
+        mock_tools.delete_work_item.func.side_effect = [Exception("HTTP 503"), "ok"]
+        with patch("src.requirement_tracker.crew.get_cached_analysis", return_value=ANALYSIS):
+            run_crew("用户需要登录", "qwen", ENV, publish_mode="direct")
+        run_id = get_run_store().list_runs(status=STATUS_FAILED)[0]["run_id"]
+
+        first = discard_run(run_id)
+        run = get_run_store().get_run(run_id)
+        assert first.startswith("Error:") and "HTTP 503" in first
+        assert run["status"] == STATUS_FAILED
+        assert run["work_item_id"] == "123" and run["page_id"] is None
+
+        assert discard_run(run_id) == f"运行 {run_id} 已放弃，已删除工作项 123"
+        mock_tools.delete_page.func.assert_called_once()
+        assert mock_tools.delete_work_item.func.call_count == 2
+
+    def test_done_run_cannot_be_discarded(self, store):
+        """测试已完成的运行不能放弃"""
+        from src.requirement_tracker.crew import discard_run
+
+        run_id = store.create_run("需求", "qwen")
+        store.update(run_id, status=STATUS_DONE, work_item_id="1", page_id="2")
+        with patch("src.requirement_tracker.crew.get_run_store", return_value=store), \
+                patch("src.requirement_tracker.crew.delete_artifacts") as mock_delete:
+            assert discard_run(run_id) == f"Error: 运行 {run_id} 已完成，不能放弃"
+        mock_delete.assert_not_called()
+
+
+class TestFailedRunsPage:
+    """测试页面上的未完成运行列表"""
+
+    def test_resume_button(self, store):
+        """测试点击继续运行调用resume_run并显示结果"""
+        from src.requirement_tracker import webapp
+
+        run_id = store.create_run("需求", "qwen", owner="session-1")
+        store.update(run_id, status=STATUS_FAILED, analysis=ANALYSIS, error="HTTP 502")
+        with patch.object(webapp, "get_run_store", return_value=store), \
+                patch.object(webapp, "get_session_id", return_value="session-1"), \
+                patch.object(webapp, "resume_run", return_value="工作项 ID: 1") as mock_resume, \
+                patch.object(webapp, "st") as mock_st:
+            mock_st.button.side_effect = lambda label, key: key == f"resume_{run_id}"
+            webapp.show_failed_runs()
+
+        mock_resume.assert_called_once_with(run_id, owner="session-1")
+        assert "用户登录" in mock_st.expander.call_args.args[0]
+        mock_st.success.assert_called_once()
+
+    def test_discard_button(self, store):
+        """测试点击放弃调用discard_run并显示结果"""
+        from src.requirement_tracker import webapp
+
+        run_id = store.create_run("需求", "qwen", owner="session-1")
+        store.update(run_id, status=STATUS_FAILED, analysis=ANALYSIS, error="HTTP 502")
+        with patch.object(webapp, "get_run_store", return_value=store), \
+                patch.object(webapp, "get_session_id", return_value="session-1"), \
+                patch.object(webapp, "resume_run") as mock_resume, \
+                patch.object(webapp, "discard_run", return_value=f"运行 {run_id} 已放弃") as mock_discard, \
+                patch.object(webapp, "st") as mock_st:
+            mock_st.button.side_effect = lambda label, key: key == f"discard_{run_id}"
+            webapp.show_failed_runs()
+
+        mock_discard.assert_called_once_with(run_id, owner="session-1")
+        mock_resume.assert_not_called()
+        mock_st.success.assert_called_once_with(f"运行 {run_id} 已放弃")
+
+    def test_lists_only_session_runs(self, store):
+        """测试只列出当前会话的失败运行"""
+        from src.requirement_tracker import webapp
+
+        own = store.create_run("需求一", "qwen", owner="session-1")
+        other = store.create_run("需求二", "qwen", owner="session-2")
+        for run_id in (own, other):
+            store.update(run_id, status=STATUS_FAILED, error="HTTP 502")
+        with patch.object(webapp, "get_run_store", return_value=store), \
+                patch.object(webapp, "get_session_id", return_value="session-1"), \
+                patch.object(webapp, "st") as mock_st:
+            mock_st.button.return_value = False
+            webapp.show_failed_runs()
+
+        assert mock_st.expander.call_count == 1
+        assert own in mock_st.expander.call_args.args[0]
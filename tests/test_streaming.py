@@ -0,0 +1,112 @@
+from unittest.mock import MagicMock, patch
+
+from crewai.types.streaming import StreamChunk, StreamChunkType, ToolCallChunk
+
+from src.requirement_tracker.streaming import (
+    emit_step,
+    forward_stream_chunks,
+    get_event_handler,
+    kickoff_crew,
+    stream_crew_events,
+)
+
+
+class FakeStreamingOutput:
+    """模拟CrewStreamingOutput：可迭代的分片和最终结果"""
+
+    def __init__(self, chunks, result):
+        self._chunks = chunks
+        self.result = result
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+def make_chunks():
+    return [
+        StreamChunk(content="{\"summary\"", task_index=0, agent_role="Analyst", task_name="分析"),
+        StreamChunk(content=": \"登录\"}", task_index=0, agent_role="Analyst", task_name="分析"),
+        StreamChunk(content="", chunk_type=StreamChunkType.TOOL_CALL, task_index=1, agent_role="Publisher",
+                    tool_call=ToolCallChunk(tool_id="call_1", tool_name="Create ADO Feature", arguments="{")),
+        StreamChunk(content="", chunk_type=StreamChunkType.TOOL_CALL, task_index=1, agent_role="Publisher",
+                    tool_call=ToolCallChunk(tool_id="call_1", tool_name="Create ADO Feature", arguments="}")),
+        StreamChunk(content="完成", task_index=1, agent_role="Publisher", task_name="发布"),
+    ]
+
+
+class TestForwardStreamChunks:
+    """测试把crewai的流式分片转换为事件"""
+
+    def test_events(self):
+        """测试任务切换、文本片段和工具调用事件，分片的工具调用只发送一次"""
+        events = []
+        forward_stream_chunks(make_chunks(), events.append)
+
+        assert [event["type"] for event in events] == ["task", "token", "token", "task", "tool_call", "token"]
+        assert events[0] == {"type": "task", "task_index": 0, "agent_role": "Analyst", "content": "分析"}
+        assert events[1]["content"] == "{\"summary\""
+        assert events[4]["tool_name"] == "Create ADO Feature"
+        assert events[5]["content"] == "完成"
+
+
+class TestKickoffCrew:
+    """测试按上下文选择是否流式执行"""
+
+    def test_without_handler(self):
+        """测试未开启流式输出时直接kickoff"""
+        crew = MagicMock()
+        crew.kickoff.return_value = "result"
+
+        assert kickoff_crew(crew, {"input_text": "需求"}) == "result"
+        crew.kickoff.assert_called_once_with(inputs={"input_text": "需求"})
+
+    def test_with_handler(self):
+        """测试开启流式输出时转发事件并返回最终结果，结束后恢复非流式"""
+        agent = MagicMock()
+        crew = MagicMock()
+        crew.agents = [agent]
+
+        def kickoff(inputs):
+            assert crew.stream is True
+            agent.llm.stream = True
+            return FakeStreamingOutput(make_chunks(), "final")
+
+        crew.kickoff.side_effect = kickoff
+        events = []
+        with stream_crew_events(events.append):
+            result = kickoff_crew(crew, {"input_text": "需求"})
+
+        assert result == "final"
+        assert len(events) == 6
+        assert crew.stream is False
+        assert agent.llm.stream is False
+
+    def test_context_scope(self):
+        """测试事件处理函数只在上下文内有效"""
+        events = []
+        emit_step("不会发送")
+        with stream_crew_events(events.append):
+            assert get_event_handler() is not None
+            emit_step("创建页面")
+        assert get_event_handler() is None
+        assert events == [{"type": "step", "content": "创建页面"}]
+
+
+class TestRunCrewStreaming:
+    """测试run_crew的流式输出"""
+
+    def test_run_crew_streams_events(self):
+        """测试用stream_crew_events包住run_crew时收到事件，返回值不变"""
+        from src.requirement_tracker.crew import run_crew
+
+        crew = MagicMock()
+        crew.agents = []
+        crew.kickoff.return_value = FakeStreamingOutput(make_chunks(), "工作项 ID: 1")
+        events = []
+        with patch("src.requirement_tracker.crew.create_crew", return_value=crew), \
+                stream_crew_events(events.append):
+            result = run_crew("需求", "qwen", {"DASHSCOPE_API_KEY": "key"})
+
+        assert result == "工作项 ID: 1"
+        assert events[0]["type"] == "task"
+        assert any(event["type"] == "tool_call" for event in events)
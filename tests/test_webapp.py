@@ -6,7 +6,7 @@ import os
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.requirement_tracker.webapp import show_main_page, load_env_vars, load_custom_llms
+from src.requirement_tracker.webapp import show_main_page, load_env_vars, load_custom_llms, create_stream_handler
 
 
 class TestWebApp(unittest.TestCase):
@@ -201,6 +201,43 @@ class TestWebApp(unittest.TestCase):
         # Verify that error was shown for exception
         mock_st_error.assert_called()
 
+    def test_stream_handler_updates_placeholders(self):
+        """Test streamed tokens and step events are rendered into separate placeholders"""
+        container = MagicMock()
+        steps_placeholder, output_placeholder = MagicMock(), MagicMock()
+        container.empty.side_effect = [steps_placeholder, output_placeholder]
+
+        handler = create_stream_handler(container)
+        handler({"type": "task", "task_index": 0, "agent_role": "Analyst", "content": ""})
+        handler({"type": "token", "content": "Hello"})
+        handler({"type": "token", "content": " world"})
+        handler({"type": "tool_call", "tool_name": "Create ADO Feature", "agent_role": "Publisher"})
+
+        output_placeholder.markdown.assert_called_with("Hello world")
+        steps_text = steps_placeholder.markdown.call_args.args[0]
+        self.assertIn("Analyst 开始第 1 个任务", steps_text)
+        self.assertIn("调用工具：Create ADO Feature", steps_text)
+
+    def test_stream_handler_throttles_renders(self):
+        """Test tokens are re-rendered at most once per interval and flushed at the end"""
+        container = MagicMock()
+        steps_placeholder, output_placeholder = MagicMock(), MagicMock()
+        container.empty.side_effect = [steps_placeholder, output_placeholder]
+        now = [0.0]
+
+        handler = create_stream_handler(container, interval=1.0, clock=lambda: now[0])
+        for index in range(100):
+            now[0] += 0.05
+            handler({"type": "token", "content": str(index % 10)})
+
+        # 第一个片段立即显示，之后每秒最多渲染一次
+        self.assertLessEqual(output_placeholder.markdown.call_count, 6)
+        handler.flush()
+        output_placeholder.markdown.assert_called_with("0123456789" * 10)
+        calls = output_placeholder.markdown.call_count
+        handler.flush()
+        self.assertEqual(output_placeholder.markdown.call_count, calls)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import pytest
+
+from src.requirement_tracker.work_item_store import WorkItemStore, make_scope
+
+
+def make_row(item_id, **overrides):
+    """创建存储行"""
+    row = {
+        'id': item_id,
+        'project': 'Proj',
+        'type': 'Feature',
+        'title': f'Item {item_id}',
+        'state': 'New',
+        'area_path': 'Proj\\Team',
+        'assigned_to': 'Unassigned',
+        'changed_date': '2024-01-01T00:00:00Z'
+    }
+    row.update(overrides)
+    return row
+
+
+@pytest.fixture
+def store(tmp_path):
+    return WorkItemStore(path=str(tmp_path / "work_items.db"))
+
+
+class TestWorkItemStore:
+    """测试工作项本地存储"""
+
+    def test_upsert_and_scope_items(self, store):
+        """测试写入后按范围读取"""
+        store.upsert([make_row(1), make_row(2, type='Bug'), make_row(3, area_path='Proj\\Other')])
+
+        assert [item['id'] for item in store.get_scope_items('Proj', 'Feature')] == [3, 1]
+        assert [item['id'] for item in store.get_scope_items('Proj', 'Feature', 'Proj\\Team')] == [1]
+        assert store.get_scope_items('Proj', 'Feature')[0]['description'] is None
+
+    def test_upsert_replaces(self, store):
+        """测试重复写入更新已有工作项"""
+        store.upsert([make_row(1)])
+        store.upsert([make_row(1, title='New')])
+
+        assert store.get_scope_items('Proj', 'Feature')[0]['title'] == 'New'
+
+    def test_delete(self, store):
+        """测试删除返回实际删除数量"""
+        store.upsert([make_row(1), make_row(2)])
+
+        assert store.delete([2, 99]) == 1
+        assert store.get_scope_ids('Proj', 'Feature') == {1}
+
+    def test_watermark_per_scope(self, store):
+        """测试水位线按范围保存"""
+        store.set_watermark('Proj', 'Feature', None, '2024-01-01T00:00:00Z')
+
+        assert store.get_watermark(make_scope('Proj', 'Feature')) == '2024-01-01T00:00:00Z'
+        assert store.get_watermark(make_scope('Proj', 'Feature', 'Proj\\Team')) is None
+
+    def test_clear(self, store):
+        """测试清空存储"""
+        store.upsert([make_row(1)])
+        store.set_watermark('Proj', 'Feature', None, 'w')
+
+        store.clear()
+
+        assert store.get_scope_ids('Proj', 'Feature') == set()
+        assert store.get_watermark(make_scope('Proj', 'Feature')) is None
+
+
+class TestWorkItemQuery:
+    """测试本地索引查询"""
+
+    @pytest.fixture
+    def populated(self, store):
+        store.upsert([
+            make_row(1, state='Active', assigned_to='Alice', changed_date='2024-01-03T00:00:00Z'),
+            make_row(2, state='New', area_path='Proj\\Team\\Sub', title='Login page'),
+            make_row(3, state='Active', area_path='Proj\\Teammate', assigned_to='Bob'),
+            make_row(4, project='Other', type='Bug', state='Closed', title='100% done_x', area_path='Other'),
+        ])
+        return store
+
+    def test_filters_and_total(self, populated):
+        """测试组合过滤并返回总数"""
+        result = populated.query(project='Proj', state='Active')
+
+        assert result['total'] == 2
+        assert [item['id'] for item in result['items']] == [3, 1]
+        assert result['items'][0]['project'] == 'Proj'
+
+    def test_area_path_includes_children_only(self, populated):
+        """测试Area过滤包含子Area但不匹配同前缀的兄弟Area"""
+        result = populated.query(area_path='Proj\\Team')
+
+        assert [item['id'] for item in result['items']] == [2, 1]
+
+    def test_title_contains_escapes_wildcards(self, populated):
+        """测试标题搜索转义通配符"""
+        assert [item['id'] for item in populated.query(title_contains='0% done_')['items']] == [4]
+        assert populated.query(title_contains='_')['total'] == 1
+
+    def test_sort_and_paginate(self, populated):
+        """测试排序和分页"""
+        first = populated.query(order_by='state', descending=False, limit=2)
+        second = populated.query(order_by='state', descending=False, limit=2, offset=2)
+
+        assert first['total'] == 4
+        assert [item['id'] for item in first['items'] + second['items']] == [1, 3, 4, 2]
+
+    def test_changed_since(self, populated):
+        """测试按修改时间过滤"""
+        assert [item['id'] for item in populated.query(changed_since='2024-01-02')['items']] == [1]
+
+    def test_invalid_order_by(self, populated):
+        """测试不支持的排序列"""
+        with pytest.raises(ValueError):
+            populated.query(order_by='title; DROP TABLE work_items')
+
+    def test_count_group_by(self, populated):
+        """测试分组统计"""
+        assert populated.count('state') == {'Active': 2, 'Closed': 1, 'New': 1}
+        assert populated.count('assigned_to', project='Proj', state='Active') == {'Alice': 1, 'Bob': 1}
+
+        with pytest.raises(ValueError):
+            populated.count('title')
+
+    def test_uses_indexes(self, populated):
+        """测试过滤条件命中索引"""
+        with populated._connect() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM work_items WHERE state = ?", ('Active',)
+            ).fetchall()
+
+        assert any('idx_work_items_state' in row[-1] for row in plan)